@@ -13,50 +13,424 @@ from dotenv import load_dotenv
 import base64
 from typing import Optional
 import contextlib
+import contextvars
 import threading
-from queue import Queue
+from queue import Queue, Empty
+import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 import signal
 import sys
 import aiohttp
-import requests
 import shutil
 from datetime import timezone, timedelta
 import logging
 from collections import defaultdict
 from collections import deque
+from collections import OrderedDict
 import functools
+from abc import ABC, abstractmethod
+import bisect
+import gzip
+import hashlib
+import struct
+import json
+import re
+
+try:
+    import zstandard  # optional: backups fall back to gzip without it
+except ImportError:
+    zstandard = None
 
 DB_LOCK = threading.Lock()
-DB_POOL = ThreadPoolExecutor(max_workers=3)
+# Bounded worker pool for every blocking SQLite call, so a write lock
+# never stalls the gateway heartbeat
+DB_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="db-worker")
+# Read-only commands get their own workers and connections (one each), so
+# a burst of reads never queues behind maintenance or writer waits
+DB_READ_WORKERS = 4
+DB_READ_POOL = ThreadPoolExecutor(max_workers=DB_READ_WORKERS,
+                                  thread_name_prefix="db-reader")
+
+# Per-connection PRAGMA profiles, applied once when the pool opens a
+# connection so every checkout reuses a warm page cache and schema
+DB_PRAGMA_PROFILES = {
+    "default": {
+        # Must precede journal_mode: only takes effect on a new file, and
+        # switching to WAL is what initializes one
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "foreign_keys": "ON",
+        "synchronous": "NORMAL",  # WAL keeps this crash-safe
+        "cache_size": -16000,  # ~16 MB page cache per connection
+        "mmap_size": 268435456,  # 256 MB memory-mapped reads
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,  # ms
+    },
+    # The group-commit writer fsyncs once per batch, so it can afford
+    # full durability on every commit
+    "writer": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "foreign_keys": "ON",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+    # Opened with mode=ro; query_only also rejects writes from SQL that
+    # would otherwise try to upgrade to a write lock
+    "reader": {
+        "query_only": "ON",
+        "cache_size": -16000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    },
+}
+
+# ==== SQL instrumentation ====
+SLOW_QUERY_MS = 100.0
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_PARAM_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_SPACE = re.compile(r"\s+")
+_SQL_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+
+class SqlMetrics:
+    """Latency and row counts per normalized SQL statement (literals and
+    IN-lists folded to `?`). Percentiles come from the last `samples`
+    executions of each statement; executions slower than `slow_ms` are
+    kept in `slow_log` together with their EXPLAIN QUERY PLAN."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, samples=512, slow_log_size=50):
+        self.enabled = True
+        self.slow_ms = slow_ms
+        self.samples = samples
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.slow_count = 0
+        self._stats = {}
+        self._normalized = {}  # raw SQL -> normalized, statements are static
+        self._lock = threading.Lock()
+
+    def normalize(self, sql):
+        key = self._normalized.get(sql)
+        if key is None:
+            key = _SQL_LITERALS.sub("?", sql)
+            key = _SQL_SPACE.sub(" ", _SQL_PARAM_LISTS.sub("(?+)",
+                                                           key)).strip()
+            if len(self._normalized) < 4096:
+                self._normalized[sql] = key
+        return key
+
+    def record(self, conn, sql, params, elapsed_ms, rows):
+        """Add one execution; `conn` is used for the slow-query plan and
+        may be None to skip it"""
+        key = self.normalize(sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "samples": deque(maxlen=self.samples),
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += rows
+            entry["samples"].append(elapsed_ms)
+        if elapsed_ms >= self.slow_ms:
+            self._log_slow(conn, sql, params, key, elapsed_ms, rows)
+
+    def _log_slow(self, conn, sql, params, key, elapsed_ms, rows):
+        plan = None
+        if (conn is not None and key.upper().startswith(_SQL_EXPLAINABLE)
+                and params is not None):
+            try:
+                # Plain cursor, so the plan query is not itself recorded
+                plan = [
+                    row[-1] for row in sqlite3.Connection.cursor(conn).execute(
+                        f"EXPLAIN QUERY PLAN {sql}", params)
+                ]
+            except sqlite3.Error as e:
+                plan = [f"unavailable: {e}"]
+        entry = {
+            "at": datetime.datetime.now(timezone.utc).isoformat(),
+            "statement": key,
+            "ms": round(elapsed_ms, 2),
+            "rows": rows,
+            "plan": plan,
+        }
+        with self._lock:
+            self.slow_count += 1
+            self.slow_log.append(entry)
+        logger.warning(f"🐢 Slow query ({elapsed_ms:.1f} ms, {rows} rows): "
+                       f"{key[:200]} | plan: {plan}")
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        return ordered[max(0, -(-pct * len(ordered) // 100) - 1)]
+
+    def snapshot(self, limit=10):
+        """Statements ordered by total time spent in them"""
+        with self._lock:
+            items = [(key, dict(entry), list(entry["samples"]))
+                     for key, entry in self._stats.items()]
+        items.sort(key=lambda item: item[1]["total_ms"], reverse=True)
+        report = []
+        for key, entry, samples in items[:limit]:
+            ordered = sorted(samples)
+            report.append({
+                "statement":
+                key,
+                "count":
+                entry["count"],
+                "total_ms":
+                round(entry["total_ms"], 2),
+                "avg_ms":
+                round(entry["total_ms"] / entry["count"], 3),
+                "p50_ms":
+                round(self._percentile(ordered, 50), 3),
+                "p95_ms":
+                round(self._percentile(ordered, 95), 3),
+                "p99_ms":
+                round(self._percentile(ordered, 99), 3),
+                "max_ms":
+                round(entry["max_ms"], 3),
+                "rows":
+                entry["rows"],
+            })
+        return report
+
+    def stats(self, limit=5):
+        with self._lock:
+            statements = len(self._stats)
+            slow = list(self.slow_log)[-limit:]
+        return {
+            "statements": statements,
+            "slow_ms": self.slow_ms,
+            "slow_queries": self.slow_count,
+            "top": self.snapshot(limit),
+            "recent_slow": slow,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.slow_log.clear()
+            self.slow_count = 0
+
+
+sql_metrics = SqlMetrics()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute() plus every fetch of its result set and
+    reports one sample per execution to sql_metrics. An execution ends
+    when its rows are exhausted, the cursor is reused or closed, or the
+    cursor is released."""
+
+    _sql = None
+
+    def _begin(self, sql, params, started):
+        self._finish()
+        self._sql = sql
+        self._params = params
+        self._elapsed = time.perf_counter() - started
+        self._rows = 0
+
+    def _fetched(self, started, rows, done):
+        if self._sql is None:
+            return
+        self._elapsed += time.perf_counter() - started
+        self._rows += rows
+        if done:
+            self._finish()
+
+    def _finish(self, capture_plan=True):
+        if self._sql is not None:
+            sql, self._sql = self._sql, None
+            if sql_metrics.enabled:
+                sql_metrics.record(self.connection if capture_plan else None,
+                                   sql, self._params, self._elapsed * 1000,
+                                   self._rows)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        first = seq_of_parameters[0] if isinstance(
+            seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._begin(sql, first, started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # GC may run this on any thread, or after the connection closed:
+        # keep the timing sample but never query the connection here
+        try:
+            self._finish(capture_plan=False)
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including the execute() shortcuts)
+    report to sql_metrics"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def open_db_connection(db_file, profile="default", read_only=False, **kwargs):
+    """Open a SQLite connection and apply a PRAGMA profile to it"""
+    if read_only:
+        db_file = f"file:{db_file}?mode=ro"
+        kwargs["uri"] = True
+    kwargs.setdefault("factory", InstrumentedConnection)
+    conn = sqlite3.connect(db_file,
+                           timeout=30,
+                           check_same_thread=False,
+                           **kwargs)
+    for pragma, value in DB_PRAGMA_PROFILES[profile].items():
+        conn.execute(f"PRAGMA {pragma}={value}")
+    return conn
 
 
 class DatabasePool:
 
-    def __init__(self, db_file, max_connections=5):
+    def __init__(self,
+                 db_file,
+                 max_connections=5,
+                 profile="default",
+                 read_only=False):
         self.db_file = db_file
         self.max_connections = max_connections
+        self.profile = profile
+        self.read_only = read_only
         self._pool = Queue(maxsize=max_connections)
         self._lock = threading.Lock()
-        self._initialized = False
-
-    def _initialize_pool(self):
-        if not self._initialized:
+        self._created = 0
+        self._generation = 0
+        self._conn_generation = {}
+
+        # Pool statistics
+        self.checkouts = 0
+        self.exhausted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _connect(self):
+        return open_db_connection(self.db_file,
+                                  self.profile,
+                                  read_only=self.read_only)
+
+    def _checkout(self):
+        start = time.perf_counter()
+        try:
+            conn = self._pool.get_nowait()
+        except Empty:
+            with self._lock:
+                # Open connections lazily up to max_connections
+                grow = self._created < self.max_connections
+                if grow:
+                    self._created += 1
+                else:
+                    self.exhausted += 1
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                with self._lock:
+                    self._conn_generation[id(conn)] = self._generation
+            else:
+                conn = self._pool.get(timeout=10)
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return conn
+
+    def _checkin(self, conn):
+        # Never hand an open transaction to the next borrower
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            stale = self._conn_generation.get(id(conn)) != self._generation
+            if stale:
+                self._conn_generation.pop(id(conn), None)
+        if stale:
+            # Opened before close_all(): swap it for a fresh connection so
+            # threads already waiting on the queue are not starved
+            conn.close()
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
             with self._lock:
-                if not self._initialized:
-                    for _ in range(self.max_connections):
-                        conn = sqlite3.connect(self.db_file,
-                                               timeout=30,
-                                               check_same_thread=False)
-                        conn.execute("PRAGMA journal_mode=WAL")
-                        conn.execute("PRAGMA foreign_keys=ON")
-                        self._pool.put(conn)
-                    self._initialized = True
+                self._conn_generation[id(conn)] = self._generation
+        self._pool.put(conn)
 
     @contextlib.contextmanager
     def get_connection(self):
-        self._initialize_pool()
-        conn = self._pool.get(timeout=10)
+        conn = self._checkout()
         try:
             yield conn
         except sqlite3.Error as e:
@@ -64,14 +438,259 @@ class DatabasePool:
             conn.rollback()
             raise
         finally:
-            self._pool.put(conn)
+            self._checkin(conn)
+
+    def close_all(self):
+        """Close idle connections and retire busy ones as they come back.
+        Call this before the database file is replaced on disk."""
+        with self._lock:
+            self._generation += 1
+            while True:
+                try:
+                    conn = self._pool.get_nowait()
+                except Empty:
+                    break
+                self._conn_generation.pop(id(conn), None)
+                self._created -= 1
+                conn.close()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._lock:
+            avg_wait = self.total_wait / self.checkouts if self.checkouts else 0
+            return {
+                "size": self.max_connections,
+                "open": self._created,
+                "idle": self._pool.qsize(),
+                "checkouts": self.checkouts,
+                "exhausted": self.exhausted,
+                "avg_wait_ms": round(avg_wait * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class GroupCommitWriter:
+    """Single writer thread that collects write intents from every command
+    and commits them together, one fsync per batch instead of per call.
+
+    An intent is a callable `func(conn, *args, **kwargs)` that issues its
+    statements on the writer connection without committing. Each intent
+    runs inside its own SAVEPOINT, so one failing intent is rolled back
+    alone while the rest of the batch still commits."""
+
+    def __init__(self, db_file, max_batch=64, max_delay=0.005):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.max_delay = max_delay  # seconds to wait for more intents
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._thread = None
+        self._intent_hooks = []  # on_commit callbacks of the running intent
+        self._intent_aborts = []  # on_abort callbacks of the running intent
+        self.context = None  # contextvars.Context the writer thread runs in
+
+        # Writer statistics
+        self.batches = 0
+        self.intents = 0
+        self.failed_intents = 0
+        self.largest_batch = 0
+        self.total_commit_time = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    target = self._run
+                    if self.context is not None:
+                        target = functools.partial(self.context.copy().run,
+                                                   self._run)
+                    self._thread = threading.Thread(target=target,
+                                                    name="db-writer",
+                                                    daemon=True)
+                    self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a write intent; returns a concurrent.futures.Future that
+        resolves once the batch containing it has committed"""
+        future = concurrent.futures.Future()
+        self._ensure_started()
+        self._queue.put((func, args, kwargs, future))
+        return future
+
+    async def write(self, func, *args, **kwargs):
+        """Awaitable form of submit() for use from the event loop"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+
+    def on_commit(self, callback):
+        """Run `callback()` once the current intent's batch has committed.
+        Only valid from inside an intent; dropped if the intent rolls back."""
+        self._intent_hooks.append(callback)
+
+    def on_abort(self, callback):
+        """Run `callback()` if the current intent is rolled back, either on
+        its own or because its whole batch failed to commit"""
+        self._intent_aborts.append(callback)
+
+    @staticmethod
+    def _run_hooks(callbacks):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"❌ Writer hook failed: {e}")
+
+    def _commit_batch(self, batch):
+        outcomes = []
+        hooks = []
+        aborts = []
+        with self._lock:
+            try:
+                if self._conn is None:
+                    # Explicit BEGIN/COMMIT below, so run in autocommit mode
+                    self._conn = open_db_connection(self.db_file,
+                                                    "writer",
+                                                    isolation_level=None)
+                conn = self._conn
+                start = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                for func, args, kwargs, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT intent")
+                    self._intent_hooks = []
+                    self._intent_aborts = []
+                    try:
+                        result = func(conn, *args, **kwargs)
+                        conn.execute("RELEASE intent")
+                        hooks.extend(self._intent_hooks)
+                        aborts.extend(self._intent_aborts)
+                        self._intent_aborts = []
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO intent")
+                        conn.execute("RELEASE intent")
+                        self._run_hooks(self._intent_aborts)
+                        self._intent_aborts = []
+                        outcomes.append((future, None, e))
+                conn.execute("COMMIT")
+                elapsed = time.perf_counter() - start
+            except Exception as e:
+                logger.error(f"❌ Group commit failed: {e}")
+                if self._conn is not None and self._conn.in_transaction:
+                    self._conn.rollback()
+                self._run_hooks(aborts + self._intent_aborts)
+                self._intent_aborts = []
+                # Nothing in this batch is durable, fail every caller
+                for func, args, kwargs, future in batch:
+                    if future.running() or future.set_running_or_notify_cancel(
+                    ):
+                        future.set_exception(e)
+                return
+
+        self.batches += 1
+        self.intents += len(outcomes)
+        self.largest_batch = max(self.largest_batch, len(outcomes))
+        self.total_commit_time += elapsed
+        # Hooks run before callers resume, so they observe their own writes
+        self._run_hooks(hooks)
+        for future, result, error in outcomes:
+            if error is not None:
+                self.failed_intents += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def drain(self, timeout=None):
+        """Block until every intent queued so far has committed. Never
+        call from inside an intent."""
+        self.submit(lambda conn: None).result(timeout)
+
+    def discard_queued(self):
+        """Fail every intent still waiting in the queue. Used when the
+        database file is replaced, so nothing aimed at the old file lands
+        in the new one. Returns how many were dropped."""
+        dropped = 0
+        stop = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except Empty:
+                break
+            if item is None:
+                stop = True
+                continue
+            future = item[3]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(
+                    RuntimeError("database was replaced before this write"))
+            dropped += 1
+        if stop:
+            self._queue.put(None)
+        return dropped
+
+    def reset(self):
+        """Close the writer connection; the next batch reopens it.
+        Call this before the database file is replaced on disk."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stop(self, timeout=10):
+        """Commit everything already queued, then stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        self.reset()
+
+    def stats(self):
+        """Snapshot of group-commit counters"""
+        avg_batch = self.intents / self.batches if self.batches else 0
+        avg_commit = self.total_commit_time / self.batches if self.batches else 0
+        return {
+            "batches": self.batches,
+            "intents": self.intents,
+            "failed_intents": self.failed_intents,
+            "queued": self._queue.qsize(),
+            "avg_batch": round(avg_batch, 2),
+            "largest_batch": self.largest_batch,
+            "avg_commit_ms": round(avg_commit * 1000, 3),
+        }
 
 
 # Define constants first
 DB_FILE = "bot_database.db"
 
-# Initialize database pool
+# Initialize database pools and the single group-commit writer
 db_pool = DatabasePool(DB_FILE)
+db_read_pool = DatabasePool(DB_FILE,
+                            max_connections=DB_READ_WORKERS,
+                            profile="reader",
+                            read_only=True)
+db_writer = GroupCommitWriter(DB_FILE)
 
 
 @contextlib.contextmanager
@@ -80,6 +699,107 @@ def get_db_connection():
         yield conn
 
 
+@contextlib.contextmanager
+def get_db_read_connection():
+    """Read-only WAL connection; sees the last committed snapshot"""
+    with db_read_pool.get_connection() as conn:
+        yield conn
+
+
+def quiesce_writes():
+    """Commit every buffered and queued write to the current file and
+    checkpoint it, so a copy of the file is complete (blocking). Call
+    before taking a pre-restore copy."""
+    for step in (functools.partial(transaction_log.flush, wait=True),
+                 functools.partial(monthly_stats_buffer.flush,
+                                   wait=True), db_writer.drain):
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not flush pending writes: {e}")
+    try:
+        with get_db_connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception as e:
+        logger.warning(f"⚠️ Pre-restore checkpoint failed: {e}")
+
+
+def close_db_connections():
+    """Release every open handle on DB_FILE before it is replaced on disk,
+    and drop cached rows and pending writes that belong to the old file"""
+    dropped = (transaction_log.clear() + monthly_stats_buffer.clear() +
+               db_writer.discard_queued())
+    if dropped:
+        logger.warning(
+            f"⚠️ Dropped {dropped} pending writes aimed at the old database")
+    db_pool.close_all()
+    db_read_pool.close_all()
+    db_writer.reset()
+    forget_cached_rows()
+
+
+def forget_cached_rows():
+    """Drop cached user rows and mark the leaderboards stale. Commands keep
+    reading while a restore runs and may cache the old file's rows again,
+    so call this once more after the new file is in place."""
+    user_cache.clear()
+    leaderboards.invalidate()
+
+
+async def run_db(func, *args, **kwargs):
+    """Run a blocking database function on DB_POOL and await its result.
+    It runs in a copy of the caller's context, so the active database
+    partition carries over to the worker thread."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        DB_POOL, functools.partial(context.run, func, *args, **kwargs))
+
+
+def db_executor(func):
+    """Decorator that turns a blocking SQLite helper into an awaitable
+    running on DB_POOL"""
+
+    @functools.wraps(func)
+    async def executor_wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+
+    return executor_wrapper
+
+
+async def run_db_read(func, *args, **kwargs):
+    """Run a blocking read-only function on DB_READ_POOL (in the caller's
+    context, like run_db)"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        DB_READ_POOL, functools.partial(context.run, func, *args, **kwargs))
+
+
+def db_reader(func):
+    """Like db_executor, for helpers that only use get_db_read_connection.
+    They run on DB_READ_POOL, never behind writes or maintenance."""
+
+    @functools.wraps(func)
+    async def reader_wrapper(*args, **kwargs):
+        return await run_db_read(func, *args, **kwargs)
+
+    return reader_wrapper
+
+
+def db_write(func):
+    """Decorator for write intents `func(conn, *args)`: calling the result
+    queues the intent on the group-commit writer and awaits durability.
+    `.intent` is the raw function for composing inside another intent."""
+
+    @functools.wraps(func)
+    async def write_wrapper(*args, **kwargs):
+        return await db_writer.write(func, *args, **kwargs)
+
+    write_wrapper.intent = func
+    return write_wrapper
+
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -96,28 +816,19 @@ def signal_handler(signum, frame):
     signal_name = "SIGTERM" if signum == 15 else "SIGINT" if signum == 2 else f"Signal {signum}"
     logger.info(f"🛑 Shutdown signal received: {signal_name}")
 
-    # For hosting platforms, we want to shut down gracefully
+    # For hosting platforms, we want to shut down gracefully. Closing the
+    # bot makes bot.start() return, and main()'s cleanup then flushes, backs
+    # up and closes every partition.
     if bot and not bot.is_closed():
-        logger.info("🔄 Initiating graceful bot shutdown...")
-        try:
-            # Try to create a final backup
-            backup_file = create_backup_with_cloud_storage()
-            if backup_file and github_backup:
-                success, result = github_backup.upload_backup_to_github(
-                    backup_file)
-                if success:
-                    logger.info("✅ Emergency backup created before shutdown")
-        except Exception as e:
-            logger.error(f"❌ Emergency backup failed: {e}")
-
-        # Close the bot
         try:
             loop = asyncio.get_event_loop()
             if loop.is_running():
-                loop.create_task(bot.close())
+                logger.info("🔄 Initiating graceful bot shutdown...")
+                loop.call_soon_threadsafe(
+                    lambda: asyncio.ensure_future(bot.close()))
+                return
         except Exception as e:
             logger.exception(f"An unexpected error occurred: {e}")
-            pass
 
     logger.info("🛑 Bot shutdown complete")
     sys.exit(0)
@@ -203,9 +914,359 @@ class TimedCache:
         self.cache.clear()
 
 
+class LRUCache:
+    """Bounded, thread-safe LRU cache used as a write-through cache.
+
+    `version` is bumped on every write-side change; readers capture it
+    before loading from the database and pass it to set(), which drops
+    the value if a write landed in between and it may already be stale."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key, **fields):
+        """Write-through: patch a cached entry in place if present"""
+        with self._lock:
+            self.version += 1
+            value = self.cache.get(key)
+            if value is not None:
+                self.cache[key] = {**value, **fields}
+
+    def invalidate(self, key):
+        with self._lock:
+            self.version += 1
+            self.cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self.cache.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return {
+            "entries": len(self.cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(hit_rate, 1),
+        }
+
+
+class _SkipNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, level):
+        self.key = key
+        self.next = [None] * level
+        self.width = [1] * level  # positions skipped by each link
+
+
+class IndexableSkipList:
+    """Sorted list with O(log n) insert, remove, rank and index lookups.
+
+    Every forward link records how many bottom-level positions it skips,
+    so walking towards a key also counts how many keys precede it."""
+
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self.head = _SkipNode(None, self.MAX_LEVEL)
+        self.size = 0
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """Build in O(n) from keys that are already sorted"""
+        skiplist = cls()
+        last = [skiplist.head] * cls.MAX_LEVEL
+        last_pos = [0] * cls.MAX_LEVEL
+        for pos, key in enumerate(keys, 1):
+            node = _SkipNode(key, cls._random_level())
+            for i in range(len(node.next)):
+                last[i].next[i] = node
+                last[i].width[i] = pos - last_pos[i]
+                last[i], last_pos[i] = node, pos
+        skiplist.size = len(keys)
+        for i in range(cls.MAX_LEVEL):
+            last[i].width[i] = skiplist.size + 1 - last_pos[i]
+        return skiplist
+
+    @classmethod
+    def _random_level(cls):
+        level = 1
+        while level < cls.MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVEL
+        steps_at_level = [0] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                steps_at_level[i] += node.width[i]
+                node = node.next[i]
+            chain[i] = node
+
+        new_node = _SkipNode(key, self._random_level())
+        steps = 0
+        for i in range(len(new_node.next)):
+            prev = chain[i]
+            new_node.next[i] = prev.next[i]
+            prev.next[i] = new_node
+            new_node.width[i] = prev.width[i] - steps
+            prev.width[i] = steps + 1
+            steps += steps_at_level[i]
+        for i in range(len(new_node.next), self.MAX_LEVEL):
+            chain[i].width[i] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVEL
+        node = self.head
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            chain[i] = node
+
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for i in range(len(target.next)):
+            chain[i].width[i] += target.width[i] - 1
+            chain[i].next[i] = target.next[i]
+        for i in range(len(target.next), self.MAX_LEVEL):
+            chain[i].width[i] -= 1
+        self.size -= 1
+
+    def index(self, key):
+        """0-based position of `key`"""
+        node = self.head
+        position = 0
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.next[i].key < key:
+                position += node.width[i]
+                node = node.next[i]
+        target = node.next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start, stop):
+        """Keys at positions [start, stop)"""
+        start = max(start, 0)
+        stop = min(stop, self.size)
+        if start >= stop:
+            return []
+        node = self.head
+        remaining = start + 1
+        for i in reversed(range(self.MAX_LEVEL)):
+            while node.next[i] is not None and node.width[i] <= remaining:
+                remaining -= node.width[i]
+                node = node.next[i]
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def __len__(self):
+        return self.size
+
+
+class Leaderboard:
+    """One field's scores ordered highest first, with O(log n) updates,
+    rank lookups and neighbour views"""
+
+    def __init__(self, scores=None):
+        self.scores = dict(scores or {})
+        self._ordered = IndexableSkipList.from_sorted(
+            sorted(
+                (-score, user_id) for user_id, score in self.scores.items()))
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self._ordered.remove((-old, user_id))
+        self.scores[user_id] = score
+        self._ordered.insert((-score, user_id))
+
+    def top(self, limit=10):
+        return [(user_id, -neg_score)
+                for neg_score, user_id in self._ordered.slice(0, limit)]
+
+    def around(self, user_id, radius=5):
+        """Return (rank, rows) where rows are (rank, user_id, score) for
+        the user and up to `radius` neighbours each side; None if the user
+        has no score on this board"""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        index = self._ordered.index((-score, user_id))
+        start = max(index - radius, 0)
+        rows = [(start + offset + 1, uid, -neg_score)
+                for offset, (neg_score, uid) in enumerate(
+                    self._ordered.slice(start, index + radius + 1))]
+        return index + 1, rows
+
+    def __len__(self):
+        return len(self.scores)
+
+
+class LeaderboardEngine:
+    """In-memory leaderboards for balance, SP and this month's losses.
+
+    Boards are loaded once from the database and then kept current by
+    post-commit hooks from the group-commit writer, so top-N reads never
+    touch SQLite. After the database file is replaced they are marked
+    stale and reloaded on the next read."""
+
+    FIELDS = ("balance", "sp")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._rebuild_lock = None  # asyncio.Lock, created on first use
+        self.month = None
+        self.boards = {
+            "balance": Leaderboard(),
+            "sp": Leaderboard(),
+            "losses": Leaderboard()
+        }
+        self.rebuilds = 0
+
+    def load_intent(self, conn):
+        """Write intent that snapshots every board from the database.
+        Runs on the writer, so no committed update can slip between the
+        snapshot and the swap."""
+        users = conn.execute(
+            'SELECT user_id, balance, sp FROM users').fetchall()
+        boards = {
+            "balance": Leaderboard({
+                u: b
+                for u, b, _ in users
+            }),
+            "sp": Leaderboard({
+                u: sp
+                for u, _, sp in users
+            }),
+        }
+        db_writer.on_commit(functools.partial(self._swap, boards))
+
+        # Losses also move with unflushed monthly stats deltas, so that
+        # board is merged and swapped while the deltas are held still
+        month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+        with monthly_stats_buffer.lock:
+            losses = dict(
+                conn.execute(
+                    'SELECT user_id, losses FROM monthly_stats WHERE month = ?',
+                    (month, )).fetchall())
+            for user_id, (_, pending) in monthly_stats_buffer.pending_month(
+                    month).items():
+                losses[user_id] = losses.get(user_id, 0) + pending
+            board = Leaderboard(losses)
+            with self._lock:
+                self.boards["losses"] = board
+                self.month = month
+
+    def _swap(self, boards):
+        with self._lock:
+            self.boards.update(boards)
+            self._ready = True
+            self.rebuilds += 1
+        logger.info(f"🏆 Leaderboards rebuilt ({len(boards['balance'])} users)")
+
+    async def rebuild(self):
+        await db_writer.write(self.load_intent)
+
+    async def ensure_ready(self):
+        if self._ready:
+            return
+        if self._rebuild_lock is None:
+            self._rebuild_lock = asyncio.Lock()
+        async with self._rebuild_lock:
+            if not self._ready:
+                await self.rebuild()
+
+    def invalidate(self):
+        """Mark every board stale, e.g. before the database file is replaced"""
+        with self._lock:
+            self._ready = False
+
+    def update_user(self, user_id, **fields):
+        with self._lock:
+            for field in self.FIELDS:
+                if field in fields:
+                    self.boards[field].update(user_id, fields[field])
+
+    def add_losses(self, user_id, month, amount):
+        with self._lock:
+            if self.month != month:
+                if self.month is not None and month < self.month:
+                    return
+                # A new month starts with an empty board
+                self.boards["losses"] = Leaderboard()
+                self.month = month
+            board = self.boards["losses"]
+            board.update(user_id, board.scores.get(user_id, 0) + amount)
+
+    async def around(self, field, user_id, radius=5):
+        await self.ensure_ready()
+        with self._lock:
+            return self.boards[field].around(user_id, radius)
+
+    async def top(self, field, limit=10, month=None):
+        await self.ensure_ready()
+        with self._lock:
+            if field == "losses" and month is not None and month != self.month:
+                return []
+            return self.boards[field].top(limit)
+
+    def stats(self):
+        return {
+            "ready": self._ready,
+            "month": self.month,
+            "rebuilds": self.rebuilds,
+            **{
+                f"{field}_entries": len(board)
+                for field, board in self.boards.items()
+            }
+        }
+
+
 # Create cache instances
-user_cache = TimedCache(ttl_seconds=60)  # Cache user data for 1 minute
-leaderboard_cache = TimedCache(ttl_seconds=300)
+user_cache = LRUCache(max_entries=1000)  # Hot user rows, write-through
+leaderboards = LeaderboardEngine()
 # Register signal handlers
 signal.signal(signal.SIGTERM, signal_handler)
 signal.signal(signal.SIGINT, signal_handler)
@@ -226,6 +1287,7 @@ COMMAND_COOLDOWNS = {
     'help': 5,  # 5 seconds
     'sendsp': 5,  # ADD THIS - 5 seconds cooldown
     'nextconvert': 10,  # 10 seconds
+    'rank': 5,  # 5 seconds
 }
 
 # Global rate limiting storage
@@ -498,16 +1560,14 @@ async def safe_add_reaction(message, emoji):
     return await safe_api_call(message.add_reaction, emoji)
 
 
-async def check_database_integrity():
-    """Check if database is corrupted and attempt repair"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute("PRAGMA integrity_check;").fetchone()
-        conn.close()
-        return True
-    except sqlite3.DatabaseError as e:
-        logger.error(f"❌ Database corruption detected: {e}")
-        return False
+async def check_database_integrity(full=False):
+    """Check if database is corrupted (quick_check unless `full`). Runs on
+    DB_POOL; the result is recorded by integrity_monitor."""
+    if full:
+        ok, _ = await integrity_monitor.run_full_check()
+    else:
+        ok, _ = await integrity_monitor.run_quick_check()
+    return ok
 
 
 async def init_database_async():
@@ -523,28 +1583,12 @@ async def init_database_async():
                 if not await restore_from_latest_backup():
                     # If no backup, create fresh database
                     logger.warning("🆕 Creating fresh database")
+                    close_db_connections()
                     os.remove(DB_FILE)
 
-        # Proceed with normal initialization
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        # Create tables with proper error handling
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                balance INTEGER DEFAULT 0,
-                sp INTEGER DEFAULT 100,
-                last_claim TEXT DEFAULT '',
-                streak INTEGER DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Add other tables...
-
-        conn.commit()
-        conn.close()
+        # Proceed with normal initialization (runs on DB_POOL)
+        await init_database()
+        forget_cached_rows()
 
         logger.info("✅ Database initialized successfully")
         return True
@@ -556,31 +1600,34 @@ async def init_database_async():
 
 async def repair_database():
     """Attempt to repair corrupted database"""
+    db_file = active_partition().db_file
     try:
         # Backup corrupted database
         timestamp = datetime.datetime.now(
             timezone.utc).strftime("%Y%m%d_%H%M%S")
-        corrupted_backup = f"{DB_FILE}.corrupted_{timestamp}"
-        shutil.copy2(DB_FILE, corrupted_backup)
+        corrupted_backup = f"{db_file}.corrupted_{timestamp}"
+        shutil.copy2(db_file, corrupted_backup)
         logger.info(f"💾 Corrupted database backed up to: {corrupted_backup}")
 
         # Try to dump and restore
         temp_dump = f"temp_dump_{timestamp}.sql"
 
         # Attempt to dump recoverable data
-        os.system(f"sqlite3 {DB_FILE} .dump > {temp_dump}")
+        os.system(f"sqlite3 {db_file} .dump > {temp_dump}")
 
         # Remove corrupted file
-        os.remove(DB_FILE)
+        close_db_connections()
+        os.remove(db_file)
 
         # Restore from dump
-        os.system(f"sqlite3 {DB_FILE} < {temp_dump}")
+        os.system(f"sqlite3 {db_file} < {temp_dump}")
 
         # Clean up
         os.remove(temp_dump)
 
         # Initialize database structure
         await init_database()
+        forget_cached_rows()
 
         logger.info("✅ Database repair attempted")
         return True
@@ -592,13 +1639,14 @@ async def repair_database():
 
 async def restore_from_latest_backup():
     """Restore database from latest backup"""
+    db_file = active_partition().db_file
     try:
-        backup_dir = "backups"
+        backup_dir = active_partition().backup_dir
         if not os.path.exists(backup_dir):
             logger.error("❌ No backup directory found")
             return False
 
-        backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.db')]
+        backup_files = [f for f in os.listdir(backup_dir) if is_backup_file(f)]
         if not backup_files:
             logger.error("❌ No backup files found")
             return False
@@ -610,12 +1658,16 @@ async def restore_from_latest_backup():
         backup_path = os.path.join(backup_dir, latest_backup)
 
         # Backup current corrupted file
+        await run_db(quiesce_writes)
         timestamp = datetime.datetime.now(
             timezone.utc).strftime("%Y%m%d_%H%M%S")
-        shutil.copy2(DB_FILE, f"{DB_FILE}.corrupted_{timestamp}")
+        shutil.copy2(db_file, f"{db_file}.corrupted_{timestamp}")
 
         # Restore from backup
-        shutil.copy2(backup_path, DB_FILE)
+        close_db_connections()
+        await run_db(restore_backup_file, backup_path, db_file)
+        await init_database()  # Older backups may predate later migrations
+        forget_cached_rows()
 
         logger.info(f"✅ Database restored from backup: {latest_backup}")
         return True
@@ -688,6 +1740,21 @@ GITHUB_BACKUP_REPO = os.getenv(
     "GITHUB_BACKUP_REPO")  # Format: "username/repo-name"
 GITHUB_API_BASE = "https://api.github.com"
 
+# Online backups copy this many pages per step, pausing in between
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "1024"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "5"))
+# "auto" (zstd if installed, else gzip), "zstd", "gzip" or "none"
+BACKUP_COMPRESSION = os.getenv("BACKUP_COMPRESSION", "auto").lower()
+BACKUP_COMPRESSION_LEVEL = os.getenv("BACKUP_COMPRESSION_LEVEL")
+# "incremental" stores only the pages changed since the previous backup,
+# with a full base image every BACKUP_FULL_EVERY backups; "full" disables
+BACKUP_MODE = os.getenv("BACKUP_MODE", "incremental").lower()
+BACKUP_FULL_EVERY = int(os.getenv("BACKUP_FULL_EVERY", "8"))
+
+# Transactions older than this are rolled up, archived and removed
+TRANSACTION_RETENTION_DAYS = int(os.getenv("TRANSACTION_RETENTION_DAYS", "90"))
+TRANSACTION_ARCHIVE_DIR = "archives"
+
 SHOP_ITEMS = {
     "nickname_lock": {
         "price": 5000,
@@ -709,9 +1776,20 @@ SHOP_ITEMS = {
 
 
 # ==== Database Setup ====
-async def init_database():
-    """Initialize SQLite database with all required tables"""
-    conn = sqlite3.connect(DB_FILE)
+def epoch_ms(dt=None):
+    """Epoch milliseconds, the storage format of every time column"""
+    if dt is None:
+        return time.time_ns() // 1_000_000
+    return int(dt.timestamp() * 1000)
+
+
+def from_epoch_ms(ms):
+    """Aware UTC datetime for a stored epoch-milliseconds value"""
+    return datetime.datetime.fromtimestamp(ms / 1000, timezone.utc)
+
+
+def _migration_baseline(conn):
+    """v1: the tables and indexes every existing database already has"""
     cursor = conn.cursor()
 
     # Users table for economy data
@@ -756,7 +1834,7 @@ async def init_database():
         )
     ''')
 
-    # Add this table creation in init_database() function
+    # Name change cards
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS name_change_cards (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -806,99 +1884,586 @@ async def init_database():
         'CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions(timestamp DESC)'
     )
 
-    conn.commit()
-    conn.close()
 
+def _migration_retention_tables(conn):
+    """v2: conversion checkpoints, transaction rollups and the daily columns"""
+    cursor = conn.cursor()
 
-# ==== Database Helper Functions ====
-def get_user_data(user_id):
-    """Fetch user data without overwriting restored values unless new"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'SELECT user_id, balance, sp, last_claim, streak, created_at FROM users WHERE user_id = ?',
-                (user_id, ))
-            user = cursor.fetchone()
+    # Checkpoints for chunked SP → SS conversions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversion_runs (
+            run_id TEXT PRIMARY KEY,
+            last_user_id TEXT DEFAULT '',
+            users_converted INTEGER DEFAULT 0,
+            sp_converted INTEGER DEFAULT 0,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            completed_at TEXT
+        )
+    ''')
 
-            # If user not found, insert with default starting values
-            if not user:
-                cursor.execute(
-                    '''
-                    INSERT INTO users (user_id, balance, sp, streak)
-                    VALUES (?, 0, 100, 0)
-                    ''', (user_id, ))
-                conn.commit()
-                cursor.execute(
-                    'SELECT user_id, balance, sp, last_claim, streak, created_at FROM users WHERE user_id = ?',
-                    (user_id, ))
-                user = cursor.fetchone()
+    # Per-user monthly summaries of archived transactions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_rollups (
+            user_id TEXT,
+            month TEXT,
+            transaction_type TEXT,
+            tx_count INTEGER DEFAULT 0,
+            total_amount INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, month, transaction_type)
+        )
+    ''')
 
-            return {
-                'user_id': user[0],
-                'balance': user[1],
-                'sp': user[2],
-                'last_claim': user[3],
-                'streak': user[4],
-                'created_at': user[5]
-            }
+    # Databases patched by hand for the old !daily code carry last_daily /
+    # daily_streak; fold them into the columns the code actually uses.
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(users)')}
+    if {'last_daily', 'daily_streak'} <= columns:
+        cursor.execute('''
+            UPDATE users
+            SET last_claim = last_daily,
+                streak = COALESCE(daily_streak, streak)
+            WHERE last_daily IS NOT NULL AND last_daily != ''
+        ''')
 
-    except Exception as e:
-        logger.error(f"❌ get_user_data error: {e}")
-        return {
-            'user_id': user_id,
-            'balance': 0,
-            'sp': 100,
-            'last_claim': None,
-            'streak': 0,
-            'created_at': None
-        }
 
+# Discord snowflakes stored as TEXT; anything else cannot map to a member
+_SNOWFLAKE_TEXT = ("{0} GLOB '[1-9]*' AND {0} NOT GLOB '*[^0-9]*' "
+                   "AND length({0}) <= 19")
 
-async def _safe_update_user_data(user_id, **kwargs):
-    """Helper function to perform the actual database update (async)"""
-    # Validate allowed fields to prevent injection
-    ALLOWED_FIELDS = {'balance', 'sp', 'last_claim', 'streak'}
 
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-
-            # Ensure user exists first
-            cursor.execute('SELECT user_id FROM users WHERE user_id = ?',
-                           (user_id, ))
-            if not cursor.fetchone():
-                cursor.execute(
-                    'INSERT INTO users (user_id, balance, sp, streak) VALUES (?, 0, 100, 0)',
-                    (user_id, ))
-
-            # Build update query with validated fields only
-            valid_updates = {
-                k: v
-                for k, v in kwargs.items() if k in ALLOWED_FIELDS
-            }
+def _rebuild_table(conn, table, create_sql, copy_sql):
+    """Recreate a table under a new definition and copy its rows across.
+    Foreign keys are off during migrations, so the drop/rename is safe."""
+    conn.execute(create_sql.format(table=f'{table}__new'))
+    conn.execute(copy_sql.format(table=f'{table}__new'))
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}__new RENAME TO {table}')
 
-            if valid_updates:
-                placeholders = ', '.join(f'{field} = ?'
-                                         for field in valid_updates.keys())
-                query = f'UPDATE users SET {placeholders} WHERE user_id = ?'
-                values = list(valid_updates.values()) + [user_id]
-                cursor.execute(query, values)
 
-            conn.commit()
-            return True
+def _migration_integer_snowflakes(conn):
+    """v3: INTEGER snowflake keys (users.user_id becomes the rowid)"""
+    _rebuild_table(
+        conn, 'users', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            sp INTEGER DEFAULT 100,
+            last_claim TEXT,
+            streak INTEGER DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        INSERT INTO {table} (user_id, balance, sp, last_claim, streak, created_at)
+        SELECT CAST(user_id AS INTEGER), balance, sp, last_claim, streak, created_at
+        FROM users WHERE ''' + _SNOWFLAKE_TEXT.format('user_id'))
+
+    # Rows of the composite-key tables live in their primary key B-tree
+    _rebuild_table(
+        conn, 'monthly_stats', '''
+        CREATE TABLE {table} (
+            user_id INTEGER,
+            month TEXT,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, month),
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        ) WITHOUT ROWID
+    ''', '''
+        INSERT INTO {table} (user_id, month, wins, losses)
+        SELECT CAST(user_id AS INTEGER), month, wins, losses
+        FROM monthly_stats
+        WHERE CAST(user_id AS INTEGER) IN (SELECT user_id FROM users)
+    ''')
 
-    except sqlite3.OperationalError as e:
-        logger.error(f"❌ Database error: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"❌ Update error: {e}")
-        return False
+    _rebuild_table(
+        conn, 'nickname_locks', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            locked_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        INSERT INTO {table} (user_id, locked_at)
+        SELECT CAST(user_id AS INTEGER), locked_at
+        FROM nickname_locks WHERE ''' + _SNOWFLAKE_TEXT.format('user_id'))
+
+    _rebuild_table(
+        conn, 'temp_admins', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            expires_at TEXT,
+            guild_id INTEGER,
+            granted_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        INSERT INTO {table} (user_id, expires_at, guild_id, granted_at)
+        SELECT CAST(user_id AS INTEGER), expires_at, CAST(guild_id AS INTEGER),
+               granted_at
+        FROM temp_admins WHERE ''' + _SNOWFLAKE_TEXT.format('user_id'))
+
+    _rebuild_table(
+        conn, 'name_change_cards', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER,
+            target_id INTEGER,
+            original_nickname TEXT,
+            new_nickname TEXT,
+            expires_at TEXT,
+            guild_id INTEGER,
+            used_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        INSERT INTO {table}
+        SELECT id, CAST(owner_id AS INTEGER), CAST(target_id AS INTEGER),
+               original_nickname, new_nickname, expires_at,
+               CAST(guild_id AS INTEGER), used_at
+        FROM name_change_cards
+    ''')
 
+    # Audit rows are kept even when their user id is malformed
+    _rebuild_table(
+        conn, 'transactions', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            transaction_type TEXT,
+            amount INTEGER,
+            balance_before INTEGER,
+            balance_after INTEGER,
+            description TEXT,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''', '''
+        INSERT INTO {table}
+        SELECT id, CAST(user_id AS INTEGER), transaction_type, amount,
+               balance_before, balance_after, description, timestamp
+        FROM transactions
+    ''')
 
-async def safe_db_operation(operation_func, *args, **kwargs):
-    """Safely execute database operations with error handling"""
-    max_retries = 3
+    _rebuild_table(
+        conn, 'transaction_rollups', '''
+        CREATE TABLE {table} (
+            user_id INTEGER,
+            month TEXT,
+            transaction_type TEXT,
+            tx_count INTEGER DEFAULT 0,
+            total_amount INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, month, transaction_type)
+        ) WITHOUT ROWID
+    ''', '''
+        INSERT INTO {table}
+        SELECT CAST(user_id AS INTEGER), month, transaction_type,
+               SUM(tx_count), SUM(total_amount)
+        FROM transaction_rollups
+        GROUP BY CAST(user_id AS INTEGER), month, transaction_type
+    ''')
+
+    # Resume points must compare against integer keys ('' sorts after them)
+    _rebuild_table(
+        conn, 'conversion_runs', '''
+        CREATE TABLE {table} (
+            run_id TEXT PRIMARY KEY,
+            last_user_id INTEGER DEFAULT 0,
+            users_converted INTEGER DEFAULT 0,
+            sp_converted INTEGER DEFAULT 0,
+            started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            completed_at TEXT
+        )
+    ''', '''
+        INSERT INTO {table}
+        SELECT run_id, COALESCE(CAST(NULLIF(last_user_id, '') AS INTEGER), 0),
+               users_converted, sp_converted, started_at, completed_at
+        FROM conversion_runs
+    ''')
+
+    # Dropping the old tables took their secondary indexes with them
+    for index_sql in (
+            'CREATE INDEX idx_users_balance ON users(balance DESC)',
+            'CREATE INDEX idx_users_sp ON users(sp DESC)',
+            'CREATE INDEX idx_monthly_stats_month ON monthly_stats(month)',
+            'CREATE INDEX idx_monthly_stats_losses ON monthly_stats(losses DESC)',
+            'CREATE INDEX idx_temp_admins_expires ON temp_admins(expires_at)',
+            'CREATE INDEX idx_name_change_cards_expires ON name_change_cards(expires_at)',
+            'CREATE INDEX idx_transactions_user_id ON transactions(user_id)',
+            'CREATE INDEX idx_transactions_timestamp ON transactions(timestamp DESC)',
+    ):
+        conn.execute(index_sql)
+
+
+def _iso_to_ms(column):
+    """SQL converting an ISO / CURRENT_TIMESTAMP string (UTC when it has no
+    offset) to epoch milliseconds; unparseable values become NULL"""
+    return (f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) "
+            f"AS INTEGER)")
+
+
+def _migration_epoch_ms(conn):
+    """v4: epoch-millisecond INTEGER time columns"""
+    _rebuild_table(
+        conn, 'users', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            sp INTEGER DEFAULT 100,
+            last_claim INTEGER,
+            streak INTEGER DEFAULT 0,
+            created_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+        )
+    ''', f'''
+        INSERT INTO {{table}} (user_id, balance, sp, last_claim, streak, created_at)
+        SELECT user_id, balance, sp, {_iso_to_ms('last_claim')}, streak,
+               {_iso_to_ms('created_at')}
+        FROM users
+    ''')
+
+    _rebuild_table(
+        conn, 'nickname_locks', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            locked_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+        )
+    ''', f'''
+        INSERT INTO {{table}} (user_id, locked_at)
+        SELECT user_id, {_iso_to_ms('locked_at')} FROM nickname_locks
+    ''')
+
+    _rebuild_table(
+        conn, 'temp_admins', '''
+        CREATE TABLE {table} (
+            user_id INTEGER PRIMARY KEY,
+            expires_at INTEGER NOT NULL,
+            guild_id INTEGER,
+            granted_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+        )
+    ''', f'''
+        INSERT INTO {{table}} (user_id, expires_at, guild_id, granted_at)
+        SELECT user_id, COALESCE({_iso_to_ms('expires_at')}, 0), guild_id,
+               {_iso_to_ms('granted_at')}
+        FROM temp_admins
+    ''')
+
+    _rebuild_table(
+        conn, 'name_change_cards', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER,
+            target_id INTEGER,
+            original_nickname TEXT,
+            new_nickname TEXT,
+            expires_at INTEGER NOT NULL,
+            guild_id INTEGER,
+            used_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+        )
+    ''', f'''
+        INSERT INTO {{table}}
+        SELECT id, owner_id, target_id, original_nickname, new_nickname,
+               COALESCE({_iso_to_ms('expires_at')}, 0), guild_id,
+               {_iso_to_ms('used_at')}
+        FROM name_change_cards
+    ''')
+
+    _rebuild_table(
+        conn, 'transactions', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            transaction_type TEXT,
+            amount INTEGER,
+            balance_before INTEGER,
+            balance_after INTEGER,
+            description TEXT,
+            timestamp INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+        )
+    ''', f'''
+        INSERT INTO {{table}}
+        SELECT id, user_id, transaction_type, amount, balance_before,
+               balance_after, description, {_iso_to_ms('timestamp')}
+        FROM transactions
+    ''')
+
+    # Expiry sweeps and retention are range scans on these
+    for index_sql in (
+            'CREATE INDEX idx_users_balance ON users(balance DESC)',
+            'CREATE INDEX idx_users_sp ON users(sp DESC)',
+            'CREATE INDEX idx_temp_admins_expires ON temp_admins(expires_at)',
+            'CREATE INDEX idx_name_change_cards_expires ON name_change_cards(expires_at)',
+            'CREATE INDEX idx_transactions_user_id ON transactions(user_id)',
+            'CREATE INDEX idx_transactions_timestamp ON transactions(timestamp)',
+    ):
+        conn.execute(index_sql)
+
+
+def _migration_integrity_checks(conn):
+    """v5: persisted integrity check results"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS integrity_checks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            target TEXT,
+            started_at INTEGER NOT NULL,
+            duration_ms REAL,
+            ok INTEGER NOT NULL,
+            detail TEXT
+        )
+    ''')
+    conn.execute(
+        'CREATE INDEX IF NOT EXISTS idx_integrity_checks_kind ON integrity_checks(kind, id)'
+    )
+
+
+def _migration_conversion_run_times(conn):
+    """v6: epoch-millisecond times on conversion checkpoints (missed by v4)"""
+    _rebuild_table(
+        conn, 'conversion_runs', '''
+        CREATE TABLE {table} (
+            run_id TEXT PRIMARY KEY,
+            last_user_id INTEGER DEFAULT 0,
+            users_converted INTEGER DEFAULT 0,
+            sp_converted INTEGER DEFAULT 0,
+            started_at INTEGER DEFAULT (CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)),
+            completed_at INTEGER
+        )
+    ''', f'''
+        INSERT INTO {{table}}
+        SELECT run_id, last_user_id, users_converted, sp_converted,
+               {_iso_to_ms('started_at')}, {_iso_to_ms('completed_at')}
+        FROM conversion_runs
+    ''')
+
+
+# Ordered (version, description, migrate(conn)) steps. Append only: once a
+# migration has shipped it is never edited, only followed by a new one.
+SCHEMA_MIGRATIONS = [
+    (1, "baseline schema", _migration_baseline),
+    (2, "conversion checkpoints and transaction rollups",
+     _migration_retention_tables),
+    (3, "integer snowflake keys", _migration_integer_snowflakes),
+    (4, "epoch-millisecond timestamps", _migration_epoch_ms),
+    (5, "integrity check history", _migration_integrity_checks),
+    (6, "epoch-millisecond conversion run times",
+     _migration_conversion_run_times),
+]
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+@db_executor
+def get_schema_version():
+    """Read PRAGMA user_version (runs on DB_POOL)"""
+    with get_db_connection() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _apply_migration(version, migrate):
+    """Run one migration on a dedicated connection (blocking, runs on DB_POOL).
+    Foreign keys are off so migrations can rebuild tables; they are checked
+    before COMMIT, and user_version is stamped in the same transaction."""
+    conn = open_db_connection(db_writer.db_file,
+                              "writer",
+                              isolation_level=None)
+    try:
+        conn.execute('PRAGMA foreign_keys=OFF')
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+                conn.execute('ROLLBACK')
+                return False  # Applied by a concurrent caller
+            migrate(conn)
+            violations = conn.execute('PRAGMA foreign_key_check').fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(
+                    f"migration v{version} left {len(violations)} "
+                    f"foreign key violations")
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.execute('COMMIT')
+        except BaseException:
+            # SQLite may already have rolled back (e.g. SQLITE_FULL); a
+            # second ROLLBACK would mask the real error
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return True
+    finally:
+        conn.close()
+
+
+async def init_database():
+    """Bring the schema up to SCHEMA_VERSION; a no-op when already current"""
+    started = time.perf_counter()
+    current = await get_schema_version()
+
+    if current > SCHEMA_VERSION:
+        logger.warning(f"⚠️ Database schema v{current} is newer than this "
+                       f"build (v{SCHEMA_VERSION}), skipping migrations")
+        return
+    if current == SCHEMA_VERSION:
+        logger.info(f"✅ Schema v{current} up to date "
+                    f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+    else:
+        for version, description, migrate in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            step_started = time.perf_counter()
+            await run_db(_apply_migration, version, migrate)
+            logger.info(
+                f"🧱 Applied migration v{version} ({description}) in "
+                f"{(time.perf_counter() - step_started) * 1000:.1f} ms")
+
+        # Cached rows and boards may carry pre-migration keys
+        user_cache.clear()
+        leaderboards.invalidate()
+        logger.info(f"✅ Schema migrated v{current} → v{SCHEMA_VERSION} "
+                    f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+    await run_db(_enable_incremental_vacuum)
+
+
+def _enable_incremental_vacuum():
+    """Switch a file created without auto_vacuum to INCREMENTAL (blocking).
+    That takes one full VACUUM, so it happens once per file; afterwards
+    WalMaintainer reclaims free pages a few at a time."""
+    with get_db_connection() as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+    started = time.perf_counter()
+    conn = open_db_connection(db_writer.db_file,
+                              "writer",
+                              isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    logger.info(f"🧹 Enabled incremental auto-vacuum in "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms")
+    return True
+
+
+# ==== Database Helper Functions ====
+USER_ROW_QUERY = 'SELECT user_id, balance, sp, last_claim, streak, created_at FROM users WHERE user_id = ?'
+
+
+def _user_row_to_dict(row):
+    return {
+        'user_id': row[0],
+        'balance': row[1],
+        'sp': row[2],
+        'last_claim': row[3],
+        'streak': row[4],
+        'created_at': row[5]
+    }
+
+
+@db_reader
+def _load_user_data(user_id):
+    """Read a user row (runs on DB_READ_POOL). Returns None for unknown
+    users."""
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(USER_ROW_QUERY, (user_id, ))
+        user = cursor.fetchone()
+    return _user_row_to_dict(user) if user else None
+
+
+@db_write
+def _create_user(conn, user_id):
+    """Insert a user with default starting values (write intent)"""
+    conn.execute(
+        '''
+        INSERT OR IGNORE INTO users (user_id, balance, sp, streak)
+        VALUES (?, 0, 100, 0)
+        ''', (user_id, ))
+    user = _user_row_to_dict(
+        conn.execute(USER_ROW_QUERY, (user_id, )).fetchone())
+    db_writer.on_commit(
+        functools.partial(publish_user_update,
+                          user_id,
+                          balance=user['balance'],
+                          sp=user['sp']))
+    return user
+
+
+async def get_user_data(user_id):
+    """Fetch user data without overwriting restored values unless new.
+    Served from the user cache for hot users."""
+    user = user_cache.get(user_id)
+    if user is None:
+        try:
+            version = user_cache.version
+            user = await _load_user_data(user_id)
+            if user is None:
+                # If user not found, insert with default starting values
+                user = await _create_user(user_id)
+        except Exception as e:
+            logger.error(f"❌ get_user_data error: {e}")
+            return {
+                'user_id': user_id,
+                'balance': 0,
+                'sp': 100,
+                'last_claim': None,
+                'streak': 0,
+                'created_at': None
+            }
+        user_cache.set(user_id, user, version)
+    return dict(user)
+
+
+def publish_user_update(user_id, **fields):
+    """Push committed user-row changes to the user cache and leaderboards.
+    Registered as a post-commit hook by every intent that changes users."""
+    user_cache.update(user_id, **fields)
+    leaderboards.update_user(user_id, **fields)
+
+
+@db_write
+def _safe_update_user_data(conn, user_id, **kwargs):
+    """Helper function to perform the actual database update (write intent)"""
+    # Validate allowed fields to prevent injection
+    ALLOWED_FIELDS = {'balance', 'sp', 'last_claim', 'streak'}
+
+    try:
+        cursor = conn.cursor()
+
+        # Ensure user exists first
+        cursor.execute('SELECT user_id FROM users WHERE user_id = ?',
+                       (user_id, ))
+        if not cursor.fetchone():
+            cursor.execute(
+                'INSERT INTO users (user_id, balance, sp, streak) VALUES (?, 0, 100, 0)',
+                (user_id, ))
+            db_writer.on_commit(
+                functools.partial(publish_user_update,
+                                  user_id,
+                                  balance=0,
+                                  sp=100))
+
+        # Build update query with validated fields only
+        valid_updates = {
+            k: v
+            for k, v in kwargs.items() if k in ALLOWED_FIELDS
+        }
+
+        if valid_updates:
+            placeholders = ', '.join(f'{field} = ?'
+                                     for field in valid_updates.keys())
+            query = f'UPDATE users SET {placeholders} WHERE user_id = ?'
+            values = list(valid_updates.values()) + [user_id]
+            cursor.execute(query, values)
+            db_writer.on_commit(
+                functools.partial(publish_user_update, user_id,
+                                  **valid_updates))
+
+        return True
+
+    except sqlite3.OperationalError as e:
+        logger.error(f"❌ Database error: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Update error: {e}")
+        return False
+
+
+async def safe_db_operation(operation_func, *args, **kwargs):
+    """Safely execute database operations with error handling"""
+    max_retries = 3
     retry_count = 0
 
     while retry_count < max_retries:
@@ -954,41 +2519,54 @@ async def safe_update_user_data(user_id, **kwargs):
     return False
 
 
-async def update_user_data(user_id: str, **kwargs):
+@db_write
+def _write_user_data(conn, user_id: int, **kwargs):
+    """Insert or update a user row (write intent)"""
+    cursor = conn.cursor()
+
+    # Get current data
+    cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id, ))
+    user_data = cursor.fetchone()
+
+    if not user_data:
+        # Create new user
+        cursor.execute(
+            """
+            INSERT INTO users (user_id, balance, sp, streak, last_claim)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user_id, kwargs.get('balance', 0), kwargs.get(
+                'sp', 100), kwargs.get('streak', 0), kwargs.get('last_claim')))
+    else:
+        # Update existing user
+        set_clauses = []
+        values = []
+
+        for key, value in kwargs.items():
+            if key in ['balance', 'sp', 'streak', 'last_claim']:
+                set_clauses.append(f"{key} = ?")
+                values.append(value)
+
+        if set_clauses:
+            values.append(user_id)
+            query = f"UPDATE users SET {', '.join(set_clauses)} WHERE user_id = ?"
+            cursor.execute(query, values)
+
+    row = cursor.execute(
+        "SELECT balance, sp, last_claim, streak FROM users WHERE user_id = ?",
+        (user_id, )).fetchone()
+    db_writer.on_commit(
+        functools.partial(publish_user_update,
+                          user_id,
+                          balance=row[0],
+                          sp=row[1],
+                          last_claim=row[2],
+                          streak=row[3]))
+
+
+async def update_user_data(user_id: int, **kwargs):
     """Update user data asynchronously - FIXED VERSION"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        # Get current data
-        cursor.execute("SELECT * FROM users WHERE user_id = ?", (user_id, ))
-        user_data = cursor.fetchone()
-
-        if not user_data:
-            # Create new user
-            cursor.execute(
-                """
-                INSERT INTO users (user_id, balance, sp, daily_streak, last_daily)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, kwargs.get('balance', 0), kwargs.get('sp', 100),
-                  kwargs.get('daily_streak', 0), kwargs.get('last_daily', '')))
-        else:
-            # Update existing user
-            set_clauses = []
-            values = []
-
-            for key, value in kwargs.items():
-                if key in ['balance', 'sp', 'daily_streak', 'last_daily']:
-                    set_clauses.append(f"{key} = ?")
-                    values.append(value)
-
-            if set_clauses:
-                values.append(user_id)
-                query = f"UPDATE users SET {', '.join(set_clauses)} WHERE user_id = ?"
-                cursor.execute(query, values)
-
-        conn.commit()
-        conn.close()
+        await _write_user_data(user_id, **kwargs)
         return True
 
     except sqlite3.Error as e:
@@ -1003,11 +2581,7 @@ async def update_user_data(user_id: str, **kwargs):
             if await repair_database():
                 # Retry the operation
                 try:
-                    conn = sqlite3.connect(DB_FILE)
-                    cursor = conn.cursor()
-                    # ... repeat the operation
-                    conn.commit()
-                    conn.close()
+                    await _write_user_data(user_id, **kwargs)
                     return True
                 except Exception:
                     # If repair fails, restore from backup
@@ -1019,26 +2593,28 @@ async def update_user_data(user_id: str, **kwargs):
         return False
 
 
-def get_monthly_stats(user_id, month=None):
-    """Get monthly gambling stats for user"""
+async def get_monthly_stats(user_id, month=None):
+    """Get monthly gambling stats for user, including unflushed deltas"""
     if not month:
         month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+    return await _read_monthly_stats(user_id, month)
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
 
-    cursor.execute(
-        '''
-        SELECT wins, losses FROM monthly_stats
-        WHERE user_id = ? AND month = ?
-    ''', (user_id, month))
-
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return {'wins': result[0], 'losses': result[1]}
-    return {'wins': 0, 'losses': 0}
+@db_reader
+def _read_monthly_stats(user_id, month):
+    """Read monthly_stats on DB_READ_POOL. Pending deltas are committed
+    first, so the row already includes them; reading them alongside the
+    table instead could miss a batch the writer is committing."""
+    monthly_stats_buffer.flush(wait=True)
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            SELECT wins, losses FROM monthly_stats
+            WHERE user_id = ? AND month = ?
+        ''', (user_id, month))
+        wins, losses = cursor.fetchone() or (0, 0)
+    return {'wins': wins, 'losses': losses}
 
 
 async def test_bot_connection():
@@ -1065,9 +2641,9 @@ async def startup_backup():
     """Create backup on startup"""
     try:
         if github_backup and os.path.exists(DB_FILE):
-            backup_file = create_backup_with_cloud_storage()
+            backup_file = await run_db(create_backup_with_cloud_storage)
             if backup_file:
-                success, result = github_backup.upload_backup_to_github(
+                success, result = await github_backup.upload_backup_to_github(
                     backup_file)
                 if success:
                     logger.info("✅ Startup backup created")
@@ -1078,30 +2654,136 @@ async def startup_backup():
         return False
 
 
-def update_monthly_stats(user_id, win_amount=0, loss_amount=0, month=None):
-    """Update monthly gambling stats"""
-    if not month:
-        month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+class MonthlyStatsBuffer:
+    """Accumulates win/loss deltas per (user_id, month) in memory and
+    flushes them as one upsert intent every `flush_interval` seconds, on
+    shutdown and before every backup. Deltas are only ever drained on the
+    writer thread, inside the flush intent."""
+
+    UPSERT_SQL = '''
+        INSERT INTO monthly_stats (user_id, month, wins, losses)
+        SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE user_id = ?)
+        ON CONFLICT (user_id, month) DO UPDATE SET
+            wins = wins + excluded.wins,
+            losses = losses + excluded.losses
+    '''
+
+    def __init__(self, writer, flush_interval=5.0):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.pending = {}  # (user_id, month) -> [wins, losses]
+        self.lock = threading.Lock()
+        self._timer = None
+
+        self.updates = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    def add(self, user_id, month, wins=0, losses=0):
+        with self.lock:
+            entry = self.pending.setdefault((user_id, month), [0, 0])
+            entry[0] += wins
+            entry[1] += losses
+            self.updates += 1
+            leaderboards.add_losses(user_id, month, losses)
+            if self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    def clear(self):
+        """Drop every pending delta (the database is being replaced);
+        returns how many (user, month) entries were dropped"""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            dropped = len(self.pending)
+            self.pending.clear()
+        return dropped
+
+    def pending_month(self, month):
+        """{user_id: (wins, losses)} for one month; caller holds `lock`"""
+        return {
+            user_id: tuple(entry)
+            for (user_id, entry_month), entry in self.pending.items()
+            if entry_month == month
+        }
+
+    def discard_other_months(self, month):
+        with self.lock:
+            for key in [key for key in self.pending if key[1] != month]:
+                del self.pending[key]
+
+    def _restore(self, rows):
+        with self.lock:
+            for user_id, month, wins, losses, _ in rows:
+                entry = self.pending.setdefault((user_id, month), [0, 0])
+                entry[0] += wins
+                entry[1] += losses
+
+    def flush_intent(self, conn):
+        with self.lock:
+            rows = [(user_id, month, wins, losses, user_id)
+                    for (user_id, month), (wins,
+                                           losses) in self.pending.items()]
+            self.pending.clear()
+        if not rows:
+            return 0
+        # Put the deltas back if this batch never commits
+        self.writer.on_abort(functools.partial(self._restore, rows))
+        conn.executemany(self.UPSERT_SQL, rows)
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    def flush(self, wait=False):
+        """Queue a flush intent; with `wait`, block until it commits.
+        Never call with `wait` from inside an intent."""
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        future = self.writer.submit(self.flush_intent)
+        if wait:
+            future.result()
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
 
-    cursor.execute(
-        '''
-        INSERT OR REPLACE INTO monthly_stats (user_id, month, wins, losses)
-        VALUES (?, ?,
-            COALESCE((SELECT wins FROM monthly_stats WHERE user_id = ? AND month = ?), 0) + ?,
-            COALESCE((SELECT losses FROM monthly_stats WHERE user_id = ? AND month = ?), 0) + ?)
-    ''', (user_id, month, user_id, month, win_amount, user_id, month,
-          loss_amount))
 
-    conn.commit()
-    conn.close()
+monthly_stats_buffer = MonthlyStatsBuffer(db_writer)
+
+
+async def update_monthly_stats(user_id,
+                               win_amount=0,
+                               loss_amount=0,
+                               month=None):
+    """Update monthly gambling stats (buffered, see MonthlyStatsBuffer)"""
+    if not month:
+        month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+    monthly_stats_buffer.add(user_id, month, win_amount, loss_amount)
 
 
 class GitHubBackupManager:
+    """Async GitHub contents-API client for backup files.
+
+    Every call goes through one shared aiohttp session (keep-alive
+    connection pool), has its own timeout and retries transient failures
+    (timeouts, 429, 5xx) with exponential backoff on asyncio.sleep, so a
+    slow GitHub never blocks the gateway loop. File reads, base64 and
+    JSON encoding of backup payloads run in the default executor."""
 
-    def __init__(self, token, repo):
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    LIST_TIMEOUT = 30
+    TRANSFER_TIMEOUT = 120
+
+    def __init__(self, token, repo, max_connections=4):
         self.token = token
         self.repo = repo
         self.headers = {
@@ -1110,255 +2792,265 @@ class GitHubBackupManager:
             "Content-Type": "application/json"
         }
         self.max_retries = 3
-        self.retry_delay = 5
-
-    def upload_backup_to_github(self, backup_file_path):
-        """Upload backup with retry logic and better error handling"""
+        self.retry_delay = 2  # seconds, doubled on every retry
+        self.max_connections = max_connections
+        self._session = None
+        self._session_loop = None  # the loop self._session belongs to
+
+        # Request statistics
+        self.requests = 0
+        self.retries = 0
+
+    def _new_session(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections,
+                                         keepalive_timeout=60,
+                                         ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, headers=self.headers)
+
+    def _get_session(self):
+        """The shared session, (re)created on the running loop"""
+        loop = asyncio.get_running_loop()
+        if (self._session is None or self._session.closed
+                or self._session_loop is not loop):
+            self._session = self._new_session()
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def _url(self, path=""):
+        return f"{GITHUB_API_BASE}/repos/{self.repo}{path}"
+
+    async def _request(self, method, url, timeout, **kwargs):
+        """Send one API request, retrying transient failures with
+        backoff. Returns (status, body bytes); the last status is returned
+        as is once retries are exhausted. Raises on repeated network
+        errors."""
+        session = self._get_session()
         for attempt in range(self.max_retries):
+            self.requests += 1
+            delay = self.retry_delay * 2**attempt + random.uniform(0, 1)
             try:
-                logger.info(
-                    f"🔄 GitHub upload attempt {attempt + 1}/{self.max_retries}"
+                async with session.request(
+                        method,
+                        url,
+                        timeout=aiohttp.ClientTimeout(total=timeout),
+                        **kwargs) as response:
+                    body = await response.read()
+                    if (response.status not in self.RETRY_STATUSES
+                            or attempt == self.max_retries - 1):
+                        return response.status, body
+                    retry_after = response.headers.get("Retry-After")
+                    if retry_after and retry_after.isdigit():
+                        delay = max(delay, int(retry_after))
+                    logger.warning(
+                        f"⚠️ GitHub {method} {response.status}, retrying in {delay:.1f}s"
+                    )
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                logger.warning(
+                    f"⚠️ GitHub {method} attempt {attempt + 1} failed: {e!r}, retrying in {delay:.1f}s"
                 )
+            self.retries += 1
+            await asyncio.sleep(delay)
 
-                # Read and encode file
-                with open(backup_file_path, 'rb') as f:
-                    file_content = f.read()
-
-                if len(file_content) == 0:
-                    return False, "Backup file is empty"
-
-                encoded_content = base64.b64encode(file_content).decode(
-                    'utf-8')
-                filename = os.path.basename(backup_file_path)
-                github_path = f"backups/{filename}"
-
-                # Check if file exists
-                check_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/{github_path}"
-                check_response = requests.get(check_url,
-                                              headers=self.headers,
-                                              timeout=30)
-
-                # Prepare commit data
-                commit_data = {
-                    "message":
-                    f"🤖 Auto backup: {filename} ({len(file_content):,} bytes)",
-                    "content": encoded_content,
-                    "branch": "main"
-                }
-
-                # Add SHA if file exists
-                if check_response.status_code == 200:
-                    existing_file = check_response.json()
-                    commit_data["sha"] = existing_file["sha"]
-                    logger.info("📝 Updating existing backup file")
-                else:
-                    logger.info("📝 Creating new backup file")
-
-                # Upload file
-                upload_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/{github_path}"
-                response = requests.put(upload_url,
-                                        headers=self.headers,
-                                        json=commit_data,
-                                        timeout=60)
-
-                if response.status_code in [200, 201]:
-                    logger.info(f"✅ GitHub upload successful: {filename}")
-                    return True, response.json()
-                elif response.status_code == 403:
-                    error_msg = f"GitHub API forbidden (check token permissions): {response.text[:200]}"
-                    logger.error(error_msg)
-                    return False, error_msg
-                elif response.status_code == 422:
-                    error_msg = f"GitHub API validation error: {response.text[:200]}"
-                    logger.error(error_msg)
-                    return False, error_msg
-                else:
-                    error_msg = f"GitHub API error {response.status_code}: {response.text[:200]}"
-                    logger.warning(error_msg)
-
-                    # Retry on certain errors
-                    if attempt < self.max_retries - 1 and response.status_code in [
-                            500, 502, 503, 504
-                    ]:
-                        logger.info(
-                            f"⏳ Retrying in {self.retry_delay} seconds...")
-                        time.sleep(self.retry_delay)
-                        continue
-                    else:
-                        return False, error_msg
-
-            except requests.exceptions.Timeout:
-                error_msg = f"GitHub upload timeout (attempt {attempt + 1})"
-                logger.warning(error_msg)
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-                else:
-                    return False, "GitHub upload timeout after retries"
-
-            except Exception as e:
-                error_msg = f"GitHub upload error: {str(e)}"
-                logger.error(error_msg)
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-                else:
-                    return False, error_msg
+    @staticmethod
+    def _encode_upload(backup_file_path, filename, sha=None):
+        """Read a backup and build the PUT body (blocking)"""
+        with open(backup_file_path, 'rb') as f:
+            file_content = f.read()
+        commit_data = {
+            "message":
+            f"🤖 Auto backup: {filename} ({len(file_content):,} bytes)",
+            "content": base64.b64encode(file_content).decode('utf-8'),
+            "branch": "main"
+        }
+        if sha:
+            commit_data["sha"] = sha
+        return len(file_content), json.dumps(commit_data).encode()
 
-        return False, "Max retries exceeded"
+    async def upload_backup_to_github(self,
+                                      backup_file_path,
+                                      github_dir="backups"):
+        """Upload backup with retry logic and better error handling"""
+        filename = os.path.basename(backup_file_path)
+        url = self._url(f"/contents/{github_dir}/{filename}")
+        loop = asyncio.get_running_loop()
+        try:
+            if os.path.getsize(backup_file_path) == 0:
+                return False, "Backup file is empty"
+            # An unchanged database yields the backup uploaded last time
+            if await loop.run_in_executor(None, backup_chain.is_uploaded,
+                                          backup_file_path):
+                logger.info(
+                    f"♻️ {filename} is already on GitHub, skipping upload")
+                return True, {"skipped": "unchanged"}
+
+            # Check if file exists
+            status, body = await self._request("GET", url, self.LIST_TIMEOUT)
+            sha = json.loads(body)["sha"] if status == 200 else None
+            if sha:
+                logger.info("📝 Updating existing backup file")
+            else:
+                logger.info("📝 Creating new backup file")
+
+            size, payload = await loop.run_in_executor(None,
+                                                       self._encode_upload,
+                                                       backup_file_path,
+                                                       filename, sha)
+            status, body = await self._request("PUT",
+                                               url,
+                                               self.TRANSFER_TIMEOUT,
+                                               data=payload)
+        except asyncio.TimeoutError:
+            return False, "GitHub upload timeout after retries"
+        except Exception as e:
+            error_msg = f"GitHub upload error: {str(e)}"
+            logger.error(error_msg)
+            return False, error_msg
+
+        text = body[:200].decode(errors="replace")
+        if status in [200, 201]:
+            logger.info(f"✅ GitHub upload successful: {filename} "
+                        f"({size:,} bytes)")
+            await loop.run_in_executor(None, backup_chain.mark_uploaded,
+                                       backup_file_path)
+            return True, json.loads(body)
+        elif status == 403:
+            error_msg = f"GitHub API forbidden (check token permissions): {text}"
+        elif status == 422:
+            error_msg = f"GitHub API validation error: {text}"
+        else:
+            error_msg = f"GitHub API error {status}: {text}"
+        logger.error(error_msg)
+        return False, error_msg
 
-    def test_connection(self):
+    async def test_connection(self):
         """Test GitHub API connection and permissions"""
         try:
             # Test repository access
-            test_url = f"{GITHUB_API_BASE}/repos/{self.repo}"
-            response = requests.get(test_url, headers=self.headers, timeout=15)
+            status, body = await self._request("GET", self._url(), 15)
 
-            if response.status_code == 200:
-                repo_data = response.json()
+            if status == 200:
+                repo_data = json.loads(body)
                 logger.info(
                     f"✅ GitHub repo accessible: {repo_data.get('full_name')}")
 
                 # Test write permissions by checking if we can list contents
-                contents_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents"
-                contents_response = requests.get(contents_url,
-                                                 headers=self.headers,
-                                                 timeout=15)
-
-                if contents_response.status_code in [
-                        200, 404
-                ]:  # 404 is OK for empty repo
+                status, _ = await self._request("GET", self._url("/contents"),
+                                                15)
+
+                if status in [200, 404]:  # 404 is OK for empty repo
                     logger.info("✅ GitHub write access confirmed")
                     return True, "Connection successful"
                 else:
-                    return False, f"No write access: {contents_response.status_code}"
+                    return False, f"No write access: {status}"
             else:
-                return False, f"Repository access failed: {response.status_code} - {response.text[:100]}"
+                return False, f"Repository access failed: {status} - {body[:100].decode(errors='replace')}"
 
         except Exception as e:
             return False, f"Connection test failed: {str(e)}"
 
-    def download_backup_from_github(self, filename=None):
-        """Download backup file from GitHub repository with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                if not filename:
-                    # Get the latest backup file
-                    success, files = self.list_github_backups()
-                    if not success or not files:
-                        return False, "No backup files found in repository"
-                    filename = files[0]['name']  # Already sorted by date
-
-                # Download the specific file
-                download_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/backups/{filename}"
-                response = requests.get(download_url,
-                                        headers=self.headers,
-                                        timeout=60)
-
-                if response.status_code != 200:
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay)
-                        continue
-                    return False, f"Failed to download {filename}: {response.status_code}"
-
-                file_data = response.json()
-                file_content = base64.b64decode(file_data['content'])
-
-                # Create local backups directory
-                if not os.path.exists("backups"):
-                    os.makedirs("backups")
-
-                # Save the downloaded file locally
-                local_path = os.path.join("backups", filename)
-                with open(local_path, 'wb') as f:
-                    f.write(file_content)
-
-                logger.info(
-                    f"✅ Downloaded backup: {filename} ({len(file_content):,} bytes)"
-                )
-                return True, local_path
+    @staticmethod
+    def _save_download(filename, file_content):
+        os.makedirs("backups", exist_ok=True)
+        local_path = os.path.join("backups", filename)
+        with open(local_path, 'wb') as f:
+            f.write(file_content)
+        return local_path
 
-            except Exception as e:
-                if attempt < self.max_retries - 1:
-                    logger.warning(
-                        f"Download attempt {attempt + 1} failed: {e}")
-                    time.sleep(self.retry_delay)
-                    continue
-                else:
-                    return False, f"Download failed after retries: {str(e)}"
+    async def download_backup_from_github(self, filename=None):
+        """Download backup file from GitHub repository with retries"""
+        try:
+            if not filename:
+                # Get the latest backup file
+                success, files = await self.list_github_backups()
+                if not success or not files:
+                    return False, "No backup files found in repository"
+                filename = files[0]['name']  # Already sorted by date
+
+            # The raw media type returns the file itself, at any size the
+            # contents API supports, without a base64 JSON wrapper
+            status, file_content = await self._request(
+                "GET",
+                self._url(f"/contents/backups/{filename}"),
+                self.TRANSFER_TIMEOUT,
+                headers={"Accept": "application/vnd.github.raw"})
+            if status != 200:
+                return False, f"Failed to download {filename}: {status}"
+
+            local_path = await asyncio.get_running_loop().run_in_executor(
+                None, self._save_download, filename, file_content)
+            logger.info(
+                f"✅ Downloaded backup: {filename} ({len(file_content):,} bytes)"
+            )
+            return True, local_path
 
-        return False, "Max retries exceeded"
+        except Exception as e:
+            return False, f"Download failed after retries: {str(e)}"
 
-    def list_github_backups(self):
+    async def list_github_backups(self):
         """List all backup files in GitHub repository with retries"""
-        for attempt in range(self.max_retries):
-            try:
-                list_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/backups"
-                response = requests.get(list_url,
-                                        headers=self.headers,
-                                        timeout=30)
-
-                if response.status_code == 200:
-                    files = response.json()
-                    backup_files = [
-                        f for f in files if f['name'].endswith('.db')
-                    ]
-                    backup_files.sort(key=lambda x: x['name'], reverse=True)
-                    return True, backup_files
-                elif response.status_code == 404:
-                    # Backups directory doesn't exist yet
-                    return True, []
-                else:
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay)
-                        continue
-                    return False, []
-
-            except Exception as e:
-                if attempt < self.max_retries - 1:
-                    logger.warning(f"List attempt {attempt + 1} failed: {e}")
-                    time.sleep(self.retry_delay)
-                    continue
-                else:
-                    logger.error(f"Error listing GitHub backups: {e}")
-                    return False, []
+        try:
+            status, body = await self._request("GET",
+                                               self._url("/contents/backups"),
+                                               self.LIST_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error listing GitHub backups: {e}")
+            return False, []
 
+        if status == 200:
+            backup_files = [
+                f for f in json.loads(body) if is_backup_file(f['name'])
+            ]
+            backup_files.sort(key=lambda x: x['name'], reverse=True)
+            return True, backup_files
+        elif status == 404:
+            # Backups directory doesn't exist yet
+            return True, []
         return False, []
 
-    def delete_old_backups(self, keep_count=20):
+    async def delete_old_backups(self, keep_count=20):
         """Delete old backup files from GitHub, keeping only the newest ones"""
         try:
-            success, backup_files = self.list_github_backups()
+            success, backup_files = await self.list_github_backups()
             if not success:
                 return False, "Failed to list backups"
 
             if len(backup_files) <= keep_count:
                 return True, f"Only {len(backup_files)} backups found, no cleanup needed"
 
-            old_backups = backup_files[keep_count:]  # Files to delete
+            # Files to delete, minus those a kept delta still needs
+            stale = set(
+                stale_backups([f['name'] for f in backup_files], keep_count))
+            old_backups = [f for f in backup_files if f['name'] in stale]
             deleted_count = 0
 
             for backup_file in old_backups:
                 try:
-                    delete_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/backups/{backup_file['name']}"
                     delete_data = {
                         "message":
                         f"🗑️ Auto cleanup: Remove old backup {backup_file['name']}",
                         "sha": backup_file['sha'],
                         "branch": "main"
                     }
-
-                    response = requests.delete(delete_url,
-                                               headers=self.headers,
-                                               json=delete_data,
-                                               timeout=30)
-                    if response.status_code == 200:
+                    status, _ = await self._request(
+                        "DELETE",
+                        self._url(f"/contents/backups/{backup_file['name']}"),
+                        self.LIST_TIMEOUT,
+                        json=delete_data)
+                    if status == 200:
                         deleted_count += 1
                         logger.info(
                             f"🗑️ Deleted old backup: {backup_file['name']}")
                     else:
                         logger.warning(
-                            f"Failed to delete {backup_file['name']}: {response.status_code}"
+                            f"Failed to delete {backup_file['name']}: {status}"
                         )
 
                 except Exception as delete_error:
@@ -1371,44 +3063,732 @@ class GitHubBackupManager:
         except Exception as e:
             return False, f"Cleanup error: {str(e)}"
 
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "session_open": bool(self._session and not self._session.closed),
+        }
+
 
 # Initialize GitHub backup manager (overwrite the None placeholder)
 if GITHUB_TOKEN and GITHUB_BACKUP_REPO:
     github_backup = GitHubBackupManager(GITHUB_TOKEN, GITHUB_BACKUP_REPO)
 
 
+class OnlineBackup:
+    """Backups through the SQLite online backup API (blocking, run it on
+    DB_POOL). Pages are copied from a read-only connection
+    `pages_per_step` at a time with a `step_sleep` pause between steps,
+    so no lock is held for long and progress can be reported while the
+    copy runs.
+
+    A commit from another connection restarts a stepped copy from the
+    first page, so under steady traffic it might never finish. After
+    `max_restarts` restarts the copy completes in a single step instead,
+    which in WAL mode only holds a read snapshot and never blocks the
+    writer."""
+
+    class Restarted(Exception):
+        pass
+
+    def __init__(self, pages_per_step=1024, step_sleep=0.005, max_restarts=3):
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+        self.active = {}  # db_file -> progress of the copy in flight
+        self.last_result = None
+
+    def _progress_callback(self, state):
+
+        def progress(status, remaining, total):
+            if state["remaining"] is not None and remaining > state[
+                    "remaining"]:
+                state["restarts"] += 1
+                if state["restarts"] > self.max_restarts:
+                    raise self.Restarted()
+            state.update(remaining=remaining,
+                         total=total,
+                         steps=state["steps"] + 1)
+            if self.step_sleep:
+                time.sleep(self.step_sleep)
+
+        return progress
+
+    def run(self, db_file, backup_path):
+        """Copy `db_file` into `backup_path` and return a summary"""
+        started = time.perf_counter()
+        partial = f"{backup_path}.partial"
+        state = {
+            "file": db_file,
+            "started_at": epoch_ms(),
+            "mode": "stepped",
+            "total": None,
+            "remaining": None,
+            "steps": 0,
+            "restarts": 0,
+        }
+        self.active[db_file] = state
+        try:
+            source = open_db_connection(db_file, "reader", read_only=True)
+            target = sqlite3.connect(partial)
+            try:
+                try:
+                    source.backup(target,
+                                  pages=self.pages_per_step,
+                                  progress=self._progress_callback(state))
+                except self.Restarted:
+                    state["mode"] = "single_step"
+                    source.backup(target)
+                    state["remaining"] = 0
+                # The copy inherits WAL mode; make it one self-contained file
+                target.execute("PRAGMA journal_mode=DELETE")
+            finally:
+                target.close()
+                source.close()
+            os.replace(partial, backup_path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        finally:
+            self.active.pop(db_file, None)
+
+        self.last_result = {
+            "file": db_file,
+            "backup": backup_path,
+            "finished_at": datetime.datetime.now(timezone.utc).isoformat(),
+            "mode": state["mode"],
+            "pages": state["total"],
+            "steps": state["steps"],
+            "restarts": state["restarts"],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return self.last_result
+
+    def status(self):
+        in_progress = []
+        for state in list(self.active.values()):
+            total, remaining = state["total"], state["remaining"]
+            percent = (round(100 * (total - remaining) /
+                             total, 1) if total else 0.0)
+            in_progress.append({
+                "file": state["file"],
+                "percent": percent,
+                "steps": state["steps"],
+                "restarts": state["restarts"],
+            })
+        return {"in_progress": in_progress, "last": self.last_result}
+
+
+online_backup = OnlineBackup(BACKUP_PAGES_PER_STEP,
+                             BACKUP_STEP_SLEEP_MS / 1000)
+
+
+class BackupCompressor:
+    """Streams backup files through zstd (when `zstandard` is installed)
+    or gzip, a chunk at a time, so memory use does not grow with the
+    database. The codec is marked by the file suffix (`.db.zst`,
+    `.db.gz`) for listings and by the frame's magic bytes, which is what
+    `decompress` goes by: plain `.db` backups restore unchanged."""
+
+    SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+    MAGIC = {b"\x28\xb5\x2f\xfd": "zstd", b"\x1f\x8b": "gzip"}
+    DEFAULT_LEVELS = {"zstd": 3, "gzip": 6}
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, codec="auto", level=None):
+        if codec == "auto":
+            codec = "zstd" if zstandard else "gzip"
+        elif codec == "zstd" and zstandard is None:
+            logger.warning(
+                "⚠️ zstandard is not installed, compressing backups with gzip")
+            codec = "gzip"
+        self.codec = codec if codec in self.SUFFIXES else None
+        self.level = int(level) if level else self.DEFAULT_LEVELS.get(
+            self.codec)
+        self.last_result = None
+
+    @classmethod
+    def detect(cls, path):
+        """Codec of a backup file from its magic bytes, None if plain"""
+        with open(path, 'rb') as f:
+            head = f.read(4)
+        for magic, codec in cls.MAGIC.items():
+            if head.startswith(magic):
+                return codec
+        return None
+
+    def _compress_stream(self, src, dst):
+        if self.codec == "zstd":
+            zstandard.ZstdCompressor(level=self.level).copy_stream(
+                src,
+                dst,
+                size=os.fstat(src.fileno()).st_size,
+                read_size=self.CHUNK_SIZE,
+                write_size=self.CHUNK_SIZE)
+        else:
+            # mtime=0 keeps identical databases byte-identical once compressed
+            with gzip.GzipFile(fileobj=dst,
+                               mode='wb',
+                               compresslevel=self.level,
+                               mtime=0) as gz:
+                shutil.copyfileobj(src, gz, self.CHUNK_SIZE)
+
+    def compress(self, path):
+        """Replace `path` with its compressed copy and return the new
+        path (blocking). Returns `path` unchanged when disabled."""
+        if not self.codec:
+            return path
+        started = time.perf_counter()
+        compressed_path = path + self.SUFFIXES[self.codec]
+        partial = f"{compressed_path}.partial"
+        try:
+            with open(path, 'rb') as src, open(partial, 'wb') as dst:
+                self._compress_stream(src, dst)
+            os.replace(partial, compressed_path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        raw_bytes = os.path.getsize(path)
+        compressed_bytes = os.path.getsize(compressed_path)
+        os.remove(path)
+
+        self.last_result = {
+            "backup":
+            compressed_path,
+            "codec":
+            self.codec,
+            "level":
+            self.level,
+            "raw_bytes":
+            raw_bytes,
+            "compressed_bytes":
+            compressed_bytes,
+            "ratio":
+            round(raw_bytes /
+                  compressed_bytes, 2) if compressed_bytes else None,
+            "duration_ms":
+            round((time.perf_counter() - started) * 1000, 1),
+        }
+        return compressed_path
+
+    def decompress(self, path, db_file):
+        """Write the database held in backup `path` to `db_file`, whatever
+        its codec (blocking). The target is only replaced once the whole
+        file has been written."""
+        codec = self.detect(path)
+        if codec == "zstd" and zstandard is None:
+            raise RuntimeError(
+                f"{os.path.basename(path)} is zstd-compressed but the "
+                "zstandard package is not installed")
+        partial = f"{db_file}.restore"
+        try:
+            with open(path, 'rb') as src, open(partial, 'wb') as dst:
+                if codec == "zstd":
+                    zstandard.ZstdDecompressor().copy_stream(
+                        src,
+                        dst,
+                        read_size=self.CHUNK_SIZE,
+                        write_size=self.CHUNK_SIZE)
+                elif codec == "gzip":
+                    with gzip.GzipFile(fileobj=src, mode='rb') as gz:
+                        shutil.copyfileobj(gz, dst, self.CHUNK_SIZE)
+                else:
+                    shutil.copyfileobj(src, dst, self.CHUNK_SIZE)
+            os.replace(partial, db_file)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return codec or "none"
+
+    def status(self):
+        return {
+            "codec": self.codec or "none",
+            "level": self.level,
+            "last": self.last_result
+        }
+
+
+backup_compressor = BackupCompressor(BACKUP_COMPRESSION,
+                                     BACKUP_COMPRESSION_LEVEL)
+DELTA_SUFFIXES = (".delta", ".delta.zst", ".delta.gz")
+BACKUP_SUFFIXES = (".db", ".db.zst", ".db.gz") + DELTA_SUFFIXES
+
+
+def is_backup_file(filename):
+    """True for plain, compressed and delta backup files"""
+    return filename.endswith(BACKUP_SUFFIXES)
+
+
+def stale_backups(filenames, keep):
+    """Backups to delete when keeping the newest `keep`. Older ones are
+    kept too while the oldest kept backup is a delta that still chains
+    back to them (names sort by their timestamp)."""
+    ordered = sorted(filenames, reverse=True)
+    cut = min(keep, len(ordered))
+    while 0 < cut < len(ordered) and BackupChain.is_delta(ordered[cut - 1]):
+        cut += 1
+    return ordered[cut:]
+
+
+class BackupChain:
+    """Page-level incremental backups (blocking, run on DB_POOL).
+
+    Every backup starts as a full online-backup copy. `store` hashes it
+    page by page and, when the previous backup in the same folder can
+    serve as a parent, keeps only the pages whose digest changed as a
+    `.delta` file. The file holds the changed pages followed by a JSON
+    manifest (parent, base, page size, file size, page numbers and the
+    SHA-256 of the full image) and a fixed trailer. A full base image is
+    kept every `full_every` backups, when most pages changed, or when
+    the parent is gone or never reached GitHub.
+
+    Digests of the latest backup live next to it in `.backup_chain.*`,
+    so no earlier backup has to be read to make the next delta.
+    `rebuild` replays a chain onto its base and checks the result
+    against the manifest's hash."""
+
+    MAGIC = b"SSDELTA1"
+    TRAILER = struct.Struct(">Q8s")  # manifest length, magic
+    STATE_FILE = ".backup_chain.json"
+    DIGEST_FILE = ".backup_chain.digests"
+    DIGEST_SIZE = 8
+    READ_SIZE = 1 << 20
+
+    def __init__(self, enabled=True, full_every=8, max_delta_ratio=0.5):
+        self.enabled = enabled
+        self.full_every = full_every
+        self.max_delta_ratio = max_delta_ratio
+        self._lock = threading.Lock()
+        self.last_result = None
+        self.unchanged = 0
+
+    @staticmethod
+    def is_delta(filename):
+        return filename.endswith(DELTA_SUFFIXES)
+
+    @staticmethod
+    def _page_size(path):
+        with open(path, 'rb') as f:
+            header = f.read(18)
+        if not header.startswith(b"SQLite format 3\x00"):
+            raise ValueError(f"{path} is not a SQLite database")
+        page_size = int.from_bytes(header[16:18], "big")
+        return 65536 if page_size == 1 else page_size
+
+    def _read_state(self, backup_dir):
+        try:
+            with open(os.path.join(backup_dir, self.STATE_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_state(self, backup_dir):
+        state = self._read_state(backup_dir)
+        try:
+            with open(os.path.join(backup_dir, self.DIGEST_FILE), 'rb') as f:
+                digests = f.read()
+        except OSError:
+            return None, None
+        if state is None:
+            return None, None
+        if len(digests) != state.get("pages", -1) * self.DIGEST_SIZE:
+            return None, None
+        return state, digests
+
+    def _write_file(self, path, data, mode='w'):
+        with open(f"{path}.partial", mode) as f:
+            f.write(data)
+        os.replace(f"{path}.partial", path)
+
+    def _save_state(self, backup_dir, state, digests=None):
+        if digests is not None:
+            self._write_file(os.path.join(backup_dir, self.DIGEST_FILE),
+                             digests, 'wb')
+        self._write_file(os.path.join(backup_dir, self.STATE_FILE),
+                         json.dumps(state))
+
+    def reset(self, backup_dir):
+        """Forget the chain, so the next backup is a full base image"""
+        for name in (self.STATE_FILE, self.DIGEST_FILE):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(backup_dir, name))
+
+    def _full_reason(self, backup_dir, state, page_size):
+        """Why the next backup must be a full image, None if a delta works"""
+        if not self.enabled:
+            return "incremental backups disabled"
+        if state is None:
+            return "no previous backup"
+        if state["page_size"] != page_size:
+            return "page size changed"
+        if not os.path.exists(os.path.join(backup_dir, state["parent"])):
+            return "previous backup is gone"
+        if github_backup and not state.get("uploaded"):
+            return "previous backup was not uploaded"
+        if state["since_full"] + 1 >= self.full_every:
+            return f"every {self.full_every} backups"
+        return None
+
+    def _scan(self, path, page_size, previous=None, out=None):
+        """Digest `path` page by page. Pages that differ from `previous`
+        are written to `out`. Returns (digests, changed page numbers,
+        SHA-256 of the file)."""
+        digests = bytearray()
+        changed = []
+        image_hash = hashlib.sha256()
+        page_no = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(self.READ_SIZE - self.READ_SIZE % page_size)
+                if not chunk:
+                    break
+                image_hash.update(chunk)
+                view = memoryview(chunk)
+                for offset in range(0, len(chunk), page_size):
+                    page = view[offset:offset + page_size]
+                    digest = hashlib.blake2b(
+                        page, digest_size=self.DIGEST_SIZE).digest()
+                    digests += digest
+                    if previous is not None:
+                        start = page_no * self.DIGEST_SIZE
+                        if previous[start:start + self.DIGEST_SIZE] != digest:
+                            changed.append(page_no)
+                            out.write(page)
+                    page_no += 1
+        return bytes(digests), changed, image_hash.hexdigest()
+
+    def store(self, path):
+        """Turn the fresh full copy at `path` into the next backup of its
+        folder: a delta against the previous backup when possible, the
+        full image otherwise. The result is compressed; returns its path.
+        When the copy hashes the same as the previous backup it is
+        dropped and the previous backup's path is returned instead."""
+        started = time.perf_counter()
+        backup_dir = os.path.dirname(path)
+        with self._lock:
+            page_size = self._page_size(path)
+            state, previous = self._load_state(backup_dir)
+            reason = self._full_reason(backup_dir, state, page_size)
+            size = os.path.getsize(path)
+            artifact = path
+            changed = None
+            unchanged = False
+            if reason is None:
+                delta_path = path[:-len(".db")] + ".delta"
+                partial = f"{delta_path}.partial"
+                try:
+                    with open(partial, 'wb') as out:
+                        digests, changed, image_sha = self._scan(
+                            path, page_size, previous, out)
+                        unchanged = image_sha == state["sha256"]
+                        if unchanged:
+                            pass
+                        elif len(changed) > self.max_delta_ratio * (
+                                len(digests) // self.DIGEST_SIZE):
+                            reason = "most pages changed"
+                        else:
+                            manifest = json.dumps({
+                                "format": 1,
+                                "parent": state["parent"],
+                                "base": state["base"],
+                                "page_size": page_size,
+                                "size": size,
+                                "pages": changed,
+                                "sha256": image_sha,
+                            }).encode()
+                            out.write(manifest)
+                            out.write(
+                                self.TRAILER.pack(len(manifest), self.MAGIC))
+                    if reason is None and not unchanged:
+                        os.replace(partial, delta_path)
+                        os.remove(path)
+                        artifact = delta_path
+                finally:
+                    if os.path.exists(partial):
+                        os.remove(partial)
+            else:
+                digests, _, image_sha = self._scan(path, page_size)
+                unchanged = (state is not None and image_sha == state["sha256"]
+                             and os.path.exists(
+                                 os.path.join(backup_dir, state["parent"])))
+
+            if unchanged:
+                os.remove(path)
+                self.unchanged += 1
+                artifact = os.path.join(backup_dir, state["parent"])
+                # The reused backup now stands for this run too; touch it so
+                # mtime-based freshness checks don't report it as stale
+                os.utime(artifact)
+                self.last_result = {
+                    "backup":
+                    artifact,
+                    "kind":
+                    "unchanged",
+                    "reason":
+                    f"same content as {state['parent']}",
+                    "pages":
+                    len(digests) // self.DIGEST_SIZE,
+                    "changed_pages":
+                    0,
+                    "raw_bytes":
+                    0,
+                    "bytes":
+                    os.path.getsize(artifact),
+                    "image_bytes":
+                    size,
+                    "duration_ms":
+                    round((time.perf_counter() - started) * 1000, 1),
+                }
+                logger.info(f"♻️ Database unchanged since {state['parent']}, "
+                            "no new backup written")
+                return artifact
+            raw_bytes = os.path.getsize(artifact)
+
+            try:
+                artifact = backup_compressor.compress(artifact)
+            except Exception as compress_error:
+                logger.warning(f"⚠️ Backup compression failed, keeping "
+                               f"the plain copy: {compress_error}")
+
+            name = os.path.basename(artifact)
+            full = reason is not None
+            try:
+                self._save_state(
+                    backup_dir, {
+                        "base": name if full else state["base"],
+                        "parent": name,
+                        "page_size": page_size,
+                        "pages": len(digests) // self.DIGEST_SIZE,
+                        "size": size,
+                        "sha256": image_sha,
+                        "since_full": 0 if full else state["since_full"] + 1,
+                        "uploaded": False,
+                    }, digests)
+            except OSError as state_error:
+                logger.warning(
+                    f"⚠️ Could not save backup chain state: {state_error}")
+                self.reset(backup_dir)
+
+        self.last_result = {
+            "backup": artifact,
+            "kind": "full" if full else "delta",
+            "reason": reason,
+            "pages": len(digests) // self.DIGEST_SIZE,
+            "changed_pages": None if full else len(changed),
+            "raw_bytes": raw_bytes,
+            "bytes": os.path.getsize(artifact),
+            "image_bytes": size,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        if full:
+            logger.info(f"📦 Full base backup {name} ({reason})")
+        else:
+            logger.info(f"🧩 Delta backup {name}: {len(changed):,} of "
+                        f"{self.last_result['pages']:,} pages changed")
+        return artifact
+
+    def mark_uploaded(self, path):
+        """Record that `path` reached GitHub, so the next backup may be a
+        delta against it"""
+        backup_dir, name = os.path.split(path)
+        with self._lock:
+            state = self._read_state(backup_dir)
+            if state and state["parent"] == name and not state["uploaded"]:
+                state["uploaded"] = True
+                self._save_state(backup_dir, state)
+
+    def is_uploaded(self, path):
+        """True when `path` is the latest backup of its folder and already
+        reached GitHub"""
+        backup_dir, name = os.path.split(path)
+        state = self._read_state(backup_dir)
+        return bool(state and state["parent"] == name and state["uploaded"])
+
+    def _read_delta(self, path, scratch):
+        """Decompress delta `path` into `scratch`; returns its manifest"""
+        backup_compressor.decompress(path, scratch)
+        with open(scratch, 'rb') as f:
+            f.seek(-self.TRAILER.size, os.SEEK_END)
+            length, magic = self.TRAILER.unpack(f.read(self.TRAILER.size))
+            if magic != self.MAGIC:
+                raise ValueError(f"{os.path.basename(path)} is not a delta")
+            f.seek(-self.TRAILER.size - length, os.SEEK_END)
+            return json.loads(f.read(length))
+
+    def parent_of(self, path):
+        """Name of the backup a delta was taken against"""
+        scratch = f"{path}.read"
+        try:
+            return self._read_delta(path, scratch)["parent"]
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(scratch)
+
+    def rebuild(self, path, db_file):
+        """Write the database a delta backup describes to `db_file`,
+        replaying its chain onto the base image in the same folder"""
+        backup_dir = os.path.dirname(path)
+        chain = []
+        partial = f"{db_file}.rebuild"
+        try:
+            name = os.path.basename(path)
+            seen = set()
+            while self.is_delta(name):
+                if name in seen:
+                    raise ValueError(f"backup chain loops back to {name}")
+                seen.add(name)
+                scratch = f"{db_file}.delta{len(chain)}"
+                chain.append((scratch,
+                              self._read_delta(os.path.join(backup_dir, name),
+                                               scratch)))
+                name = chain[-1][1]["parent"]
+                if not os.path.exists(os.path.join(backup_dir, name)):
+                    raise FileNotFoundError(
+                        f"backup chain is broken: {name} is missing")
+
+            backup_compressor.decompress(os.path.join(backup_dir, name),
+                                         partial)
+            with open(partial, 'r+b') as image:
+                for scratch, manifest in reversed(chain):
+                    page_size = manifest["page_size"]
+                    with open(scratch, 'rb') as delta:
+                        for page_no in manifest["pages"]:
+                            image.seek(page_no * page_size)
+                            image.write(delta.read(page_size))
+                    image.truncate(manifest["size"])
+
+                image.seek(0)
+                image_hash = hashlib.sha256()
+                for chunk in iter(lambda: image.read(self.READ_SIZE), b""):
+                    image_hash.update(chunk)
+            if image_hash.hexdigest() != chain[0][1]["sha256"]:
+                raise ValueError(
+                    f"rebuilt {os.path.basename(path)} does not match "
+                    "its manifest hash")
+            os.replace(partial, db_file)
+        finally:
+            for scratch, _ in chain:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(scratch)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(partial)
+        return f"{len(chain)} deltas on {name}"
+
+    def status(self):
+        return {
+            "mode": "incremental" if self.enabled else "full",
+            "full_every": self.full_every,
+            "unchanged_skips": self.unchanged,
+            "last": self.last_result
+        }
+
+
+backup_chain = BackupChain(BACKUP_MODE == "incremental", BACKUP_FULL_EVERY)
+
+
+def restore_backup_file(backup_path, db_file):
+    """Write the database held in `backup_path` to `db_file` (blocking):
+    full images are decompressed, deltas rebuilt from their chain.
+
+    The image is copied into a readable live database through the online
+    backup API, so connections still open on it and its -wal/-shm stay
+    consistent. Only a missing or unreadable database file is replaced on
+    disk, after its -wal/-shm are removed so SQLite cannot replay the old
+    log onto the restored file."""
+    incoming = f"{db_file}.incoming"
+    try:
+        if BackupChain.is_delta(backup_path):
+            result = backup_chain.rebuild(backup_path, incoming)
+        else:
+            result = backup_compressor.decompress(backup_path, incoming)
+        try:
+            source = sqlite3.connect(incoming)
+            try:
+                target = open_db_connection(db_file, "writer")
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+            finally:
+                source.close()
+        except sqlite3.DatabaseError as e:
+            logger.warning(
+                f"⚠️ Cannot restore into {db_file} in place ({e}), replacing the file"
+            )
+            for suffix in ("-wal", "-shm"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(f"{db_file}{suffix}")
+            os.replace(incoming, db_file)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(incoming)
+    return result
+
+
+async def download_backup_chain(backup_path):
+    """Fetch from GitHub the older backups a downloaded delta needs"""
+    seen = set()
+    while BackupChain.is_delta(backup_path):
+        if backup_path in seen:
+            raise ValueError(f"backup chain loops back to {backup_path}")
+        seen.add(backup_path)
+        parent = await run_db(backup_chain.parent_of, backup_path)
+        backup_path = os.path.join(os.path.dirname(backup_path), parent)
+        if not os.path.exists(backup_path):
+            success, result = await github_backup.download_backup_from_github(
+                parent)
+            if not success:
+                raise FileNotFoundError(
+                    f"backup chain is broken at {parent}: {result}")
+
+
 def create_backup_with_cloud_storage():
     """Create a comprehensive backup with proper SQLite handling"""
     try:
-        # Create backups directory
-        if not os.path.exists("backups"):
-            os.makedirs("backups")
+        # Buffered audit rows and stats deltas belong in the backup
+        transaction_log.flush(wait=True)
+        monthly_stats_buffer.flush(wait=True)
 
-        # Generate unique timestamp
-        timestamp = datetime.datetime.now(
-            timezone.utc).strftime("%Y%m%d_%H%M%S")
+        # Create backups directory
+        partition = active_partition()
+        backup_dir = partition.backup_dir
+        os.makedirs(backup_dir, exist_ok=True)
+
+        # Generate unique timestamp. Microseconds keep names sortable by
+        # time, and a name is never reused: an overwritten backup could
+        # become its own parent in the delta chain.
+        while True:
+            timestamp = datetime.datetime.now(
+                timezone.utc).strftime("%Y%m%d_%H%M%S_%f")
+            if not any(
+                    f.startswith(f"backup_{timestamp}.")
+                    for f in os.listdir(backup_dir)):
+                break
         backup_filename = f"backup_{timestamp}.db"
-        backup_path = os.path.join("backups", backup_filename)
+        backup_path = os.path.join(backup_dir, backup_filename)
 
         logger.info(f"🔄 Creating SQLite backup: {backup_filename}")
 
-        # Method 1: Use VACUUM INTO for clean backup (recommended)
+        # Method 1: online backup API, copied a few pages at a time
         try:
-            conn = sqlite3.connect(DB_FILE, timeout=30)
-            conn.execute(f"VACUUM INTO '{backup_path}'")
-            conn.close()
-            logger.info("✅ Used VACUUM INTO method")
-        except Exception as vacuum_error:
-            logger.warning(f"⚠️ VACUUM method failed: {vacuum_error}")
+            result = online_backup.run(partition.db_file, backup_path)
+            logger.info(f"✅ Online backup copied {result['pages']:,} pages in "
+                        f"{result['steps']} steps ({result['mode']}, "
+                        f"{result['duration_ms']:.0f} ms)")
+        except Exception as backup_error:
+            logger.warning(f"⚠️ Online backup failed: {backup_error}")
 
             # Method 2: Fallback to file copy with WAL checkpoint
             try:
-                conn = sqlite3.connect(DB_FILE, timeout=30)
-                conn.execute("PRAGMA wal_checkpoint(FULL)")
-                conn.close()
+                with get_db_connection() as conn:
+                    conn.execute("PRAGMA wal_checkpoint(FULL)")
 
                 # Copy main database file
-                shutil.copy2(DB_FILE, backup_path)
+                shutil.copy2(partition.db_file, backup_path)
                 logger.info("✅ Used checkpoint + copy method")
             except Exception as copy_error:
                 logger.error(f"❌ Backup creation failed: {copy_error}")
@@ -1421,6 +3801,20 @@ def create_backup_with_cloud_storage():
                 logger.info(
                     f"✅ Backup created: {backup_filename} ({file_size:,} bytes)"
                 )
+                try:
+                    backup_path = backup_chain.store(backup_path)
+                except Exception as chain_error:
+                    logger.warning(f"⚠️ Incremental backup failed, keeping "
+                                   f"the full copy: {chain_error}")
+                    return backup_path
+                result = backup_compressor.last_result
+                if result and result["backup"] == backup_path:
+                    logger.info(
+                        f"🗜️ Compressed with {result['codec']}: "
+                        f"{result['raw_bytes']:,} -> "
+                        f"{result['compressed_bytes']:,} bytes "
+                        f"({result['ratio']}x, {result['duration_ms']:.0f} ms)"
+                    )
                 return backup_path
             else:
                 logger.error("❌ Backup file is empty")
@@ -1435,6 +3829,54 @@ def create_backup_with_cloud_storage():
         return None
 
 
+async def backup_guild_partitions(upload=True, keep=10):
+    """Back up every guild partition in parallel into its own backups/
+    folder, mirrored on GitHub, keeping the newest `keep` locally. The
+    main database is backed up by the caller as before."""
+    if not partitions.enabled:
+        return {}
+
+    async def backup_partition():
+        partition = active_partition()
+        if partition is default_partition:
+            return None
+        backup_file = await run_db(create_backup_with_cloud_storage)
+        if not backup_file:
+            return None
+        if upload and github_backup:
+            success, result = await github_backup.upload_backup_to_github(
+                backup_file, partition.backup_dir)
+            if not success:
+                logger.error(
+                    f"❌ Partition {partition.name} upload failed: {result}")
+        backups = [
+            f for f in os.listdir(partition.backup_dir) if is_backup_file(f)
+        ]
+        for old_backup in stale_backups(backups, keep):
+            os.remove(os.path.join(partition.backup_dir, old_backup))
+        return backup_file
+
+    return await partitions.fan_out(backup_partition)
+
+
+async def shutdown_backup():
+    """Commit every partition's buffered writes, then back up the main
+    database and each guild partition before the writers stop"""
+
+    async def flush_partition():
+        await run_db(transaction_log.flush, wait=True)
+        await run_db(monthly_stats_buffer.flush, wait=True)
+
+    await partitions.fan_out(flush_partition)
+    backup_file = await run_db(create_backup_with_cloud_storage)
+    if backup_file and github_backup:
+        success, result = await github_backup.upload_backup_to_github(
+            backup_file)
+        if success:
+            logger.info("✅ Final backup uploaded before shutdown")
+    await backup_guild_partitions()
+
+
 async def restore_from_cloud():
     """Restore database from the most recent backup (local or GitHub)"""
     try:
@@ -1443,11 +3885,14 @@ async def restore_from_cloud():
 
         # Try to download the latest from GitHub first
         if github_backup:
-            success, result = github_backup.download_backup_from_github(
-            )  # Ensure await is used properly# Ensure await is used properly
+            success, result = await github_backup.download_backup_from_github()
             if success:
-                latest_backup = result
-                restored_from_github = True
+                try:
+                    await download_backup_chain(result)
+                    latest_backup = result
+                    restored_from_github = True
+                except Exception as chain_error:
+                    logger.warning(f"GitHub download failed: {chain_error}")
             else:
                 logger.warning(f"GitHub download failed: {result}")
 
@@ -1462,7 +3907,7 @@ async def restore_from_cloud():
 
             backup_files = [
                 f for f in os.listdir("backups")
-                if f.startswith("backup_") and f.endswith(".db")
+                if f.startswith("backup_") and is_backup_file(f)
             ]
             if not backup_files:
                 logger.warning(
@@ -1479,11 +3924,15 @@ async def restore_from_cloud():
         # Only proceed if we have a backup to restore
         if latest_backup:
             # Backup current database before restore
-            current_backup = f"pre_restore_backup_{datetime.datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.db"
+            await run_db(quiesce_writes)
+            current_backup = f"pre_restore_backup_{datetime.datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S_%f')}.db"
             shutil.copy2(DB_FILE, os.path.join("backups", current_backup))
 
             # Restore from backup
-            shutil.copy2(latest_backup, DB_FILE)
+            close_db_connections()
+            await run_db(restore_backup_file, latest_backup, DB_FILE)
+            await init_database()  # Older backups may predate later migrations
+            forget_cached_rows()
             logger.info(f"✅ Database restored from: {latest_backup}")
             return True
         else:
@@ -1497,148 +3946,984 @@ async def restore_from_cloud():
         return False
 
 
-def create_sqlite_backup_vacuum():
-    """Create SQLite backup using VACUUM INTO for cleaner backup"""
-    try:
-        import sqlite3
-
-        if not os.path.exists("backups"):
-            os.makedirs("backups")
+INSERT_TRANSACTION_SQL = '''
+    INSERT INTO transactions (user_id, transaction_type, amount, balance_before, balance_after, description, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def insert_transaction(conn,
+                       user_id,
+                       transaction_type,
+                       amount,
+                       balance_before,
+                       balance_after,
+                       description=""):
+    """Write an audit row inside the caller's intent, so it commits
+    atomically with the balance change it describes"""
+    conn.execute(INSERT_TRANSACTION_SQL,
+                 (user_id, transaction_type, amount, balance_before,
+                  balance_after, description, epoch_ms()))
+
+
+class TransactionLogBuffer:
+    """Append-only buffer for audit rows that are not tied to a ledger
+    operation. Rows are flushed to the writer as one executemany intent
+    when `max_rows` are pending or `max_delay` seconds after the first
+    row, and explicitly on shutdown and before every backup."""
+
+    def __init__(self, writer, max_rows=200, max_delay=2.0):
+        self.writer = writer
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._rows = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+        self.appended = 0
+        self.flushed = 0
+        self.flushes = 0
+
+    def append(self, row):
+        with self._lock:
+            self._rows.append(row)
+            self.appended += 1
+            pending = len(self._rows)
+            if pending == 1 and self.max_delay:
+                self._timer = threading.Timer(self.max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if pending >= self.max_rows:
+            self.flush()
+
+    @staticmethod
+    def _insert_rows(conn, rows):
+        conn.executemany(INSERT_TRANSACTION_SQL, rows)
+        return len(rows)
+
+    def flush(self, wait=False):
+        """Hand every pending row to the writer. With `wait`, block until
+        they are committed. Never call with `wait` from inside an intent."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if rows:
+                self.flushes += 1
+                self.flushed += len(rows)
+        if not rows:
+            return 0
+        future = self.writer.submit(self._insert_rows, rows)
+        if wait:
+            future.result()
+        return len(rows)
 
-        timestamp = datetime.datetime.now(
-            timezone.utc).strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"backup_{timestamp}.db"
-        backup_path = os.path.join("backups", backup_filename)
+    def clear(self):
+        """Drop every pending row (the database is being replaced);
+        returns how many were dropped"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return len(rows)
+
+    def stats(self):
+        return {
+            "pending": len(self._rows),
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+        }
 
-        print(f"🔍 DEBUG: Creating SQLite VACUUM backup at: {backup_path}")
 
-        # Use VACUUM INTO for a clean, optimized backup
-        conn = sqlite3.connect(DB_FILE)
-        conn.execute(f"VACUUM INTO '{backup_path}'")
-        conn.close()
+transaction_log = TransactionLogBuffer(db_writer)
+
+
+async def log_transaction(user_id,
+                          transaction_type,
+                          amount,
+                          balance_before,
+                          balance_after,
+                          description=""):
+    """Log transaction for audit trail (buffered, see TransactionLogBuffer)"""
+    # Stamped now, not when the buffer is flushed
+    transaction_log.append((user_id, transaction_type, amount, balance_before,
+                            balance_after, description, epoch_ms()))
+
+
+class Ledger:
+    """Atomic economy operations. Every operation is a single guarded
+    `UPDATE ... RETURNING` statement plus its transactions row, queued as
+    one write intent so the balance change and the audit entry commit
+    together. Operations return the new balance(s), or None when the guard
+    rejects the change (e.g. insufficient funds)."""
+
+    CURRENCIES = ("balance", "sp")
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    @staticmethod
+    def _adjust(conn, user_id, currency, delta):
+        """Add `delta` to one currency column unless it would go negative"""
+        if currency not in Ledger.CURRENCIES:
+            raise ValueError(f"Unknown currency: {currency}")
+        query = (f"UPDATE users SET {currency} = {currency} + ? "
+                 f"WHERE user_id = ? AND {currency} + ? >= 0 "
+                 f"RETURNING {currency}")
+        row = conn.execute(query, (delta, user_id, delta)).fetchone()
+        fields = {}
+        if row is None:
+            # Unknown users start with the default row, then retry once.
+            # The row commits even if the retry is rejected, so it is
+            # published either way.
+            created = conn.execute(
+                'INSERT OR IGNORE INTO users (user_id, balance, sp, streak) VALUES (?, 0, 100, 0)',
+                (user_id, )).rowcount
+            if created:
+                row = conn.execute(query, (delta, user_id, delta)).fetchone()
+                fields.update(balance=0, sp=100)
+        if row is not None:
+            fields[currency] = row[0]
+        if fields:
+            db_writer.on_commit(
+                functools.partial(publish_user_update, user_id, **fields))
+        return row[0] if row is not None else None
+
+    @staticmethod
+    def credit_intent(conn,
+                      user_id,
+                      amount,
+                      currency="balance",
+                      transaction_type="credit",
+                      description=""):
+        after = Ledger._adjust(conn, user_id, currency, amount)
+        if after is not None:
+            insert_transaction(conn, user_id, transaction_type, amount,
+                               after - amount, after, description)
+        return after
+
+    @staticmethod
+    def debit_intent(conn,
+                     user_id,
+                     amount,
+                     currency="balance",
+                     transaction_type="debit",
+                     description=""):
+        after = Ledger._adjust(conn, user_id, currency, -amount)
+        if after is not None:
+            insert_transaction(conn, user_id, transaction_type, -amount,
+                               after + amount, after, description)
+        return after
+
+    @staticmethod
+    def transfer_intent(conn,
+                        sender_id,
+                        receiver_id,
+                        amount,
+                        currency="balance",
+                        description=""):
+        sender_after = Ledger.debit_intent(conn, sender_id, amount, currency,
+                                           "transfer_out", description)
+        if sender_after is None:
+            return None
+        receiver_after = Ledger.credit_intent(conn, receiver_id, amount,
+                                              currency, "transfer_in",
+                                              description)
+        return sender_after, receiver_after
+
+    @staticmethod
+    def convert_intent(conn,
+                       user_id,
+                       amount,
+                       transaction_type="exchange",
+                       description=""):
+        """Move `amount` SP into SS 1:1"""
+        row = conn.execute(
+            '''
+            UPDATE users SET sp = sp - ?, balance = balance + ?
+            WHERE user_id = ? AND sp >= ?
+            RETURNING sp, balance
+        ''', (amount, amount, user_id, amount)).fetchone()
+        if row is None:
+            return None
+        sp_after, balance_after = row
+        db_writer.on_commit(
+            functools.partial(publish_user_update,
+                              user_id,
+                              sp=sp_after,
+                              balance=balance_after))
+        insert_transaction(conn, user_id, transaction_type, amount,
+                           balance_after - amount, balance_after, description)
+        return sp_after, balance_after
+
+    async def credit(self, user_id, amount, currency="balance", **kwargs):
+        return await self.writer.write(self.credit_intent, user_id, amount,
+                                       currency, **kwargs)
+
+    async def debit(self, user_id, amount, currency="balance", **kwargs):
+        return await self.writer.write(self.debit_intent, user_id, amount,
+                                       currency, **kwargs)
+
+    async def transfer(self,
+                       sender_id,
+                       receiver_id,
+                       amount,
+                       currency="balance",
+                       **kwargs):
+        return await self.writer.write(self.transfer_intent, sender_id,
+                                       receiver_id, amount, currency, **kwargs)
+
+    async def convert(self, user_id, amount, **kwargs):
+        return await self.writer.write(self.convert_intent, user_id, amount,
+                                       **kwargs)
+
+
+ledger = Ledger(db_writer)
+
+
+class TransactionArchiver:
+    """Retention for the transactions table.
+
+    Rows older than `retention_days` are handled in chunks of `chunk_size`:
+    each chunk is appended to a gzip-compressed JSON-lines file per month,
+    then rolled up into transaction_rollups and deleted in a single write
+    intent, so no chunk holds the write lock for long. Archive files are
+    written before the delete commits; a crash in between can only
+    duplicate rows in the archive, never lose them."""
+
+    COLUMNS = ("id", "user_id", "transaction_type", "amount", "balance_before",
+               "balance_after", "description", "timestamp")
+
+    def __init__(self, archive_dir, retention_days=90, chunk_size=1000):
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.chunk_size = chunk_size
+        self.last_run = None
+
+    def cutoff(self):
+        """Epoch-ms timestamp before which rows are archived"""
+        return epoch_ms(
+            datetime.datetime.now(timezone.utc) -
+            timedelta(days=self.retention_days))
+
+    def _archive_chunk(self, cutoff):
+        """Read the oldest expired rows and append them to their monthly
+        archive files (blocking). Returns the archived id range or None."""
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                f'''
+                SELECT {", ".join(self.COLUMNS)} FROM transactions
+                WHERE timestamp < ? ORDER BY id LIMIT ?
+            ''', (cutoff, self.chunk_size)).fetchall()
+        if not rows:
+            return None
 
-        if os.path.exists(backup_path):
-            file_size = os.path.getsize(backup_path)
-            print(
-                f"✅ SQLite VACUUM backup created: {backup_filename}, size: {file_size} bytes"
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[from_epoch_ms(row[-1]).strftime("%Y-%m")].append(row)
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        for month, month_rows in by_month.items():
+            path = os.path.join(self.archive_dir,
+                                f"transactions_{month}.jsonl.gz")
+            # Appending adds a gzip member; readers see one stream
+            with gzip.open(path, "at", encoding="utf-8") as archive:
+                for row in month_rows:
+                    archive.write(json.dumps(dict(zip(self.COLUMNS, row))))
+                    archive.write("\n")
+        return rows[0][0], rows[-1][0], len(rows)
+
+    @staticmethod
+    def rollup_intent(conn, first_id, last_id, cutoff):
+        """Fold an archived id range into transaction_rollups and delete it"""
+        conn.execute(
+            '''
+            INSERT INTO transaction_rollups
+                (user_id, month, transaction_type, tx_count, total_amount)
+            SELECT user_id, strftime('%Y-%m', timestamp / 1000, 'unixepoch'),
+                   transaction_type,
+                   COUNT(*), SUM(amount)
+            FROM transactions
+            WHERE id BETWEEN ? AND ? AND timestamp < ?
+            GROUP BY 1, 2, 3
+            ON CONFLICT (user_id, month, transaction_type) DO UPDATE SET
+                tx_count = tx_count + excluded.tx_count,
+                total_amount = total_amount + excluded.total_amount
+        ''', (first_id, last_id, cutoff))
+        return conn.execute(
+            'DELETE FROM transactions WHERE id BETWEEN ? AND ? AND timestamp < ?',
+            (first_id, last_id, cutoff)).rowcount
+
+    async def run(self):
+        """Archive and remove every expired transaction, chunk by chunk"""
+        cutoff = self.cutoff()
+        start = time.monotonic()
+        archived = deleted = chunks = 0
+        while True:
+            chunk = await run_db(self._archive_chunk, cutoff)
+            if chunk is None:
+                break
+            first_id, last_id, count = chunk
+            deleted += await db_writer.write(self.rollup_intent, first_id,
+                                             last_id, cutoff)
+            archived += count
+            chunks += 1
+            # Let queued command writes through between chunks
+            await asyncio.sleep(0)
+
+        self.last_run = {
+            "finished_at": datetime.datetime.now(timezone.utc).isoformat(),
+            "cutoff": cutoff,
+            "archived": archived,
+            "deleted": deleted,
+            "chunks": chunks,
+            "duration_s": round(time.monotonic() - start, 2),
+        }
+        if archived:
+            logger.info(
+                f"🗄️ Archived {archived:,} transactions older than {cutoff} in {chunks} chunks"
             )
-            return backup_path
-        else:
-            print("❌ SQLite VACUUM backup failed")
-            return None
+        return self.last_run
 
-    except Exception as e:
-        print(f"❌ SQLite VACUUM backup error: {e}")
-        return None
 
+transaction_archiver = TransactionArchiver(TRANSACTION_ARCHIVE_DIR,
+                                           TRANSACTION_RETENTION_DAYS)
 
-def download_backup_from_github(self, filename=None):
-    """Download backup file from GitHub repository"""
-    try:
-        print("🔍 DEBUG: Attempting to download backup...")
-        print(f"🔍 DEBUG: Repository: {self.repo}")
 
-        if not filename:
-            # Get the latest backup file
-            list_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/backups"
-            print(f"🔍 DEBUG: List URL: {list_url}")
+class IntegrityMonitor:
+    """Database integrity checking that never runs on the event loop.
 
-            response = requests.get(list_url, headers=self.headers)
-            print(f"🔍 DEBUG: List response: {response.status_code}")
+    `quick_check` (structure only, no index cross-checks) runs at startup.
+    Full `integrity_check` passes run one table at a time, each table with
+    its indexes, while traffic is low; a pass is complete once every table
+    has been checked. Every check runs on its own read-only connection on
+    DB_POOL and is recorded in integrity_checks, so /health reports the
+    last verified state without rechecking."""
 
-            if response.status_code != 200:
-                print(f"❌ Failed to list backup files: {response.text}")
-                return False, "Failed to list backup files"
+    HISTORY_ROWS = 500
 
-            files = response.json()
-            print(f"🔍 DEBUG: Found {len(files)} files in backups folder")
+    def __init__(self, db_file, idle_ops_per_min=60, step_budget_s=30.0):
+        self.db_file = db_file
+        self.idle_ops_per_min = idle_ops_per_min
+        self.step_budget_s = step_budget_s
+        self.last_quick = None
+        self.last_full = None
+        self._pass = None  # {"started_at", "pending", "checked", "problems", "duration_ms"}
+        self._last_activity = None
+        self._own_writes = 0
+
+    def _check(self, pragma, target=None):
+        """Run one check pragma (blocking). Returns (ok, detail, ms)."""
+        started = time.perf_counter()
+        conn = open_db_connection(self.db_file, "reader", read_only=True)
+        try:
+            arg = f'("{target}")' if target else ""
+            rows = [r[0] for r in conn.execute(f"PRAGMA {pragma}{arg}")]
+        except sqlite3.DatabaseError as e:
+            rows = [str(e)]
+        finally:
+            conn.close()
+        ok = rows == ["ok"]
+        return ok, "; ".join(rows[:10]), (time.perf_counter() - started) * 1000
 
-            backup_files = [f for f in files if f['name'].endswith('.db')]
-            print(f"🔍 DEBUG: Found {len(backup_files)} .db files")
+    def _tables(self):
+        conn = open_db_connection(self.db_file, "reader", read_only=True)
+        try:
+            return [
+                r[0] for r in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+                )
+            ]
+        finally:
+            conn.close()
 
-            for f in backup_files:
-                print(f"🔍 DEBUG: Backup file: {f['name']}")
+    @staticmethod
+    def record_intent(conn, kind, target, started_at, duration_ms, ok, detail):
+        conn.execute(
+            '''
+            INSERT INTO integrity_checks (kind, target, started_at, duration_ms, ok, detail)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''',
+            (kind, target, started_at, round(duration_ms, 1), int(ok), detail))
+        conn.execute(
+            '''
+            DELETE FROM integrity_checks
+            WHERE id <= (SELECT MAX(id) FROM integrity_checks) - ?
+        ''', (IntegrityMonitor.HISTORY_ROWS, ))
+
+    async def _record(self, kind, target, started_at, duration_ms, ok, detail):
+        # A damaged file may refuse the write; the in-memory state still holds
+        self._own_writes += 1
+        try:
+            await db_writer.write(self.record_intent, kind, target, started_at,
+                                  duration_ms, ok, detail)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Could not record integrity check: {e}")
 
-            if not backup_files:
-                return False, "No backup files found in repository"
+    def _summary(self, started_at, ok, detail, duration_ms, **extra):
+        return {
+            "checked_at": from_epoch_ms(started_at).isoformat(),
+            "ok": ok,
+            "detail": detail,
+            "duration_ms": round(duration_ms, 1),
+            **extra,
+        }
 
-            # Sort by name (which includes timestamp) to get latest
-            backup_files.sort(key=lambda x: x['name'], reverse=True)
-            latest_file = backup_files[0]
-            filename = latest_file['name']
-            print(f"🔍 DEBUG: Selected latest backup: {filename}")
+    async def run_quick_check(self):
+        """PRAGMA quick_check on the whole file"""
+        started_at = epoch_ms()
+        ok, detail, ms = await run_db(self._check, "quick_check")
+        self.last_quick = self._summary(started_at, ok, detail, ms)
+        await self._record("quick", None, started_at, ms, ok, detail)
+        log = logger.info if ok else logger.error
+        log(f"{'✅' if ok else '❌'} quick_check {detail[:200]} ({ms:.0f} ms)")
+        return ok, detail
+
+    async def run_full_check(self):
+        """One-shot PRAGMA integrity_check on the whole file"""
+        started_at = epoch_ms()
+        ok, detail, ms = await run_db(self._check, "integrity_check")
+        self.last_full = self._summary(started_at, ok, detail, ms, tables=None)
+        await self._record("full", None, started_at, ms, ok, detail)
+        if not ok:
+            logger.error(f"❌ integrity_check failed: {detail[:200]}")
+        return ok, detail
+
+    async def step(self):
+        """Check the next table of the current full pass (starting a new
+        pass when needed). Returns True when the step completed a pass."""
+        if not self._pass:
+            self._pass = {
+                "started_at": epoch_ms(),
+                "pending": await run_db(self._tables),
+                "checked": 0,
+                "problems": [],
+                "duration_ms": 0.0,
+            }
+        current = self._pass
+        # A file with no tables yet (freshly replaced, empty partition)
+        # skips straight to an OK summary
+        if current["pending"]:
+            table = current["pending"].pop(0)
+            started_at = epoch_ms()
+            ok, detail, ms = await run_db(self._check, "integrity_check",
+                                          table)
+            await self._record("full_step", table, started_at, ms, ok, detail)
+            current["checked"] += 1
+            current["duration_ms"] += ms
+            if not ok:
+                current["problems"].append(f"{table}: {detail}")
+                logger.error(
+                    f"❌ integrity_check({table}) failed: {detail[:200]}")
+            if current["pending"]:
+                return False
 
-        # Download the specific file
-        download_url = f"{GITHUB_API_BASE}/repos/{self.repo}/contents/backups/{filename}"
-        print(f"🔍 DEBUG: Download URL: {download_url}")
+        ok = not current["problems"]
+        detail = "ok" if ok else "; ".join(current["problems"])[:2000]
+        self.last_full = self._summary(current["started_at"],
+                                       ok,
+                                       detail,
+                                       current["duration_ms"],
+                                       tables=current["checked"])
+        await self._record("full", None, current["started_at"],
+                           current["duration_ms"], ok, detail)
+        self._pass = None
+        logger.info(f"{'✅' if ok else '❌'} Incremental integrity pass over "
+                    f"{current['checked']} tables: {detail[:200]}")
+        return True
 
-        response = requests.get(download_url, headers=self.headers)
-        print(f"🔍 DEBUG: Download response: {response.status_code}")
+    def _activity(self):
+        """Reads plus write intents so far, not counting our own records"""
+        return (db_writer.stats()["intents"] +
+                db_read_pool.stats()["checkouts"] - self._own_writes)
+
+    def is_idle(self, interval_s):
+        """True when traffic since the previous call stayed under
+        `idle_ops_per_min`"""
+        now = self._activity()
+        previous, self._last_activity = self._last_activity, now
+        if previous is None:
+            return False
+        return (now - previous) * 60 / interval_s < self.idle_ops_per_min
+
+    async def run_idle_steps(self, interval_s):
+        """Advance the full pass while traffic stays low, within the step
+        budget. Called periodically by integrity_check_task."""
+        if not self.is_idle(interval_s):
+            return 0
+        deadline = time.monotonic() + self.step_budget_s
+        steps = 0
+        while time.monotonic() < deadline:
+            before = self._activity()
+            step_started = time.monotonic()
+            done = await self.step()
+            steps += 1
+            if done:
+                break
+            # Stop as soon as commands pick up again
+            busy_s = max(time.monotonic() - step_started, 1.0)
+            if (self._activity() -
+                    before) * 60 / busy_s >= self.idle_ops_per_min:
+                break
+        self._last_activity = self._activity()
+        return steps
+
+    def load_history(self):
+        """Seed last results from integrity_checks (blocking)"""
+        with get_db_read_connection() as conn:
+            for kind in ("quick", "full"):
+                row = conn.execute(
+                    '''
+                    SELECT started_at, ok, detail, duration_ms FROM integrity_checks
+                    WHERE kind = ? ORDER BY id DESC LIMIT 1
+                ''', (kind, )).fetchone()
+                if row:
+                    summary = self._summary(row[0], bool(row[1]), row[2],
+                                            row[3] or 0)
+                    setattr(self, f"last_{kind}", summary)
+
+    def status(self):
+        progress = None
+        if self._pass:
+            progress = {
+                "checked": self._pass["checked"],
+                "remaining": len(self._pass["pending"]),
+                "problems": len(self._pass["problems"]),
+            }
+        return {
+            "last_quick_check": self.last_quick,
+            "last_full_check": self.last_full,
+            "full_pass_in_progress": progress,
+        }
 
-        if response.status_code != 200:
-            print(f"❌ Failed to download {filename}: {response.text}")
-            return False, f"Failed to download {filename}"
 
-        file_data = response.json()
+integrity_monitor = IntegrityMonitor(DB_FILE)
 
-        # Decode base64 content
-        file_content = base64.b64decode(file_data['content'])
 
-        # Create local backups directory if it doesn't exist
-        if not os.path.exists("backups"):
-            os.makedirs("backups")
+class WalMaintainer:
+    """Keeps the -wal file and the freelist from growing without bound.
 
-        # Save the downloaded file locally
-        local_path = os.path.join("backups", filename)
-        with open(local_path, 'wb') as f:
-            f.write(file_content)
+    Every run makes a PASSIVE checkpoint, which copies committed frames
+    back into the database without waiting on readers or the writer. In
+    quiet periods it makes a TRUNCATE checkpoint instead, resetting the
+    -wal file to zero bytes, and reclaims up to `vacuum_pages` free pages
+    through the writer with PRAGMA incremental_vacuum. The file then
+    shrinks gradually, with no full VACUUM holding the lock."""
 
-        print(f"✅ Successfully downloaded backup to: {local_path}")
-        return True, local_path
+    def __init__(self,
+                 db_file,
+                 idle_ops_per_min=60,
+                 vacuum_pages=2000,
+                 truncate_busy_ms=2000):
+        self.db_file = db_file
+        self.idle_ops_per_min = idle_ops_per_min
+        self.vacuum_pages = vacuum_pages
+        self.truncate_busy_ms = truncate_busy_ms
+        self.last_run = None
+        self.checkpoints = {"PASSIVE": 0, "TRUNCATE": 0, "busy": 0}
+        self.pages_reclaimed = 0
+        self._last_activity = None
+        self._own_writes = 0
+
+    def checkpoint(self, mode):
+        """PRAGMA wal_checkpoint(mode) on its own connection (blocking).
+        Returns (busy, wal_frames, checkpointed_frames, ms)."""
+        started = time.perf_counter()
+        conn = open_db_connection(self.db_file)
+        try:
+            # TRUNCATE waits for readers; never for as long as commands do
+            conn.execute(f"PRAGMA busy_timeout={self.truncate_busy_ms}")
+            busy, frames, done = conn.execute(
+                f"PRAGMA wal_checkpoint({mode})").fetchone()
+        finally:
+            conn.close()
+        self.checkpoints[mode] += 1
+        self.checkpoints["busy"] += bool(busy)
+        return busy, frames, done, (time.perf_counter() - started) * 1000
+
+    def file_stats(self):
+        """Database and WAL sizes plus page counts (blocking)"""
+        with get_db_read_connection() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        wal_file = f"{self.db_file}-wal"
+        return {
+            "db_bytes":
+            page_size * page_count,
+            "wal_bytes":
+            os.path.getsize(wal_file) if os.path.exists(wal_file) else 0,
+            "page_count":
+            page_count,
+            "freelist_count":
+            freelist,
+            "auto_vacuum": ("none", "full", "incremental")[auto_vacuum],
+        }
 
-    except Exception as e:
-        print(f"❌ Download error: {e}")
-        return False, str(e)
-
-
-def log_transaction(user_id,
-                    transaction_type,
-                    amount,
-                    balance_before,
-                    balance_after,
-                    description=""):
-    """Log transaction for audit trail"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    @staticmethod
+    def vacuum_intent(conn, pages):
+        """Move up to `pages` free pages off the end of the file"""
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # The sqlite3 module steps a PRAGMA once, and each step frees one
+        # page, so an unbounded incremental_vacuum would stop after one
+        for _ in range(min(pages, before)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def _activity(self):
+        return (db_writer.stats()["intents"] +
+                db_read_pool.stats()["checkouts"] - self._own_writes)
+
+    def is_idle(self, interval_s):
+        """True when traffic since the previous call stayed under
+        `idle_ops_per_min`"""
+        now = self._activity()
+        previous, self._last_activity = self._last_activity, now
+        if previous is None:
+            return False
+        return (now - previous) * 60 / interval_s < self.idle_ops_per_min
+
+    async def run(self, interval_s):
+        """One maintenance round; called by wal_maintenance_task"""
+        quiet = self.is_idle(interval_s)
+        before = await run_db(self.file_stats)
+        mode = "TRUNCATE" if quiet else "PASSIVE"
+        busy, frames, done, ms = await run_db(self.checkpoint, mode)
+
+        reclaimed = 0
+        if (quiet and before["auto_vacuum"] == "incremental"
+                and before["freelist_count"]):
+            self._own_writes += 1
+            reclaimed = await db_writer.write(self.vacuum_intent,
+                                              self.vacuum_pages)
+            self.pages_reclaimed += reclaimed
+            # Hand the vacuumed pages back to the file straight away
+            await run_db(self.checkpoint, "TRUNCATE")
+
+        after = await run_db(self.file_stats)
+        self._last_activity = self._activity()
+        self.last_run = {
+            "finished_at": datetime.datetime.now(timezone.utc).isoformat(),
+            "mode": mode,
+            "busy": bool(busy),
+            "wal_frames": frames,
+            "checkpointed_frames": done,
+            "checkpoint_ms": round(ms, 1),
+            "pages_reclaimed": reclaimed,
+            "wal_bytes_before": before["wal_bytes"],
+            **after,
+        }
+        if busy:
+            logger.warning(f"⚠️ {mode} checkpoint busy: {done}/{frames} "
+                           f"WAL frames checkpointed")
+        elif quiet or reclaimed:
+            logger.info(
+                f"🧹 {mode} checkpoint: WAL {before['wal_bytes']:,} → "
+                f"{after['wal_bytes']:,} bytes, reclaimed {reclaimed} pages, "
+                f"{after['freelist_count']} free ({ms:.0f} ms)")
+        return self.last_run
+
+    def status(self):
+        return {
+            "last_run": self.last_run,
+            "checkpoints": dict(self.checkpoints),
+            "pages_reclaimed": self.pages_reclaimed,
+        }
+
+
+wal_maintainer = WalMaintainer(DB_FILE)
+
+# ==== Database Partitioning ====
+# "" keeps a single database. "guild" gives every guild its own file, and
+# a number N spreads guilds over N files by guild_id % N. Each file has its
+# own writer, so a busy guild no longer holds the write lock for the rest.
+# Guild commands and events use their guild's file; DMs, startup and Flask
+# keep using bot_database.db, so a user's DM balance and each guild's
+# balance are separate accounts. Partition files start empty, so it can
+# only be switched on while bot_database.db has no users yet.
+DB_PARTITIONS = os.getenv("DB_PARTITIONS", "").strip().lower()
+PARTITION_DIR = "partitions"
+
+_active_partition = contextvars.ContextVar("db_partition", default=None)
 
-    cursor.execute(
-        '''
-        INSERT INTO transactions (user_id, transaction_type, amount, balance_before, balance_after, description)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, transaction_type, amount, balance_before, balance_after,
-          description))
 
-    conn.commit()
-    conn.close()
+class Partition:
+    """One database file and every object bound to it: pools, group-commit
+    writer, caches, write-behind buffers, ledger and maintenance helpers"""
 
+    OBJECTS = ("db_pool", "db_read_pool", "db_writer", "user_cache",
+               "leaderboards", "monthly_stats_buffer", "transaction_log",
+               "ledger", "transaction_archiver", "integrity_monitor",
+               "wal_maintainer")
 
+    def __init__(self, key, db_file, backup_dir, **objects):
+        self.key = key
+        self.db_file = db_file
+        self.backup_dir = backup_dir
+        self.ready = key is None
+        for name in self.OBJECTS:
+            setattr(self, name, objects[name])
+
+        # Writer threads and hooks run with this partition active
+        self.context = contextvars.copy_context()
+        self.context.run(_active_partition.set, self)
+        self.db_writer.context = self.context
+
+    @property
+    def name(self):
+        return self.key or "main"
+
+    @classmethod
+    def open(cls, key):
+        """Fresh objects for partition `key`; the file is created by
+        init_database on first use"""
+        db_file = os.path.join(PARTITION_DIR, f"{key}.db")
+        writer = GroupCommitWriter(db_file)
+        return cls(key,
+                   db_file,
+                   os.path.join("backups", PARTITION_DIR, key),
+                   db_pool=DatabasePool(db_file),
+                   db_read_pool=DatabasePool(db_file,
+                                             max_connections=DB_READ_WORKERS,
+                                             profile="reader",
+                                             read_only=True),
+                   db_writer=writer,
+                   user_cache=LRUCache(max_entries=1000),
+                   leaderboards=LeaderboardEngine(),
+                   monthly_stats_buffer=MonthlyStatsBuffer(writer),
+                   transaction_log=TransactionLogBuffer(writer),
+                   ledger=Ledger(writer),
+                   transaction_archiver=TransactionArchiver(
+                       os.path.join(TRANSACTION_ARCHIVE_DIR, PARTITION_DIR,
+                                    key), TRANSACTION_RETENTION_DAYS),
+                   integrity_monitor=IntegrityMonitor(db_file),
+                   wal_maintainer=WalMaintainer(db_file))
+
+    async def run(self, func, *args, **kwargs):
+        """Await `func(*args)` in its own task with this partition active,
+        leaving the caller's context untouched"""
+
+        async def runner():
+            _active_partition.set(self)
+            return await func(*args, **kwargs)
+
+        return await asyncio.ensure_future(runner())
+
+    def call(self, func, *args, **kwargs):
+        """Blocking counterpart of run() for worker and Flask threads"""
+        return self.context.copy().run(func, *args, **kwargs)
+
+    def close(self):
+        """Flush buffered rows and stop the writer (blocking)"""
+        self.transaction_log.flush(wait=True)
+        self.monthly_stats_buffer.flush(wait=True)
+        self.db_writer.stop()
+
+
+class PartitionLocal:
+    """Stand-in for a module-level database object (db_writer, ledger, ...)
+    that forwards to the instance of the partition active in the current
+    context. Installed only when partitioning is enabled."""
+
+    __slots__ = ("_name", )
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(getattr(active_partition(), self._name), attr)
+
+    def __repr__(self):
+        return f"<PartitionLocal {self._name}>"
+
+
+class PartitionRouter:
+    """Picks the partition for a guild and fans work out over all of them.
+    Guild commands and events run with their guild's partition active;
+    contexts without a guild (DMs, startup, Flask) use the main database."""
+
+    def __init__(self, mode, default):
+        self.mode = mode
+        self.default = default
+        self.buckets = int(mode) if mode and mode != "guild" else None
+        self.partitions = {}
+        self._lock = None  # asyncio.Lock, created on first use
+
+    @property
+    def enabled(self):
+        return bool(self.mode)
+
+    def key_for(self, guild_id):
+        if not self.enabled or guild_id is None:
+            return None
+        if self.buckets:
+            return f"bucket_{guild_id % self.buckets}"
+        return f"guild_{guild_id}"
+
+    async def get(self, guild_id):
+        key = self.key_for(guild_id)
+        if key is None:
+            return self.default
+        partition = self.partitions.get(key)
+        if partition is None or not partition.ready:
+            partition = await self._open(key)
+        return partition
+
+    async def activate(self, guild_id):
+        """Make the guild's partition active for the rest of this task"""
+        partition = await self.get(guild_id)
+        _active_partition.set(partition)
+        return partition
+
+    async def _open(self, key):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            partition = self.partitions.get(key)
+            if partition is None:
+                os.makedirs(PARTITION_DIR, exist_ok=True)
+                partition = self.partitions[key] = Partition.open(key)
+            if not partition.ready:
+                await partition.run(init_database)
+                await partition.run(run_db,
+                                    partition.integrity_monitor.load_history)
+                partition.ready = True
+                logger.info(f"🧩 Partition {key} ready ({partition.db_file})")
+        return partition
+
+    async def start(self):
+        """Open every bucket, or every guild partition already on disk.
+        Returns False when partitioning must not be switched on."""
+        if not self.enabled:
+            return True
+        if not os.path.isdir(PARTITION_DIR):
+            # First partitioned start: guild files would start empty and
+            # hide every balance already in the main database
+            users = await run_db(_count_users)
+            if users:
+                logger.critical(
+                    f"❌ DB_PARTITIONS={self.mode} would hide the users "
+                    f"already in {self.default.db_file} ({users:,}): "
+                    "partitions start empty. Unset DB_PARTITIONS or start "
+                    "from an empty database.")
+                return False
+            os.makedirs(PARTITION_DIR, exist_ok=True)
+        if self.buckets:
+            keys = [f"bucket_{i}" for i in range(self.buckets)]
+        elif os.path.isdir(PARTITION_DIR):
+            keys = [
+                f[:-3] for f in os.listdir(PARTITION_DIR)
+                if f.startswith("guild_") and f.endswith(".db")
+            ]
+        else:
+            keys = []
+        for key in keys:
+            await self._open(key)
+        logger.info(
+            f"🧩 Partitioning by {self.mode}: {len(self.partitions)} partitions open"
+        )
+        return True
+
+    def all(self):
+        return [self.default
+                ] + [p for p in self.partitions.values() if p.ready]
+
+    async def fan_out(self, func, *args, **kwargs):
+        """Await `func(*args)` once per partition, in parallel, each with
+        its own partition active. `func` is called inside that context, so
+        module-level database names in it resolve to the partition; pass a
+        lambda rather than a method bound outside. Returns {name: result}. A failing
+        partition does not cancel the others; the first error is raised
+        once all of them have finished."""
+        targets = self.all()
+        results = await asyncio.gather(*(p.run(func, *args, **kwargs)
+                                         for p in targets),
+                                       return_exceptions=True)
+        errors = []
+        for partition, result in zip(targets, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Partition {partition.name} failed: {result}")
+                errors.append(result)
+        if errors:
+            raise errors[0]
+        return {p.name: result for p, result in zip(targets, results)}
+
+    def close(self):
+        """Flush and stop every guild partition (blocking)"""
+        for partition in self.partitions.values():
+            partition.close()
+
+    def stats(self):
+        return {
+            "mode": self.mode or "off",
+            "partitions": {
+                p.name: {
+                    "file": p.db_file,
+                    "users": p.call(_count_users),
+                    "writer": p.db_writer.stats(),
+                }
+                for p in self.all()
+            }
+        }
+
+
+def active_partition():
+    """The partition the current context reads and writes"""
+    return _active_partition.get() or default_partition
+
+
+default_partition = Partition(None,
+                              DB_FILE,
+                              "backups",
+                              db_pool=db_pool,
+                              db_read_pool=db_read_pool,
+                              db_writer=db_writer,
+                              user_cache=user_cache,
+                              leaderboards=leaderboards,
+                              monthly_stats_buffer=monthly_stats_buffer,
+                              transaction_log=transaction_log,
+                              ledger=ledger,
+                              transaction_archiver=transaction_archiver,
+                              integrity_monitor=integrity_monitor,
+                              wal_maintainer=wal_maintainer)
+partitions = PartitionRouter(DB_PARTITIONS, default_partition)
+
+if partitions.enabled:
+    # From here on these names resolve per context, see PartitionLocal
+    db_pool = PartitionLocal("db_pool")
+    db_read_pool = PartitionLocal("db_read_pool")
+    db_writer = PartitionLocal("db_writer")
+    user_cache = PartitionLocal("user_cache")
+    leaderboards = PartitionLocal("leaderboards")
+    monthly_stats_buffer = PartitionLocal("monthly_stats_buffer")
+    transaction_log = PartitionLocal("transaction_log")
+    ledger = PartitionLocal("ledger")
+    transaction_archiver = PartitionLocal("transaction_archiver")
+    integrity_monitor = PartitionLocal("integrity_monitor")
+    wal_maintainer = PartitionLocal("wal_maintainer")
+
+
+@db_reader
 def is_nickname_locked(user_id):
     """Check if user has nickname lock"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('SELECT user_id FROM nickname_locks WHERE user_id = ?',
-                   (user_id, ))
-    result = cursor.fetchone()
-    conn.close()
+        cursor.execute('SELECT user_id FROM nickname_locks WHERE user_id = ?',
+                       (user_id, ))
+        result = cursor.fetchone()
 
     return result is not None
 
 
-def add_name_change_card(owner_id, target_id, original_nick, new_nick,
+@db_write
+def add_name_change_card(conn, owner_id, target_id, original_nick, new_nick,
                          expires_at, guild_id):
     """Add a name change card record"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute(
@@ -1647,21 +4932,19 @@ def add_name_change_card(owner_id, target_id, original_nick, new_nick,
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (owner_id, target_id, original_nick, new_nick, expires_at, guild_id))
 
-    conn.commit()
-    conn.close()
 
+@db_reader
+def get_expired_name_changes(now_ms):
+    """Name changes due to be reverted (index range scan on expires_at)"""
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
 
-def get_active_name_changes():
-    """Get all active name changes"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT id, owner_id, target_id, original_nickname, expires_at, guild_id
-        FROM name_change_cards
-    ''')
-    results = cursor.fetchall()
-    conn.close()
+        cursor.execute(
+            '''
+            SELECT id, owner_id, target_id, original_nickname, expires_at, guild_id
+            FROM name_change_cards WHERE expires_at <= ?
+        ''', (now_ms, ))
+        results = cursor.fetchall()
 
     return [{
         'id': r[0],
@@ -1673,36 +4956,34 @@ def get_active_name_changes():
     } for r in results]
 
 
-def remove_name_change_card(card_id):
+@db_write
+def remove_name_change_card(conn, card_id):
     """Remove a name change card record"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute('DELETE FROM name_change_cards WHERE id = ?', (card_id, ))
-    conn.commit()
-    conn.close()
 
 
-def add_nickname_lock(user_id):
+@db_write
+def add_nickname_lock(conn, user_id):
     """Add nickname lock for user"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute(
         'INSERT OR REPLACE INTO nickname_locks (user_id) VALUES (?)',
         (user_id, ))
-    conn.commit()
-    conn.close()
 
 
-def get_temp_admins():
-    """Get all temp admins"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+@db_reader
+def get_expired_temp_admins(now_ms):
+    """Temp admins whose grant has run out (index range scan on expires_at)"""
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('SELECT user_id, expires_at, guild_id FROM temp_admins')
-    results = cursor.fetchall()
-    conn.close()
+        cursor.execute(
+            'SELECT user_id, expires_at, guild_id FROM temp_admins WHERE expires_at <= ?',
+            (now_ms, ))
+        results = cursor.fetchall()
 
     return [{
         'user_id': r[0],
@@ -1711,9 +4992,9 @@ def get_temp_admins():
     } for r in results]
 
 
-def add_temp_admin(user_id, expires_at, guild_id):
+@db_write
+def add_temp_admin(conn, user_id, expires_at, guild_id):
     """Add temporary admin"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute(
@@ -1722,53 +5003,53 @@ def add_temp_admin(user_id, expires_at, guild_id):
         VALUES (?, ?, ?)
     ''', (user_id, expires_at, guild_id))
 
-    conn.commit()
-    conn.close()
-
 
-def remove_temp_admin(user_id):
+@db_write
+def remove_temp_admin(conn, user_id):
     """Remove temporary admin"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     cursor.execute('DELETE FROM temp_admins WHERE user_id = ?', (user_id, ))
-    conn.commit()
-    conn.close()
-
-
-def get_leaderboard(field='balance', limit=10):
-    """Get leaderboard by specified field"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
 
-    query = f'SELECT user_id, {field} FROM users ORDER BY {field} DESC LIMIT ?'
-    cursor.execute(query, (limit, ))
-    results = cursor.fetchall()
-    conn.close()
 
-    return results
+async def get_leaderboard(field='balance', limit=10):
+    """Get leaderboard by specified field (served from memory)"""
+    return await leaderboards.top(field, limit)
 
 
-def get_top_losers(month=None, limit=10):
+async def get_top_losers(month=None, limit=10):
     """Get top losers for the month"""
-    if not month:
-        month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+    current_month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+    if not month or month == current_month:
+        return await leaderboards.top('losses', limit, current_month)
+    return await _query_top_losers(month, limit)
 
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
 
-    cursor.execute(
-        '''
-        SELECT user_id, losses FROM monthly_stats
-        WHERE month = ? ORDER BY losses DESC LIMIT ?
-    ''', (month, limit))
+@db_reader
+def _query_top_losers(month, limit):
+    """Top losers for a past month, read from monthly_stats"""
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
 
-    results = cursor.fetchall()
-    conn.close()
+        cursor.execute(
+            '''
+            SELECT user_id, losses FROM monthly_stats
+            WHERE month = ? ORDER BY losses DESC LIMIT ?
+        ''', (month, limit))
+
+        results = cursor.fetchall()
 
     return results
 
 
+def _count_users():
+    """Count rows in the users table (blocking)"""
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        return cursor.fetchone()[0]
+
+
 # Initialize database on startup
 async def ensure_database_exists():
     """Ensure database exists, restore from backup if needed"""
@@ -1793,10 +5074,8 @@ async def ensure_database_exists():
         await init_database()
 
     # Clear caches after restore so fresh data loads
-    if 'user_cache' in globals():
-        user_cache.clear()
-    if 'leaderboard_cache' in globals():
-        leaderboard_cache.clear()
+    user_cache.clear()
+    await leaderboards.rebuild()
 
 
 async def enhanced_startup():
@@ -1805,10 +5084,8 @@ async def enhanced_startup():
 
     # Test database first
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM users")
-            logger.info("✅ Database connection verified")
+        await run_db_read(_count_users)
+        logger.info("✅ Database connection verified")
     except Exception as e:
         logger.error(f"❌ Database startup failed: {e}")
         return False
@@ -1869,7 +5146,7 @@ async def enhanced_auto_backup():
             return False
 
         # Test GitHub connection first
-        github_ok, github_msg = github_backup.test_connection()
+        github_ok, github_msg = await github_backup.test_connection()
         if not github_ok:
             logger.error(
                 f"❌ [AUTO-BACKUP] GitHub connection failed: {github_msg}")
@@ -1889,7 +5166,7 @@ async def enhanced_auto_backup():
 
         # Create local backup
         logger.info("📁 [AUTO-BACKUP] Creating local backup...")
-        backup_file = create_backup_with_cloud_storage()
+        backup_file = await run_db(create_backup_with_cloud_storage)
 
         if not backup_file:
             logger.error("❌ [AUTO-BACKUP] Failed to create local backup")
@@ -1900,10 +5177,17 @@ async def enhanced_auto_backup():
             f"✅ [AUTO-BACKUP] Local backup created: {os.path.basename(backup_file)} ({file_size:,} bytes)"
         )
 
+        # Guild partitions have their own backup folders
+        try:
+            await backup_guild_partitions(upload=github_ok)
+        except Exception as partition_error:
+            logger.error(
+                f"❌ [AUTO-BACKUP] Partition backups failed: {partition_error}")
+
         # Upload to GitHub if connection is OK
         if github_ok:
             logger.info("☁️ [AUTO-BACKUP] Uploading to GitHub...")
-            success, result = github_backup.upload_backup_to_github(
+            success, result = await github_backup.upload_backup_to_github(
                 backup_file)
 
             if success:
@@ -1913,14 +5197,11 @@ async def enhanced_auto_backup():
                 try:
                     backup_files = [
                         f for f in os.listdir("backups")
-                        if f.startswith("backup_") and f.endswith(".db")
+                        if f.startswith("backup_") and is_backup_file(f)
                     ]
-                    backup_files.sort(key=lambda x: os.path.getmtime(
-                        os.path.join("backups", x)),
-                                      reverse=True)
 
                     if len(backup_files) > 10:
-                        for old_backup in backup_files[10:]:
+                        for old_backup in stale_backups(backup_files, 10):
                             old_path = os.path.join("backups", old_backup)
                             os.remove(old_path)
                             logger.info(
@@ -1996,7 +5277,7 @@ async def backup_health_monitor():
             if os.path.exists("backups"):
                 backup_files = [
                     f for f in os.listdir("backups")
-                    if f.startswith("backup_") and f.endswith(".db")
+                    if f.startswith("backup_") and is_backup_file(f)
                 ]
                 if backup_files:
                     backup_files.sort(key=lambda x: os.path.getmtime(
@@ -2025,7 +5306,7 @@ async def backup_health_monitor():
 
         # Check GitHub connection
         if github_backup:
-            github_ok, github_msg = github_backup.test_connection()
+            github_ok, github_msg = await github_backup.test_connection()
             if not github_ok:
                 issues.append(f"GitHub connection failed: {github_msg}")
                 logger.warning(f"⚠️ [HEALTH-CHECK] GitHub issue: {github_msg}")
@@ -2047,75 +5328,48 @@ async def backup_health_monitor():
 # ==== Monthly Conversion System ====
 
 
+@db_reader
 def get_all_users_with_sp():
     """Get all users who have SP > 0"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
+    with get_db_read_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute('SELECT user_id, sp, balance FROM users WHERE sp > 0')
-    results = cursor.fetchall()
-    conn.close()
+        cursor.execute('SELECT user_id, sp, balance FROM users WHERE sp > 0')
+        results = cursor.fetchall()
 
     return [{'user_id': r[0], 'sp': r[1], 'balance': r[2]} for r in results]
 
 
-def reset_monthly_stats():
+@db_write
+def reset_monthly_stats(conn):
     """Reset monthly gambling stats for new month"""
-    conn = sqlite3.connect(DB_FILE)
     cursor = conn.cursor()
 
     # Clear previous month's stats (keep only current month)
     current_month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
     cursor.execute('DELETE FROM monthly_stats WHERE month != ?',
                    (current_month, ))
+    db_writer.on_commit(
+        functools.partial(monthly_stats_buffer.discard_other_months,
+                          current_month))
 
-    conn.commit()
-    conn.close()
-
-
-async def perform_monthly_conversion():
-    """Convert all SP to SS for all users and reset SP"""
-    try:
-        users_with_sp = get_all_users_with_sp()
-        total_converted = 0
-        conversion_count = 0
-
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-
-        for user_data in users_with_sp:
-            user_id = user_data['user_id']
-            sp_amount = user_data['sp']
-            old_balance = user_data['balance']
-
-            if sp_amount > 0:
-                # Convert SP to SS
-                new_balance = old_balance + sp_amount
-                new_sp = 100  # Reset to starting SP amount
-
-                # Update database
-                cursor.execute(
-                    '''
-                    UPDATE users SET balance = ?, sp = ? WHERE user_id = ?
-                ''', (new_balance, new_sp, user_id))
-
-                # Log transaction
-                log_transaction(
-                    user_id, "monthly_conversion", sp_amount, old_balance,
-                    new_balance,
-                    f"Monthly auto-conversion: {sp_amount} SP → SS")
 
-                total_converted += sp_amount
-                conversion_count += 1
+CONVERSION_CHUNK_SIZE = 500
 
-                logger.info(
-                    f"✅ Converted {sp_amount} SP → SS for user {user_id}")
 
-        conn.commit()
-        conn.close()
+async def perform_monthly_conversion(run_id=None):
+    """Convert all SP to SS for all users and reset SP.
 
-        # Reset monthly gambling stats
-        reset_monthly_stats()
+    Runs in user_id key-range chunks, each committed with its checkpoint
+    in conversion_runs, so an interrupted run resumes where it stopped and
+    a run id (the month by default) never converts anyone twice."""
+    if run_id is None:
+        run_id = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+    try:
+        results = await partitions.fan_out(
+            lambda: storage.convert_all_sp(run_id))
+        total_converted = sum(total for total, _ in results.values())
+        conversion_count = sum(count for _, count in results.values())
 
         logger.info(
             f"🎯 Monthly conversion complete: {conversion_count} users, {total_converted:,} SP converted"
@@ -2127,6 +5381,78 @@ async def perform_monthly_conversion():
         return 0, 0
 
 
+@db_write
+def _start_conversion_run(conn, run_id):
+    """Create or load the checkpoint row for a conversion run"""
+    conn.execute(
+        'INSERT OR IGNORE INTO conversion_runs (run_id, started_at) VALUES (?, ?)',
+        (run_id, epoch_ms()))
+    return conn.execute(
+        'SELECT last_user_id, completed_at FROM conversion_runs WHERE run_id = ?',
+        (run_id, )).fetchone()
+
+
+@db_write
+def _convert_sp_chunk(conn, run_id, chunk_size):
+    """Convert the next key range of users and advance the checkpoint.
+    Returns False once every user has been processed."""
+    cursor = conn.cursor()
+    last_user_id = cursor.execute(
+        'SELECT last_user_id FROM conversion_runs WHERE run_id = ?',
+        (run_id, )).fetchone()[0]
+    upper = cursor.execute(
+        '''
+        SELECT MAX(user_id) FROM (
+            SELECT user_id FROM users WHERE user_id > ?
+            ORDER BY user_id LIMIT ?)
+    ''', (last_user_id, chunk_size)).fetchone()[0]
+    if upper is None:
+        return False
+
+    # Audit rows first, while the old balances are still visible
+    amounts = cursor.execute(
+        '''
+        INSERT INTO transactions (user_id, transaction_type, amount, balance_before, balance_after, description)
+        SELECT user_id, 'monthly_conversion', sp, balance, balance + sp,
+               'Monthly auto-conversion: ' || sp || ' SP → SS'
+        FROM users WHERE user_id > ? AND user_id <= ? AND sp > 0
+        RETURNING amount
+    ''', (last_user_id, upper)).fetchall()
+    converted = cursor.execute(
+        '''
+        UPDATE users SET balance = balance + sp, sp = 100
+        WHERE user_id > ? AND user_id <= ? AND sp > 0
+        RETURNING user_id, balance, sp
+    ''', (last_user_id, upper)).fetchall()
+    cursor.execute(
+        '''
+        UPDATE conversion_runs
+        SET last_user_id = ?, users_converted = users_converted + ?,
+            sp_converted = sp_converted + ?
+        WHERE run_id = ?
+    ''', (upper, len(converted), sum(a for a, in amounts), run_id))
+
+    for user_id, balance, sp in converted:
+        db_writer.on_commit(
+            functools.partial(publish_user_update,
+                              user_id,
+                              balance=balance,
+                              sp=sp))
+    return True
+
+
+@db_write
+def _finish_conversion_run(conn, run_id):
+    """Mark a run complete and reset monthly stats in the same commit"""
+    reset_monthly_stats.intent(conn)
+    conn.execute(
+        'UPDATE conversion_runs SET completed_at = ? WHERE run_id = ?',
+        (epoch_ms(), run_id))
+    return conn.execute(
+        'SELECT sp_converted, users_converted FROM conversion_runs WHERE run_id = ?',
+        (run_id, )).fetchone()
+
+
 @tasks.loop(hours=1)  # Check every hour
 async def monthly_conversion_check():
     """Check if it's time for monthly conversion (1st of month, 00:00 UTC)"""
@@ -2141,13 +5467,15 @@ async def monthly_conversion_check():
 
             if total_converted > 0:
                 # Create backup after monthly conversion
-                if github_backup:
-                    backup_file = create_backup_with_cloud_storage()
+                if github_backup and STORAGE_BACKEND == "sqlite":
+                    backup_file = await run_db(create_backup_with_cloud_storage
+                                               )
                     if backup_file:
-                        success, result = github_backup.upload_backup_to_github(
+                        success, result = await github_backup.upload_backup_to_github(
                             backup_file)
                         if success:
                             logger.info("✅ Post-conversion backup created")
+                    await backup_guild_partitions()
 
                 # Notify in all guilds (optional)
                 if bot is not None and bot.guilds:
@@ -2213,7 +5541,43 @@ async def monthly_conversion_check():
         logger.error(f"❌ Monthly conversion check error: {e}")
 
 
+INTEGRITY_CHECK_INTERVAL_MIN = 10
+
+
+@tasks.loop(minutes=INTEGRITY_CHECK_INTERVAL_MIN)
+async def integrity_check_task():
+    """Advance the incremental integrity pass during quiet periods"""
+    try:
+        # Looked up per partition, inside each partition's context
+        await partitions.fan_out(lambda: integrity_monitor.run_idle_steps(
+            INTEGRITY_CHECK_INTERVAL_MIN * 60))
+    except Exception as e:
+        logger.error(f"❌ Integrity check error: {e}")
+
+
+WAL_CHECKPOINT_INTERVAL_MIN = 5
+
+
+@tasks.loop(minutes=WAL_CHECKPOINT_INTERVAL_MIN)
+async def wal_maintenance_task():
+    """Checkpoint the WAL and reclaim free pages (see WalMaintainer)"""
+    try:
+        await partitions.fan_out(
+            lambda: wal_maintainer.run(WAL_CHECKPOINT_INTERVAL_MIN * 60))
+    except Exception as e:
+        logger.error(f"❌ WAL maintenance error: {e}")
+
+
 # AP I Health monitoring
+@tasks.loop(hours=24)
+async def transaction_retention_task():
+    """Roll up, archive and prune old transactions once a day"""
+    try:
+        await partitions.fan_out(lambda: transaction_archiver.run())
+    except Exception as e:
+        logger.error(f"❌ Transaction retention error: {e}")
+
+
 @tasks.loop(minutes=5)
 async def api_health_monitor():
     """Monitor API usage and rate limiting status"""
@@ -2262,10 +5626,8 @@ async def startup_sequence():
 
     # Test database first
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM users")
-            logger.info("✅ Database connection verified")
+        await run_db_read(_count_users)
+        logger.info("✅ Database connection verified")
     except Exception as e:
         logger.error(f"❌ Database startup failed: {e}")
         return False
@@ -2296,6 +5658,522 @@ async def startup_sequence():
     return True
 
 
+# ==== Storage ====
+class Storage(ABC):
+    """What the command layer needs from persistence: users, the ledger,
+    monthly stats, leaderboards, locks, temp admins, name change cards and
+    the audit log. Ledger operations return the new balance(s), or None
+    when a guard rejects the change, as Ledger does."""
+
+    async def warm_up(self):
+        """Load anything that must be ready before commands run"""
+
+    @abstractmethod
+    async def get_user(self, user_id):
+        ...
+
+    @abstractmethod
+    async def update_user(self, user_id, **fields):
+        ...
+
+    @abstractmethod
+    async def credit(self, user_id, amount, currency="balance", **kwargs):
+        ...
+
+    @abstractmethod
+    async def debit(self, user_id, amount, currency="balance", **kwargs):
+        ...
+
+    @abstractmethod
+    async def transfer(self,
+                       sender_id,
+                       receiver_id,
+                       amount,
+                       currency="balance",
+                       **kwargs):
+        ...
+
+    @abstractmethod
+    async def convert(self, user_id, amount, **kwargs):
+        ...
+
+    @abstractmethod
+    async def claim_daily(self, user_id, reward, streak, claimed_at,
+                          description):
+        ...
+
+    @abstractmethod
+    async def settle_coinflip(self, user_id, bet, won, flip):
+        ...
+
+    @abstractmethod
+    async def convert_all_sp(self, run_id):
+        """Run the monthly SP → SS conversion once per run id and return
+        (sp_converted, users_converted)"""
+
+    @abstractmethod
+    async def get_monthly_stats(self, user_id, month=None):
+        ...
+
+    @abstractmethod
+    async def add_monthly_stats(self, user_id, wins=0, losses=0, month=None):
+        ...
+
+    @abstractmethod
+    async def top(self, field, limit=10):
+        ...
+
+    @abstractmethod
+    async def top_losers(self, month=None, limit=10):
+        ...
+
+    @abstractmethod
+    async def rank(self, field, user_id, radius=5):
+        ...
+
+    @abstractmethod
+    def board_size(self, field):
+        ...
+
+    @abstractmethod
+    def user_count(self):
+        """Number of stored users (blocking; used by /health)"""
+
+    @abstractmethod
+    async def is_nickname_locked(self, user_id):
+        ...
+
+    @abstractmethod
+    async def add_nickname_lock(self, user_id):
+        ...
+
+    @abstractmethod
+    async def add_temp_admin(self, user_id, expires_at, guild_id):
+        ...
+
+    @abstractmethod
+    async def remove_temp_admin(self, user_id):
+        ...
+
+    @abstractmethod
+    async def expired_temp_admins(self, now_ms):
+        ...
+
+    @abstractmethod
+    async def add_name_change_card(self, owner_id, target_id, original_nick,
+                                   new_nick, expires_at, guild_id):
+        ...
+
+    @abstractmethod
+    async def remove_name_change_card(self, card_id):
+        ...
+
+    @abstractmethod
+    async def expired_name_changes(self, now_ms):
+        ...
+
+    @abstractmethod
+    async def log_transaction(self,
+                              user_id,
+                              transaction_type,
+                              amount,
+                              balance_before,
+                              balance_after,
+                              description=""):
+        ...
+
+
+class SQLiteStorage(Storage):
+    """The production backend: group-commit writer, Ledger, reader pool,
+    write-behind buffers and in-memory leaderboards"""
+
+    async def warm_up(self):
+        await leaderboards.rebuild()
+
+    async def get_user(self, user_id):
+        return await get_user_data(user_id)
+
+    async def update_user(self, user_id, **fields):
+        return await update_user_data(user_id, **fields)
+
+    async def credit(self, user_id, amount, currency="balance", **kwargs):
+        return await ledger.credit(user_id, amount, currency, **kwargs)
+
+    async def debit(self, user_id, amount, currency="balance", **kwargs):
+        return await ledger.debit(user_id, amount, currency, **kwargs)
+
+    async def transfer(self,
+                       sender_id,
+                       receiver_id,
+                       amount,
+                       currency="balance",
+                       **kwargs):
+        return await ledger.transfer(sender_id, receiver_id, amount, currency,
+                                     **kwargs)
+
+    async def convert(self, user_id, amount, **kwargs):
+        return await ledger.convert(user_id, amount, **kwargs)
+
+    async def claim_daily(self, user_id, reward, streak, claimed_at,
+                          description):
+        return await claim_daily(user_id, reward, streak, claimed_at,
+                                 description)
+
+    async def settle_coinflip(self, user_id, bet, won, flip):
+        return await settle_coinflip(user_id, bet, won, flip)
+
+    async def convert_all_sp(self, run_id):
+        last_user_id, completed = await _start_conversion_run(run_id)
+        if completed:
+            logger.info(f"ℹ️ Conversion {run_id} already completed")
+            return 0, 0
+        if last_user_id:
+            logger.info(
+                f"🔁 Resuming conversion {run_id} after user {last_user_id}")
+
+        while await _convert_sp_chunk(run_id, CONVERSION_CHUNK_SIZE):
+            # Let queued command writes through between chunks
+            await asyncio.sleep(0)
+
+        # Reset monthly gambling stats and close the run in one commit
+        return tuple(await _finish_conversion_run(run_id))
+
+    async def get_monthly_stats(self, user_id, month=None):
+        return await get_monthly_stats(user_id, month)
+
+    async def add_monthly_stats(self, user_id, wins=0, losses=0, month=None):
+        await update_monthly_stats(user_id, wins, losses, month)
+
+    async def top(self, field, limit=10):
+        return await get_leaderboard(field, limit)
+
+    async def top_losers(self, month=None, limit=10):
+        return await get_top_losers(month, limit)
+
+    async def rank(self, field, user_id, radius=5):
+        return await leaderboards.around(field, user_id, radius)
+
+    def board_size(self, field):
+        return len(leaderboards.boards[field])
+
+    def user_count(self):
+        return _count_users()
+
+    async def is_nickname_locked(self, user_id):
+        return await is_nickname_locked(user_id)
+
+    async def add_nickname_lock(self, user_id):
+        await add_nickname_lock(user_id)
+
+    async def add_temp_admin(self, user_id, expires_at, guild_id):
+        await add_temp_admin(user_id, expires_at, guild_id)
+
+    async def remove_temp_admin(self, user_id):
+        await remove_temp_admin(user_id)
+
+    async def expired_temp_admins(self, now_ms):
+        return await get_expired_temp_admins(now_ms)
+
+    async def add_name_change_card(self, owner_id, target_id, original_nick,
+                                   new_nick, expires_at, guild_id):
+        await add_name_change_card(owner_id, target_id, original_nick,
+                                   new_nick, expires_at, guild_id)
+
+    async def remove_name_change_card(self, card_id):
+        await remove_name_change_card(card_id)
+
+    async def expired_name_changes(self, now_ms):
+        return await get_expired_name_changes(now_ms)
+
+    async def log_transaction(self, *args, **kwargs):
+        await log_transaction(*args, **kwargs)
+
+
+class MemoryStorage(Storage):
+    """Dict-backed storage with the same guards, audit rows and
+    leaderboards as SQLiteStorage but no disk I/O, for load-testing the
+    command layer. Every method completes without awaiting, so each
+    operation is atomic on the event loop. Nothing survives a restart."""
+
+    def __init__(self, audit_limit=100_000):
+        self.users = {}
+        self.monthly_stats = defaultdict(lambda: [0, 0])
+        self.nickname_locks = set()
+        self.temp_admins = {}
+        self.name_change_cards = {}
+        self.transactions = deque(maxlen=audit_limit)
+        self.completed_runs = set()
+        self.boards = {
+            "balance": Leaderboard(),
+            "sp": Leaderboard(),
+            "losses": Leaderboard()
+        }
+        self.month = None
+        self._next_card_id = 1
+
+    @staticmethod
+    def _current_month():
+        return datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+
+    def _user(self, user_id):
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = {
+                'user_id': user_id,
+                'balance': 0,
+                'sp': 100,
+                'last_claim': None,
+                'streak': 0,
+                'created_at': epoch_ms()
+            }
+            self._publish(user_id, balance=0, sp=100)
+        return user
+
+    def _publish(self, user_id, **fields):
+        for field in Ledger.CURRENCIES:
+            if field in fields:
+                self.boards[field].update(user_id, fields[field])
+
+    def _set(self, user, **fields):
+        user.update(fields)
+        self._publish(user['user_id'], **fields)
+
+    def _audit(self,
+               user_id,
+               transaction_type,
+               amount,
+               balance_before,
+               balance_after,
+               description=""):
+        self.transactions.append(
+            (user_id, transaction_type, amount, balance_before, balance_after,
+             description, epoch_ms()))
+
+    def _adjust(self, user_id, currency, delta):
+        if currency not in Ledger.CURRENCIES:
+            raise ValueError(f"Unknown currency: {currency}")
+        user = self._user(user_id)
+        after = user[currency] + delta
+        if after < 0:
+            return None
+        self._set(user, **{currency: after})
+        return after
+
+    def _credit(self,
+                user_id,
+                amount,
+                currency="balance",
+                transaction_type="credit",
+                description=""):
+        after = self._adjust(user_id, currency, amount)
+        if after is not None:
+            self._audit(user_id, transaction_type, amount, after - amount,
+                        after, description)
+        return after
+
+    def _debit(self,
+               user_id,
+               amount,
+               currency="balance",
+               transaction_type="debit",
+               description=""):
+        after = self._adjust(user_id, currency, -amount)
+        if after is not None:
+            self._audit(user_id, transaction_type, -amount, after + amount,
+                        after, description)
+        return after
+
+    def _add_losses(self, user_id, month, wins, losses):
+        entry = self.monthly_stats[(user_id, month)]
+        entry[0] += wins
+        entry[1] += losses
+        if self.month != month:
+            if self.month is not None and month < self.month:
+                return
+            self.boards["losses"] = Leaderboard()
+            self.month = month
+        if losses:
+            self.boards["losses"].update(user_id, entry[1])
+
+    async def get_user(self, user_id):
+        return dict(self._user(user_id))
+
+    async def update_user(self, user_id, **fields):
+        allowed = {'balance', 'sp', 'last_claim', 'streak'}
+        fields = {k: v for k, v in fields.items() if k in allowed}
+        if fields:
+            self._set(self._user(user_id), **fields)
+        return True
+
+    async def credit(self, user_id, amount, currency="balance", **kwargs):
+        return self._credit(user_id, amount, currency, **kwargs)
+
+    async def debit(self, user_id, amount, currency="balance", **kwargs):
+        return self._debit(user_id, amount, currency, **kwargs)
+
+    async def transfer(self,
+                       sender_id,
+                       receiver_id,
+                       amount,
+                       currency="balance",
+                       description=""):
+        sender_after = self._debit(sender_id, amount, currency, "transfer_out",
+                                   description)
+        if sender_after is None:
+            return None
+        receiver_after = self._credit(receiver_id, amount, currency,
+                                      "transfer_in", description)
+        return sender_after, receiver_after
+
+    async def convert(self,
+                      user_id,
+                      amount,
+                      transaction_type="exchange",
+                      description=""):
+        user = self.users.get(user_id)
+        if user is None or user['sp'] < amount:
+            return None
+        self._set(user,
+                  sp=user['sp'] - amount,
+                  balance=user['balance'] + amount)
+        self._audit(user_id, transaction_type, amount,
+                    user['balance'] - amount, user['balance'], description)
+        return user['sp'], user['balance']
+
+    async def claim_daily(self, user_id, reward, streak, claimed_at,
+                          description):
+        new_sp = self._credit(user_id, reward, "sp", "daily_claim",
+                              description)
+        self._set(self._user(user_id), last_claim=claimed_at, streak=streak)
+        return new_sp
+
+    async def settle_coinflip(self, user_id, bet, won, flip):
+        if won:
+            new_sp = self._credit(user_id, bet, "sp", "gambling_win",
+                                  f"Coinflip win: {flip}")
+        else:
+            new_sp = self._debit(user_id, bet, "sp", "gambling_loss",
+                                 f"Coinflip loss: {flip}")
+        if new_sp is not None:
+            self._add_losses(user_id, self._current_month(), bet if won else 0,
+                             0 if won else bet)
+        return new_sp
+
+    async def convert_all_sp(self, run_id):
+        if run_id in self.completed_runs:
+            logger.info(f"ℹ️ Conversion {run_id} already completed")
+            return 0, 0
+        total, count = 0, 0
+        for user_id, user in self.users.items():
+            sp = user['sp']
+            if sp <= 0:
+                continue
+            self._audit(user_id, 'monthly_conversion', sp, user['balance'],
+                        user['balance'] + sp,
+                        f"Monthly auto-conversion: {sp} SP → SS")
+            self._set(user, balance=user['balance'] + sp, sp=100)
+            total += sp
+            count += 1
+        current_month = self._current_month()
+        for key in [k for k in self.monthly_stats if k[1] != current_month]:
+            del self.monthly_stats[key]
+        self.completed_runs.add(run_id)
+        return total, count
+
+    async def get_monthly_stats(self, user_id, month=None):
+        wins, losses = self.monthly_stats.get(
+            (user_id, month or self._current_month()), (0, 0))
+        return {'wins': wins, 'losses': losses}
+
+    async def add_monthly_stats(self, user_id, wins=0, losses=0, month=None):
+        self._add_losses(user_id, month or self._current_month(), wins, losses)
+
+    async def top(self, field, limit=10):
+        return self.boards[field].top(limit)
+
+    async def top_losers(self, month=None, limit=10):
+        month = month or self._current_month()
+        if month == self.month:
+            return self.boards["losses"].top(limit)
+        rows = [(user_id, losses)
+                for (user_id, m), (_, losses) in self.monthly_stats.items()
+                if m == month]
+        return sorted(rows, key=lambda row: -row[1])[:limit]
+
+    async def rank(self, field, user_id, radius=5):
+        return self.boards[field].around(user_id, radius)
+
+    def board_size(self, field):
+        return len(self.boards[field])
+
+    def user_count(self):
+        return len(self.users)
+
+    async def is_nickname_locked(self, user_id):
+        return user_id in self.nickname_locks
+
+    async def add_nickname_lock(self, user_id):
+        self.nickname_locks.add(user_id)
+
+    async def add_temp_admin(self, user_id, expires_at, guild_id):
+        self.temp_admins[user_id] = {
+            'user_id': user_id,
+            'expires_at': expires_at,
+            'guild_id': guild_id
+        }
+
+    async def remove_temp_admin(self, user_id):
+        self.temp_admins.pop(user_id, None)
+
+    async def expired_temp_admins(self, now_ms):
+        return [
+            dict(admin) for admin in self.temp_admins.values()
+            if admin['expires_at'] <= now_ms
+        ]
+
+    async def add_name_change_card(self, owner_id, target_id, original_nick,
+                                   new_nick, expires_at, guild_id):
+        card_id = self._next_card_id
+        self._next_card_id += 1
+        self.name_change_cards[card_id] = {
+            'id': card_id,
+            'owner_id': owner_id,
+            'target_id': target_id,
+            'original_nickname': original_nick,
+            'new_nickname': new_nick,
+            'expires_at': expires_at,
+            'guild_id': guild_id
+        }
+
+    async def remove_name_change_card(self, card_id):
+        self.name_change_cards.pop(card_id, None)
+
+    async def expired_name_changes(self, now_ms):
+        return [{
+            k: card[k]
+            for k in ('id', 'owner_id', 'target_id', 'original_nickname',
+                      'expires_at', 'guild_id')
+        } for card in self.name_change_cards.values()
+                if card['expires_at'] <= now_ms]
+
+    async def log_transaction(self, *args, **kwargs):
+        self._audit(*args, **kwargs)
+
+
+# STORAGE_BACKEND=memory serves commands from MemoryStorage; main(),
+# on_ready and /health then skip everything that opens the database file
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+if STORAGE_BACKEND not in ("sqlite", "memory"):
+    logger.warning(
+        f"⚠️ Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}, using sqlite")
+    STORAGE_BACKEND = "sqlite"
+if STORAGE_BACKEND == "memory" and partitions.enabled:
+    # A single MemoryStorage would stand in for every partition at once
+    raise RuntimeError(
+        "STORAGE_BACKEND=memory cannot be combined with DB_PARTITIONS")
+storage = MemoryStorage() if STORAGE_BACKEND == "memory" else SQLiteStorage()
+
+
 # ==== Main Bot Execution ====
 async def main():
     """Main async function with proper startup sequence and error recovery"""
@@ -2329,8 +6207,24 @@ async def main():
                     logger.error("❌ All connection attempts failed")
                     return
 
-            # Create startup backup
-            await startup_backup()
+            if STORAGE_BACKEND == "sqlite":
+                # Make sure tables added since the database was created exist
+                await init_database()
+
+                # Cheap structural check; full checks run incrementally later
+                await run_db(integrity_monitor.load_history)
+                await integrity_monitor.run_quick_check()
+
+                # Open guild partitions (no-op unless DB_PARTITIONS is set)
+                if not await partitions.start():
+                    return
+
+                # Create startup backup
+                await startup_backup()
+            else:
+                logger.info(
+                    "🧠 In-memory storage: skipping database startup and backups"
+                )
 
             # Start the bot
             logger.info("🤖 Starting Discord bot connection...")
@@ -2371,6 +6265,17 @@ async def main():
         if bot and not bot.is_closed():
             logger.info("🛑 Closing bot connection...")
             await bot.close()
+        if STORAGE_BACKEND == "sqlite":
+            try:
+                await shutdown_backup()
+            except Exception as e:
+                logger.error(f"❌ Final backup failed: {e}")
+            await run_db(transaction_log.flush, wait=True)
+            await run_db(monthly_stats_buffer.flush, wait=True)
+            await run_db(db_writer.stop)
+            await run_db(partitions.close)
+        if github_backup:
+            await github_backup.close()
     except Exception as e:
         logger.error(f"❌ Error during cleanup: {e}")
 
@@ -2392,13 +6297,33 @@ def enhanced_health():
     status = {"status": "healthy", "timestamp": time.time()}
 
     try:
-        # Test database
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
+        # Test storage (Flask runs in its own thread, so blocking is fine)
+        status["user_count"] = storage.user_count()
+        status["storage"] = STORAGE_BACKEND
+        if STORAGE_BACKEND == "sqlite":
             status["database"] = "healthy"
-            status["user_count"] = user_count
+            if partitions.enabled:
+                status["partitions"] = partitions.stats()
+            status["db_pool"] = db_pool.stats()
+            status["db_read_pool"] = db_read_pool.stats()
+            status["db_writer"] = db_writer.stats()
+            status["user_cache"] = user_cache.stats()
+            status["leaderboards"] = leaderboards.stats()
+            status["transaction_log"] = transaction_log.stats()
+            status["monthly_stats"] = monthly_stats_buffer.stats()
+            status["transaction_retention"] = transaction_archiver.last_run
+            status["integrity"] = integrity_monitor.status()
+            status["wal"] = wal_maintainer.status()
+            status["backup"] = online_backup.status()
+            status["backup"]["compression"] = backup_compressor.status()
+            status["backup"]["chain"] = backup_chain.status()
+            if github_backup:
+                status["github"] = github_backup.stats()
+            status["sql"] = sql_metrics.stats()
+            if any(check and not check["ok"]
+                   for check in (integrity_monitor.last_quick,
+                                 integrity_monitor.last_full)):
+                status["database"] = "integrity check failed"
 
         # Test bot status
         status["bot_connected"] = bot.is_ready() if bot is not None else False
@@ -2441,47 +6366,45 @@ last_gamble_times = {}
 @tasks.loop(minutes=5)
 async def remove_expired_items():
     """Remove expired temp admin roles and name changes"""
-    # Handle temp admins
-    temp_admins = get_temp_admins()
-    now = datetime.datetime.now(timezone.utc)
+    await partitions.fan_out(expire_items)
 
-    for admin_data in temp_admins:
-        expire_time = datetime.datetime.fromisoformat(admin_data["expires_at"])
-        if now >= expire_time:
-            try:
-                guild = bot.get_guild(int(admin_data["guild_id"]))
-                if guild:
-                    member = guild.get_member(int(admin_data["user_id"]))
-                    role = guild.get_role(ROLE_ID_TEMP_ADMIN)
-                    if member and role:
-                        result, error = await safe_remove_roles(member, role)
-                remove_temp_admin(admin_data["user_id"])
-            except Exception as e:
-                logger.error(f"Error removing temp admin role: {e}")
 
-    # Handle name changes
-    active_name_changes = get_active_name_changes()
+async def expire_items():
+    """Revert the active partition's expired temp admins and name changes"""
+    now_ms = epoch_ms()
 
-    for change in active_name_changes:
-        expire_time = datetime.datetime.fromisoformat(change["expires_at"])
-        if now >= expire_time:
-            try:
-                guild = bot.get_guild(int(change["guild_id"]))
-                if guild:
-                    member = guild.get_member(int(change["target_id"]))
-                    if member:
-                        original_nick = change["original_nickname"]
-                        if original_nick == "None":
-                            original_nick = None
-                        await member.edit(nick=original_nick,
-                                          reason="Name change card expired")
-
-                remove_name_change_card(change["id"])
-                logger.info(
-                    f"✅ Name change expired for user {change['target_id']}")
+    # Handle temp admins
+    for admin_data in await storage.expired_temp_admins(now_ms):
+        try:
+            guild = bot.get_guild(admin_data["guild_id"])
+            if guild:
+                member = guild.get_member(admin_data["user_id"])
+                role = guild.get_role(ROLE_ID_TEMP_ADMIN)
+                if member and role:
+                    result, error = await safe_remove_roles(member, role)
+            await storage.remove_temp_admin(admin_data["user_id"])
+        except Exception as e:
+            logger.error(f"Error removing temp admin role: {e}")
 
-            except Exception as e:
-                logger.error(f"❌ Error restoring nickname: {e}")
+    # Handle name changes
+    for change in await storage.expired_name_changes(now_ms):
+        try:
+            guild = bot.get_guild(change["guild_id"])
+            if guild:
+                member = guild.get_member(change["target_id"])
+                if member:
+                    original_nick = change["original_nickname"]
+                    if original_nick == "None":
+                        original_nick = None
+                    await member.edit(nick=original_nick,
+                                      reason="Name change card expired")
+
+            await storage.remove_name_change_card(change["id"])
+            logger.info(
+                f"✅ Name change expired for user {change['target_id']}")
+
+        except Exception as e:
+            logger.error(f"❌ Error restoring nickname: {e}")
 
 
 # ==== Bot Events ====
@@ -2490,23 +6413,38 @@ async def on_ready():
     print(f"✅ Logged in as {bot.user}")
     logger.info(f"✅ Bot logged in as {bot.user}")
 
+    # Load leaderboards once; the writer keeps them current from here on
+    try:
+        await storage.warm_up()
+    except Exception as e:
+        logger.error(f"❌ Leaderboard rebuild failed: {e}")
+
     # Start background tasks
     if not remove_expired_items.is_running():
         remove_expired_items.start()
-    if not auto_backup.is_running():
-        auto_backup.start()
     if not monthly_conversion_check.is_running():
         monthly_conversion_check.start()
     if not api_health_monitor.is_running():
         api_health_monitor.start()
-    if not backup_health_monitor.is_running():  # Add this line
-        backup_health_monitor.start()
+
+    # Backups and database maintenance only apply to the SQLite backend
+    if STORAGE_BACKEND == "sqlite":
+        if not auto_backup.is_running():
+            auto_backup.start()
+        if not backup_health_monitor.is_running():  # Add this line
+            backup_health_monitor.start()
+        if not transaction_retention_task.is_running():
+            transaction_retention_task.start()
+        if not integrity_check_task.is_running():
+            integrity_check_task.start()
+        if not wal_maintenance_task.is_running():
+            wal_maintenance_task.start()
 
     logger.info("✅ All background tasks started")
 
     # Test GitHub connection on startup
     if github_backup:
-        github_ok, github_msg = github_backup.test_connection()
+        github_ok, github_msg = await github_backup.test_connection()
         if github_ok:
             logger.info("✅ GitHub backup system ready")
         else:
@@ -2514,10 +6452,10 @@ async def on_ready():
 
     # Try to create initial backup
     try:
-        if github_backup:
-            backup_file = create_backup_with_cloud_storage()
+        if github_backup and STORAGE_BACKEND == "sqlite":
+            backup_file = await run_db(create_backup_with_cloud_storage)
             if backup_file:
-                success, result = github_backup.upload_backup_to_github(
+                success, result = await github_backup.upload_backup_to_github(
                     backup_file)
                 if success:
                     logger.info("✅ Initial backup created on startup")
@@ -2594,7 +6532,8 @@ async def on_command_error(ctx, error):
 async def on_member_update(before, after):
     """Prevent nickname changes for users with nickname locks"""
     if before.nick != after.nick:
-        if is_nickname_locked(str(after.id)):
+        await partitions.activate(after.guild.id)
+        if await storage.is_nickname_locked(after.id):
             try:
                 await after.edit(nick=before.nick,
                                  reason="Nickname locked by user")
@@ -2602,18 +6541,46 @@ async def on_member_update(before, after):
                 pass
 
 
+# Commands that manage the main database's own backup files
+UNPARTITIONED_COMMANDS = {"cloudbackup", "restorebackup", "backupstatus"}
+
+
+@bot.before_invoke
+async def route_partition(ctx):
+    """Run each command against its guild's database partition"""
+    if (partitions.enabled and ctx.guild is not None
+            and ctx.command.name not in UNPARTITIONED_COMMANDS):
+        await partitions.activate(ctx.guild.id)
+
+
 # ==== Commands ====
+@db_write
+def claim_daily(conn, user_id, reward, streak, claimed_at, description):
+    """Credit a daily reward and record the claim as one write intent"""
+    new_sp = Ledger.credit_intent(conn, user_id, reward, "sp", "daily_claim",
+                                  description)
+    conn.execute(
+        'UPDATE users SET last_claim = ?, streak = ? WHERE user_id = ?',
+        (claimed_at, streak, user_id))
+    db_writer.on_commit(
+        functools.partial(publish_user_update,
+                          user_id,
+                          last_claim=claimed_at,
+                          streak=streak))
+    return new_sp
+
+
 @bot.command()
 @safe_command_wrapper
 @cooldown_check('daily')
 async def daily(ctx):
     try:
-        user_id = str(ctx.author.id)
+        user_id = ctx.author.id
         now = datetime.datetime.now(timezone.utc)
-        user_data = get_user_data(user_id)
+        user_data = await storage.get_user(user_id)
 
-        last_claim = user_data.get("last_daily")  # renamed field
-        streak = user_data.get("daily_streak", 0)
+        last_claim = user_data.get("last_claim")
+        streak = user_data.get("streak", 0)
         base_reward = 300
 
         # ── role bonus ─────────────────────────────────────────────
@@ -2629,15 +6596,7 @@ async def daily(ctx):
 
         # ── cooldown / streak calc ────────────────────────────────
         if last_claim:
-            try:
-                last_time = datetime.datetime.fromisoformat(last_claim)
-                if last_time.tzinfo is None:
-                    last_time = last_time.replace(tzinfo=timezone.utc)
-            except ValueError:  # legacy format
-                last_time = datetime.datetime.strptime(
-                    last_claim,
-                    "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc)
-
+            last_time = from_epoch_ms(last_claim)
             if (now - last_time).days == 0:
                 remaining = 24 - (now - last_time).seconds // 3600
                 embed = discord.Embed(
@@ -2662,16 +6621,9 @@ async def daily(ctx):
         if streak == 5:  # reset on payout
             streak = 0
 
-        old_sp = user_data.get("sp", 0)
-        new_sp = old_sp + reward
-        await update_user_data(
-            user_id,
-            sp=new_sp,
-            last_daily=now.isoformat(),
-            daily_streak=streak,
-        )
-        log_transaction(user_id, "daily_claim", reward, old_sp, new_sp,
-                        f"Daily claim • {role_bonus}")
+        new_sp = await storage.claim_daily(user_id, reward, streak,
+                                           epoch_ms(now),
+                                           f"Daily claim • {role_bonus}")
 
         # ── embed output ──────────────────────────────────────────
         bar = ''.join('🟩' if i < streak else '🟥' for i in range(5))
@@ -2754,7 +6706,9 @@ async def forceconvert(ctx):
             if error:
                 logger.error(f"❌ Failed to edit forceconvert message: {error}")
 
-            total_converted, user_count = await perform_monthly_conversion()
+            run_id = f"manual-{datetime.datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+            total_converted, user_count = await perform_monthly_conversion(
+                run_id)
             if total_converted > 0:
                 embed = discord.Embed(
                     title="✅ **CONVERSION COMPLETE**",
@@ -2871,7 +6825,7 @@ async def cloudbackup(ctx):
 
     try:
         # Create local backup first
-        backup_file = create_backup_with_cloud_storage()
+        backup_file = await run_db(create_backup_with_cloud_storage)
         if backup_file:
             # Try to upload to GitHub
             github_success = False
@@ -2885,7 +6839,7 @@ async def cloudbackup(ctx):
                         f"❌ Failed to edit cloudbackup progress message: {error}"
                     )
 
-                success, result_msg = github_backup.upload_backup_to_github(
+                success, result_msg = await github_backup.upload_backup_to_github(
                     backup_file)
                 if success:
                     github_success = True
@@ -2968,7 +6922,7 @@ async def usename(ctx, member: discord.Member, *, new_nickname: str):
         return
 
     # Check if target has nickname lock
-    if is_nickname_locked(str(member.id)):
+    if await storage.is_nickname_locked(member.id):
         embed = discord.Embed(title="🔒 **TARGET PROTECTED**",
                               description="``````",
                               color=0xFF6347)
@@ -2983,6 +6937,20 @@ async def usename(ctx, member: discord.Member, *, new_nickname: str):
         result, error = await light_safe_api_call(ctx.send, embed=embed)
         return
 
+    # Deduct cost up front; refunded below if the rename fails
+    user_id = ctx.author.id
+    new_balance = await storage.debit(
+        user_id,
+        10000,
+        transaction_type="name_change_card",
+        description=f"Used name change card on {member.display_name}")
+    if new_balance is None:
+        embed = discord.Embed(title="💸 **INSUFFICIENT SPIRIT STONES**",
+                              description="``````",
+                              color=0xFF6347)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+
     try:
         # Store original nickname
         original_nick = member.nick if member.nick else str(
@@ -2991,21 +6959,13 @@ async def usename(ctx, member: discord.Member, *, new_nickname: str):
         await member.edit(
             nick=new_nickname,
             reason=f"Name change card used by {ctx.author.display_name}")
-        # Deduct cost and record the change
-        user_id = str(ctx.author.id)  # Add this line to get user_id
-        user_data = get_user_data(user_id)  # Add this line to get user_data
-        new_balance = user_data["balance"] - 10000
-        await update_user_data(user_id, balance=new_balance)
         # Set expiry (24 hours from now)
-        expires_at = (datetime.datetime.now(timezone.utc) +
-                      timedelta(hours=24)).isoformat()
+        expires_at = epoch_ms(
+            datetime.datetime.now(timezone.utc) + timedelta(hours=24))
         # Record the name change
-        add_name_change_card(user_id, str(member.id), original_nick,
-                             new_nickname, expires_at, str(ctx.guild.id))
-        # Log transaction
-        log_transaction(user_id, "name_change_card", -10000,
-                        user_data["balance"], new_balance,
-                        f"Used name change card on {member.display_name}")
+        await storage.add_name_change_card(user_id, member.id, original_nick,
+                                           new_nickname, expires_at,
+                                           ctx.guild.id)
         embed = discord.Embed(
             title="🃏 **NAME CHANGE CARD ACTIVATED** 🃏",
             description="``````\n✨ *Reality bends to your will...*",
@@ -3021,12 +6981,20 @@ async def usename(ctx, member: discord.Member, *, new_nickname: str):
         if error:
             logger.error(f"❌ Failed to send message: {error}")
     except discord.Forbidden:
+        await storage.credit(user_id,
+                             10000,
+                             transaction_type="name_change_refund",
+                             description="Name change failed: forbidden")
         embed = discord.Embed(title="🚫 **PERMISSION DENIED**",
                               description="``````",
                               color=0xFF0000)
         result, error = await light_safe_api_call(ctx.send, embed=embed)
     except Exception as e:
         logger.error(f"❌ Name change error: {e}")
+        await storage.credit(user_id,
+                             10000,
+                             transaction_type="name_change_refund",
+                             description="Name change failed")
         embed = discord.Embed(title="❌ **NAME CHANGE FAILED**",
                               description="``````",
                               color=0xFF0000)
@@ -3075,24 +7043,20 @@ async def sendsp(ctx, member: discord.Member, amount: int):
             return
 
         # Get receiver data
-        receiver_id = str(member.id)
-        receiver_data = get_user_data(receiver_id)  # This should be sync
-        old_sp = receiver_data.get("sp", 0)
-        new_sp = old_sp + amount
-
-        # Update receiver's SP - FIXED: Use await
-        success = await update_user_data(receiver_id, sp=new_sp)
-        if not success:
+        receiver_id = member.id
+        new_sp = await storage.credit(
+            receiver_id,
+            amount,
+            "sp",
+            transaction_type="owner_sp_grant",
+            description=f"SP grant by Owner {ctx.author.display_name}")
+        if new_sp is None:
             embed = discord.Embed(title="❌ **DATABASE ERROR** ❌",
                                   description="``````",
                                   color=0xFF0000)
             result, error = await light_safe_api_call(ctx.send, embed=embed)
             return
 
-        # Log transaction - Make this async too if needed
-        log_transaction(receiver_id, "owner_sp_grant", amount, old_sp, new_sp,
-                        f"SP grant by Owner {ctx.author.display_name}")
-
         # Success embed
         embed = discord.Embed(
             title="👑 **DIVINE SP BLESSING GRANTED** 👑",
@@ -3195,8 +7159,12 @@ async def restorebackup(ctx, filename: Optional[str] = None):
             if filename:  # If filename is provided, restore from that specific file
                 backup_path = os.path.join("backups", filename)
                 if os.path.isfile(backup_path):
-                    shutil.copy2(backup_path,
+                    await run_db(quiesce_writes)
+                    close_db_connections()
+                    await run_db(restore_backup_file, backup_path,
                                  DB_FILE)  # Restore specific backup
+                    await init_database()
+                    forget_cached_rows()
                     success = True
                 else:
                     embed = discord.Embed(
@@ -3287,6 +7255,30 @@ async def apistatus(ctx):
             embed.add_field(name="📈 **Popular Commands (1h)**",
                             value=f"```yaml\n{command_list}\n```",
                             inline=True)
+        pool_stats = db_pool.stats()
+        embed.add_field(
+            name="🗄️ **Database Pool**",
+            value=
+            f"```yaml\nOpen: {pool_stats['open']}/{pool_stats['size']}\nCheckouts: {pool_stats['checkouts']:,}\nExhausted: {pool_stats['exhausted']:,}\nAvg Wait: {pool_stats['avg_wait_ms']} ms\nMax Wait: {pool_stats['max_wait_ms']} ms\n```",
+            inline=False)
+        read_stats = db_read_pool.stats()
+        embed.add_field(
+            name="📖 **Read Pool**",
+            value=
+            f"```yaml\nOpen: {read_stats['open']}/{read_stats['size']}\nCheckouts: {read_stats['checkouts']:,}\nExhausted: {read_stats['exhausted']:,}\nAvg Wait: {read_stats['avg_wait_ms']} ms\nMax Wait: {read_stats['max_wait_ms']} ms\n```",
+            inline=False)
+        writer_stats = db_writer.stats()
+        embed.add_field(
+            name="✍️ **Group Commit Writer**",
+            value=
+            f"```yaml\nBatches: {writer_stats['batches']:,}\nIntents: {writer_stats['intents']:,}\nAvg Batch: {writer_stats['avg_batch']}\nLargest: {writer_stats['largest_batch']}\nAvg Commit: {writer_stats['avg_commit_ms']} ms\n```",
+            inline=False)
+        cache_stats = user_cache.stats()
+        embed.add_field(
+            name="🧠 **User Cache**",
+            value=
+            f"```yaml\nEntries: {cache_stats['entries']}/{cache_stats['max_entries']}\nHits: {cache_stats['hits']:,}\nMisses: {cache_stats['misses']:,}\nEvictions: {cache_stats['evictions']:,}\nHit Rate: {cache_stats['hit_rate']}%\n```",
+            inline=False)
         embed.set_footer(
             text="🔄 Updates every 5 minutes • API monitoring active",
             icon_url=ctx.guild.icon.url if ctx.guild.icon else None)
@@ -3300,6 +7292,39 @@ async def apistatus(ctx):
             ctx.send, "❌ Failed to retrieve API status.")
 
 
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def sqlstats(ctx, action: str = None):
+    """Per-statement SQL latency report; `!sqlstats reset` clears it (Admin only)"""
+    if action == "reset":
+        sql_metrics.reset()
+        await light_safe_api_call(ctx.send, "🧹 SQL statistics reset.")
+        return
+
+    stats = sql_metrics.stats(limit=3)
+    embed = discord.Embed(
+        title="🧮 **SQL LATENCY REPORT** 🧮",
+        description=
+        f"```yaml\nStatements: {stats['statements']}\nSlow (>= {stats['slow_ms']:g} ms): {stats['slow_queries']:,}\n```",
+        color=0x00CED1 if not stats['slow_queries'] else 0xFFB347)
+    for i, entry in enumerate(sql_metrics.snapshot(limit=8), 1):
+        embed.add_field(
+            name=
+            f"#{i} • {entry['count']:,} calls • {entry['total_ms']:,.0f} ms total",
+            value=
+            f"```sql\n{entry['statement'][:300]}\n```p50 `{entry['p50_ms']}` • p95 `{entry['p95_ms']}` • p99 `{entry['p99_ms']}` • max `{entry['max_ms']}` ms • rows `{entry['rows']:,}`",
+            inline=False)
+    for slow in stats['recent_slow']:
+        plan = "\n".join(slow['plan'] or ["(no plan)"])
+        embed.add_field(
+            name=
+            f"🐢 {slow['ms']} ms • {slow['rows']:,} rows • {slow['at'][:19]}",
+            value=
+            f"```sql\n{slow['statement'][:250]}\n``````\n{plan[:400]}\n```",
+            inline=False)
+    await light_safe_api_call(ctx.send, embed=embed)
+
+
 @bot.command()
 @safe_command_wrapper
 @cooldown_check('backupstatus')
@@ -3313,7 +7338,7 @@ async def backupstatus(ctx):
         # GitHub backup status
         github_backups = []
         if github_backup:
-            success, github_files = github_backup.list_github_backups()
+            success, github_files = await github_backup.list_github_backups()
             if success and github_files:
                 github_backups = github_files[:5]  # Show latest 5
                 _latest_github = github_files[0]
@@ -3338,7 +7363,7 @@ async def backupstatus(ctx):
         # Local backup status
         if os.path.exists("backups"):
             backup_files = [
-                f for f in os.listdir("backups") if f.endswith(".db")
+                f for f in os.listdir("backups") if is_backup_file(f)
             ]
             backup_files.sort(
                 key=lambda x: os.path.getmtime(os.path.join("backups", x)),
@@ -3370,6 +7395,41 @@ async def backupstatus(ctx):
                             value="``````",
                             inline=True)
 
+        # Copies still running
+        for progress in online_backup.status()["in_progress"]:
+            embed.add_field(
+                name="⏳ **Backup In Progress**",
+                value=
+                f"```\n{progress['file']}: {progress['percent']}% ({progress['steps']} steps)\n```",
+                inline=False)
+
+        # How well the latest backup compressed
+        compression = backup_compressor.last_result
+        if compression:
+            embed.add_field(
+                name="🗜️ **Compression**",
+                value=
+                f"```yaml\nCodec: {compression['codec']} (level {compression['level']})\nSize: {compression['raw_bytes']:,} -> {compression['compressed_bytes']:,} bytes\nRatio: {compression['ratio']}x\nTime: {compression['duration_ms']:.0f} ms\n```",
+                inline=False)
+        else:
+            embed.add_field(
+                name="🗜️ **Compression**",
+                value=
+                f"```yaml\nCodec: {backup_compressor.status()['codec']}\nNo backup compressed since startup\n```",
+                inline=False)
+
+        # Latest link of the incremental chain
+        chain = backup_chain.last_result
+        if chain:
+            pages = (f"{chain['changed_pages']:,}/{chain['pages']:,} changed"
+                     if chain['kind'] == "delta" else
+                     f"{chain['pages']:,} ({chain['reason']})")
+            embed.add_field(
+                name="🧩 **Incremental Chain**",
+                value=
+                f"```yaml\nLast: {chain['kind']}\nPages: {pages}\nStored: {chain['bytes']:,} of {chain['image_bytes']:,} bytes\nFull Every: {backup_chain.full_every} backups\n```",
+                inline=False)
+
         # Current database info
         if os.path.exists(DB_FILE):
             _current_size = os.path.getsize(DB_FILE)
@@ -3398,8 +7458,8 @@ async def backupstatus(ctx):
 @cooldown_check('ssbal')
 async def ssbal(ctx, member: Optional[discord.Member] = None):
     user = member or ctx.author
-    user_id = str(user.id)
-    user_data = get_user_data(user_id)
+    user_id = user.id
+    user_data = await storage.get_user(user_id)
     balance = user_data.get("balance", 0)
 
     # Wealth tier determination
@@ -3444,8 +7504,8 @@ async def ssbal(ctx, member: Optional[discord.Member] = None):
 @cooldown_check('spbal')
 async def spbal(ctx, member: Optional[discord.Member] = None):
     user = member or ctx.author
-    user_id = str(user.id)
-    user_data = get_user_data(user_id)
+    user_id = user.id
+    user_data = await storage.get_user(user_id)
     sp = user_data.get("sp", 0)
 
     # Energy tier determination
@@ -3490,8 +7550,8 @@ async def spbal(ctx, member: Optional[discord.Member] = None):
 @safe_command_wrapper
 @cooldown_check('exchange')
 async def exchange(ctx, amount: str):
-    user_id = str(ctx.author.id)
-    user_data = get_user_data(user_id)
+    user_id = ctx.author.id
+    user_data = await storage.get_user(user_id)
 
     if amount.lower() == "all":
         exchange_amount = user_data.get("sp", 0)
@@ -3515,15 +7575,19 @@ async def exchange(ctx, amount: str):
         return
 
     # Update balances
-    old_sp = user_data.get('sp', 0)
-    old_balance = user_data.get('balance', 0)
-    new_sp = old_sp - exchange_amount
-    new_balance = old_balance + exchange_amount
-    await update_user_data(user_id, balance=new_balance, sp=new_sp)
-
-    # Log transaction
-    log_transaction(user_id, "exchange", exchange_amount, old_balance,
-                    new_balance, f"Exchanged {exchange_amount} SP to SS")
+    converted = await storage.convert(
+        user_id,
+        exchange_amount,
+        description=f"Exchanged {exchange_amount} SP to SS")
+    if converted is None:
+        embed = discord.Embed(
+            title="🚫 **INSUFFICIENT ENERGY**",
+            description=
+            f"``````\n💔 *Your spiritual energy reserves are inadequate for this conversion...*",
+            color=0xFF4500)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+    new_sp, new_balance = converted
 
     embed = discord.Embed(title="🔄 **ENERGY TRANSMUTATION COMPLETE** 🔄",
                           description="``````",
@@ -3546,12 +7610,32 @@ async def exchange(ctx, amount: str):
         logger.error(f"❌ Failed to send message: {error}")
 
 
+@db_write
+def settle_coinflip(conn, user_id, bet, won, flip):
+    """Apply a coinflip result and its monthly stats as one write intent"""
+    if won:
+        new_sp = Ledger.credit_intent(conn, user_id, bet, "sp", "gambling_win",
+                                      f"Coinflip win: {flip}")
+    else:
+        new_sp = Ledger.debit_intent(conn, user_id, bet, "sp", "gambling_loss",
+                                     f"Coinflip loss: {flip}")
+    if new_sp is not None:
+        month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
+        db_writer.on_commit(
+            functools.partial(monthly_stats_buffer.add,
+                              user_id,
+                              month,
+                              wins=bet if won else 0,
+                              losses=0 if won else bet))
+    return new_sp
+
+
 @bot.command()
 @safe_command_wrapper
 @cooldown_check('coinflip')
 async def coinflip(ctx, guess: str, amount: str):
     now = datetime.datetime.now(timezone.utc)
-    user_id = str(ctx.author.id)
+    user_id = ctx.author.id
     guess = guess.lower()
 
     if guess not in ["heads", "tails"]:
@@ -3561,7 +7645,7 @@ async def coinflip(ctx, guess: str, amount: str):
         result, error = await light_safe_api_call(ctx.send, embed=embed)
         return
 
-    user_data = get_user_data(user_id)
+    user_data = await storage.get_user(user_id)
     sp = user_data.get("sp", 0)
 
     if user_id in last_gamble_times and (
@@ -3599,12 +7683,16 @@ async def coinflip(ctx, guess: str, amount: str):
     flip = random.choice(["heads", "tails"])
     won = (flip == guess)
 
+    new_sp = await storage.settle_coinflip(user_id, bet, won, flip)
+    if new_sp is None:
+        # Balance dropped below the wager since it was checked
+        embed = discord.Embed(title="🚫 **WAGER REJECTED**",
+                              description=f"``````",
+                              color=0xFF4500)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+
     if won:
-        new_sp = sp + bet
-        await update_user_data(user_id, sp=new_sp)
-        update_monthly_stats(user_id, win_amount=bet)
-        log_transaction(user_id, "gambling_win", bet, sp, new_sp,
-                        f"Coinflip win: {flip}")
         embed = discord.Embed(title="🎉 **FATE SMILES UPON YOU** 🎉",
                               description=f"``````",
                               color=0x00FF00)
@@ -3615,11 +7703,6 @@ async def coinflip(ctx, guess: str, amount: str):
                         value=f"`{new_sp:,} SP`",
                         inline=True)
     else:
-        new_sp = sp - bet
-        await update_user_data(user_id, sp=new_sp)
-        update_monthly_stats(user_id, loss_amount=bet)
-        log_transaction(user_id, "gambling_loss", -bet, sp, new_sp,
-                        f"Coinflip loss: {flip}")
         embed = discord.Embed(title="💀 **THE VOID CLAIMS ITS DUE** 💀",
                               description=f"``````",
                               color=0xFF0000)
@@ -3677,8 +7760,8 @@ async def shop(ctx):
 @safe_command_wrapper
 @cooldown_check('buy')
 async def buy(ctx, item_number: int):
-    user_id = str(ctx.author.id)
-    user_data = get_user_data(user_id)
+    user_id = ctx.author.id
+    user_data = await storage.get_user(user_id)
     item_list = list(SHOP_ITEMS.keys())
 
     if item_number < 1 or item_number > len(item_list):
@@ -3702,15 +7785,27 @@ async def buy(ctx, item_number: int):
         result, error = await light_safe_api_call(ctx.send, embed=embed)
         return
 
+    # Charge first so concurrent purchases cannot overspend
+    new_balance = await storage.debit(user_id,
+                                      item_data["price"],
+                                      transaction_type="shop_purchase",
+                                      description=f"Purchased {item}")
+    if new_balance is None:
+        embed = discord.Embed(title="💸 **INSUFFICIENT SPIRIT STONES**",
+                              description=f"``````",
+                              color=0xFF6347)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+
     # Handle different items
     if item == "nickname_lock":
-        add_nickname_lock(user_id)
+        await storage.add_nickname_lock(user_id)
         effect = "🔒 **IDENTITY SEALED** - *Your name is now protected from all changes*"
         effect_color = 0x4169E1
     elif item == "temp_admin":
         expiry = datetime.datetime.now(
             timezone.utc) + datetime.timedelta(hours=1)
-        add_temp_admin(user_id, expiry.isoformat(), str(ctx.guild.id))
+        await storage.add_temp_admin(user_id, epoch_ms(expiry), ctx.guild.id)
         role = ctx.guild.get_role(ROLE_ID_TEMP_ADMIN)
         if role:
             await ctx.author.add_roles(role)
@@ -3729,14 +7824,6 @@ async def buy(ctx, item_number: int):
         effect = "✨ **ARTIFACT BONDED** - *The power is now yours to wield*"
         effect_color = 0x9932CC
 
-    # Update balance
-    new_balance = balance - item_data["price"]
-    await update_user_data(user_id, balance=new_balance)
-
-    # Log transaction
-    log_transaction(user_id, "shop_purchase", -item_data["price"], balance,
-                    new_balance, f"Purchased {item}")
-
     embed = discord.Embed(title="✅ **TRANSACTION COMPLETED** ✅",
                           description=f"``````",
                           color=effect_color)
@@ -3781,25 +7868,19 @@ async def givess(ctx, member: discord.Member, amount: int):
             result, error = await light_safe_api_call(ctx.send, embed=embed)
             return
 
-        receiver_id = str(member.id)
-        receiver_data = get_user_data(receiver_id)  # Sync function
-        old_balance = receiver_data.get("balance", 0)
-        new_balance = old_balance + amount
-
-        # FIXED: Use await for async function
-        success = await update_user_data(receiver_id, balance=new_balance)
-        if not success:
+        receiver_id = member.id
+        new_balance = await storage.credit(
+            receiver_id,
+            amount,
+            transaction_type="admin_grant",
+            description=f"Admin grant by {ctx.author.display_name}")
+        if new_balance is None:
             embed = discord.Embed(title="❌ **DATABASE ERROR** ❌",
                                   description="``````",
                                   color=0xFF0000)
             result, error = await light_safe_api_call(ctx.send, embed=embed)
             return
 
-        # Log transaction
-        log_transaction(receiver_id, "admin_grant", amount, old_balance,
-                        new_balance,
-                        f"Admin grant by {ctx.author.display_name}")
-
         embed = discord.Embed(title="✨ **DIVINE BLESSING GRANTED** ✨",
                               description="``````",
                               color=0x00FF7F)
@@ -3857,24 +7938,20 @@ async def takess(ctx, member: discord.Member, amount: int):
         result, error = await light_safe_api_call(ctx.send, embed=embed)
         return
 
-    target_id = str(member.id)
-    target_data = get_user_data(target_id)
-    current_balance = target_data["balance"]
+    target_id = member.id
+    new_balance = await storage.debit(
+        target_id,
+        amount,
+        transaction_type="admin_remove",
+        description=f"Admin removal by {ctx.author.display_name}")
 
-    if amount > current_balance:
+    if new_balance is None:
         embed = discord.Embed(title="⚠️ **INSUFFICIENT FUNDS** ⚠️",
                               description=f"``````",
                               color=0xFF6347)
         result, error = await light_safe_api_call(ctx.send, embed=embed)
         return
 
-    new_balance = current_balance - amount
-    await update_user_data(target_id, balance=new_balance)
-
-    # Log transaction
-    log_transaction(target_id, "admin_remove", -amount, current_balance,
-                    new_balance, f"Admin removal by {ctx.author.display_name}")
-
     embed = discord.Embed(title="💀 **DIVINE JUDGMENT EXECUTED** 💀",
                           description="``````",
                           color=0xFF1744)
@@ -3909,7 +7986,7 @@ async def takess(ctx, member: discord.Member, amount: int):
 @safe_command_wrapper
 @cooldown_check('top')
 async def top(ctx):
-    leaderboard = get_leaderboard('balance', 10)
+    leaderboard = await storage.top('balance', 10)
     embed = discord.Embed(
         title="🏆 **SPIRIT STONES LEADERBOARD** 🏆",
         description="``````\n💎 *The most powerful cultivators in the realm...*",
@@ -3920,7 +7997,7 @@ async def top(ctx):
     leaderboard_text = ""
     for i, (user_id, balance) in enumerate(leaderboard):
         try:
-            user = bot.get_user(int(user_id))
+            user = bot.get_user(user_id)
             username = user.display_name if user else "Unknown User"
             leaderboard_text += f"{medal_emojis[i]} **{username}** - `{balance:,}` SS\n"
         except Exception:
@@ -3940,12 +8017,69 @@ async def top(ctx):
         logger.error(f"❌ Failed to send message: {error}")
 
 
+RANK_BOARDS = {
+    "ss": ("balance", "SS", "💰 **SPIRIT STONES RANKING**"),
+    "sp": ("sp", "SP", "⚡ **SPIRIT POINTS RANKING**"),
+    "losses": ("losses", "SP lost", "💀 **MONTHLY LOSSES RANKING**"),
+}
+
+
+@bot.command()
+@safe_command_wrapper
+@cooldown_check('rank')
+async def rank(ctx, member: Optional[discord.Member] = None, board="ss"):
+    """Show a user's leaderboard rank with the 5 players above and below"""
+    user = member or ctx.author
+    board = board.lower()
+    if board not in RANK_BOARDS:
+        embed = discord.Embed(title="❌ **UNKNOWN LEADERBOARD**",
+                              description="```\nUse: ss, sp or losses\n```",
+                              color=0xFF0000)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+
+    field, unit, title = RANK_BOARDS[board]
+    placement = await storage.rank(field, user.id, radius=5)
+    if placement is None:
+        embed = discord.Embed(
+            title="🌫️ **UNRANKED**",
+            description=
+            f"```\n{user.display_name} has no standing on this board yet\n```",
+            color=0x708090)
+        result, error = await light_safe_api_call(ctx.send, embed=embed)
+        return
+
+    user_rank, rows = placement
+    lines = []
+    for position, user_id, score in rows:
+        other = bot.get_user(user_id)
+        username = other.display_name if other else "Unknown User"
+        marker = "➤" if user_id == user.id else "•"
+        lines.append(
+            f"{marker} `#{position}` **{username}** - `{score:,}` {unit}")
+
+    embed = discord.Embed(
+        title=title,
+        description=
+        f"```\n{user.display_name} stands at #{user_rank:,} of {storage.board_size(field):,}\n```",
+        color=0x4169E1)
+    embed.add_field(name="🧭 **NEARBY RIVALS**",
+                    value="\n".join(lines),
+                    inline=False)
+    embed.set_thumbnail(url=user.avatar.url if user.avatar else None)
+    embed.set_footer(text="⚡ Power rankings updated in real-time",
+                     icon_url=ctx.guild.icon.url if ctx.guild.icon else None)
+    result, error = await light_safe_api_call(ctx.send, embed=embed)
+    if error:
+        logger.error(f"❌ Failed to send message: {error}")
+
+
 @bot.command()
 @safe_command_wrapper
 @cooldown_check('lucky')
 async def lucky(ctx):
     """Shows total SP of top 10 players instead of individual gambling stats"""
-    sp_leaderboard = get_leaderboard('sp', 10)
+    sp_leaderboard = await storage.top('sp', 10)
     total_sp = sum(sp for _, sp in sp_leaderboard)
 
     embed = discord.Embed(title="🍀 **COSMIC FORTUNE READING** 🍀",
@@ -3959,7 +8093,7 @@ async def lucky(ctx):
     leaderboard_text = ""
     for i, (user_id, sp) in enumerate(sp_leaderboard):
         try:
-            user = bot.get_user(int(user_id))
+            user = bot.get_user(user_id)
             username = user.display_name if user else "Unknown User"
             leaderboard_text += f"{medal_emojis[i]} **{username}** - `{sp:,}` SP\n"
         except Exception:
@@ -3997,7 +8131,7 @@ async def lucky(ctx):
 async def unlucky(ctx):
     """Shows top 10 users who lost the most SP this month"""
     current_month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
-    top_losers = get_top_losers(current_month, 10)
+    top_losers = await storage.top_losers(current_month, 10)
 
     if not top_losers:
         embed = discord.Embed(title="🌟 **BLESSED MONTH** 🌟",
@@ -4023,7 +8157,7 @@ async def unlucky(ctx):
     leaderboard_text = ""
     for i, (user_id, losses) in enumerate(top_losers):
         try:
-            user = bot.get_user(int(user_id))
+            user = bot.get_user(user_id)
             username = user.display_name if user else "Unknown User"
             leaderboard_text += f"{skull_emojis[i]} **{username}** - `{losses:,}` SP Lost\n"
         except Exception:
@@ -4089,7 +8223,7 @@ async def emergency_repair(ctx):
 
     try:
         # Check database integrity
-        if await check_database_integrity():
+        if await check_database_integrity(full=True):
             embed.description = "``````"
             embed.color = 0x00FF00
         else:
@@ -4158,11 +8292,11 @@ async def errortest(ctx, error_type: str = "generic"):
 async def lose(ctx, member: Optional[discord.Member] = None):
     """Shows SP lost this month for the user or tagged member"""
     user = member or ctx.author
-    user_id = str(user.id)
+    user_id = user.id
 
     # Get current month stats
     current_month = datetime.datetime.now(timezone.utc).strftime("%Y-%m")
-    monthly_stats = get_monthly_stats(user_id, current_month)
+    monthly_stats = await storage.get_monthly_stats(user_id, current_month)
     losses = monthly_stats.get("losses", 0)
     wins = monthly_stats.get("wins", 0)
     net_result = wins - losses
@@ -4251,6 +8385,7 @@ async def help(ctx):
 !spbal [@user] - Check Spirit Points balance
 !exchange <amount|all> - Convert SP to SS (1:1)
 !top - View SS leaderboard (top 10)
+!rank [@user] [ss|sp|losses] - Your rank and nearby rivals
 ```""",
                     inline=False)
 
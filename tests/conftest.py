@@ -0,0 +1,25 @@
+import importlib
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+
+@pytest.fixture
+def bot_main(tmp_path, monkeypatch):
+    """The bot module working on a fresh database in a temp directory
+    (main opens bot_database.db relative to the working directory)"""
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module("main")
+    logging.disable(logging.CRITICAL)
+    try:
+        yield main
+    finally:
+        # Release every handle so the next test starts on its own file
+        main.db_writer.stop()
+        main.close_db_connections()
+        logging.disable(logging.NOTSET)
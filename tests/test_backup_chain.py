@@ -0,0 +1,82 @@
+"""Incremental backups: full → delta → delta, rebuilt page for page"""
+import asyncio
+import os
+import shutil
+
+import pytest
+
+
+def _pages(path, page_size):
+    with open(path, "rb") as f:
+        data = f.read()
+    return [data[i:i + page_size] for i in range(0, len(data), page_size)]
+
+
+def test_delta_chain_rebuilds_identical_images(bot_main):
+    main = bot_main
+
+    async def run():
+        await main.init_database()
+        backups, expected = [], []
+        for round_no in range(3):
+            for user_id in range(round_no * 50, round_no * 50 + 200):
+                await main.ledger.credit(user_id, round_no + 1)
+            backup = await main.run_db(main.create_backup_with_cloud_storage)
+            # Take the same online copy the backup was made from
+            image = f"expected_{round_no}.db"
+            await main.run_db(main.online_backup.run, main.DB_FILE, image)
+            backups.append(backup)
+            expected.append(image)
+        return backups, expected
+
+    backups, expected = asyncio.run(run())
+    assert not main.BackupChain.is_delta(backups[0])
+    assert all(main.BackupChain.is_delta(path) for path in backups[1:])
+    assert main.backup_chain.parent_of(backups[2]) == os.path.basename(
+        backups[1])
+
+    page_size = main.BackupChain._page_size(expected[0])
+    for index, (backup, image) in enumerate(zip(backups, expected)):
+        rebuilt = f"rebuilt_{index}.db"
+        if main.BackupChain.is_delta(backup):
+            main.backup_chain.rebuild(backup, rebuilt)
+        else:
+            main.backup_compressor.decompress(backup, rebuilt)
+        assert _pages(rebuilt, page_size) == _pages(image, page_size), backup
+
+
+def test_unchanged_database_reuses_and_touches_backup(bot_main):
+    main = bot_main
+
+    async def run():
+        await main.init_database()
+        await main.ledger.credit(1, 10)
+        first = await main.run_db(main.create_backup_with_cloud_storage)
+        os.utime(first, (0, 0))
+        second = await main.run_db(main.create_backup_with_cloud_storage)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert second == first
+    assert main.backup_chain.last_result["kind"] == "unchanged"
+    assert os.path.getmtime(first) > 0
+
+
+def test_looping_chain_is_rejected(bot_main):
+    main = bot_main
+
+    async def run():
+        await main.init_database()
+        paths = []
+        for user_id in range(3):
+            await main.ledger.credit(user_id, 10)
+            paths.append(await
+                         main.run_db(main.create_backup_with_cloud_storage))
+        return paths
+
+    paths = asyncio.run(run())
+    # A delta copied over its own parent names itself as parent
+    parent = os.path.join("backups", main.backup_chain.parent_of(paths[2]))
+    shutil.copy(paths[2], parent)
+    with pytest.raises(ValueError):
+        main.restore_backup_file(parent, "looped.db")
@@ -0,0 +1,69 @@
+"""IndexableSkipList and Leaderboard against a plain sorted list"""
+import random
+
+import pytest
+
+
+def test_skiplist_rank_and_slice_match_sorted_list(bot_main):
+    rnd = random.Random(7)
+    initial = sorted(rnd.sample(range(10_000), 300))
+    skiplist = bot_main.IndexableSkipList.from_sorted(initial)
+    model = list(initial)
+
+    for _ in range(3000):
+        if model and rnd.random() < 0.45:
+            key = rnd.choice(model)
+            skiplist.remove(key)
+            model.remove(key)
+        else:
+            key = rnd.randrange(10_000)
+            if key in model:
+                continue
+            skiplist.insert(key)
+            model.append(key)
+            model.sort()
+
+        assert len(skiplist) == len(model)
+        probe = rnd.choice(model)
+        assert skiplist.index(probe) == model.index(probe)
+        start = rnd.randrange(-3, len(model) + 3)
+        stop = start + rnd.randrange(0, 15)
+        assert skiplist.slice(start, stop) == model[max(start, 0):max(stop, 0)]
+
+    assert [skiplist.index(key) for key in model] == list(range(len(model)))
+    assert skiplist.slice(0, len(model)) == model
+
+
+def test_skiplist_missing_keys_raise(bot_main):
+    skiplist = bot_main.IndexableSkipList.from_sorted([1, 3, 5])
+    with pytest.raises(KeyError):
+        skiplist.index(4)
+    with pytest.raises(KeyError):
+        skiplist.remove(4)
+
+
+def test_leaderboard_top_and_around_with_ties(bot_main):
+    rnd = random.Random(11)
+    board = bot_main.Leaderboard({user_id: 50 for user_id in range(20)})
+    scores = {user_id: 50 for user_id in range(20)}
+    for _ in range(2000):
+        user_id = rnd.randrange(60)
+        score = rnd.randrange(0, 40) * 5  # plenty of ties
+        board.update(user_id, score)
+        scores[user_id] = score
+
+    # Highest score first, ties broken by user id
+    expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    assert board.top(len(scores)) == expected
+    assert board.top(5) == expected[:5]
+    assert len(board) == len(scores)
+
+    for position, (user_id, _) in enumerate(expected):
+        rank, rows = board.around(user_id, radius=3)
+        assert rank == position + 1
+        start = max(position - 3, 0)
+        assert rows == [
+            (start + offset + 1, uid, score)
+            for offset, (uid, score) in enumerate(expected[start:position + 4])
+        ]
+    assert board.around(10_000) is None
@@ -0,0 +1,51 @@
+"""Schema migrations applied to a copy of the original database"""
+import asyncio
+import datetime
+import shutil
+import sqlite3
+
+from conftest import REPO
+
+
+def _ms(iso):
+    return round(
+        datetime.datetime.fromisoformat(iso).replace(
+            tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+def test_baseline_database_migrates_to_current_schema(bot_main):
+    main = bot_main
+    shutil.copy(REPO / "bot_database.db", main.DB_FILE)
+    with sqlite3.connect(main.DB_FILE) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        user_id, balance, sp, last_claim, streak, created_at = conn.execute(
+            "SELECT * FROM users").fetchone()
+        transactions = conn.execute(
+            "SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    async def run():
+        await main.init_database()
+        version = await main.get_schema_version()
+        await main.init_database()  # already current: nothing to do
+        return version, await main.get_schema_version()
+
+    assert asyncio.run(run()) == (main.SCHEMA_VERSION, main.SCHEMA_VERSION)
+
+    conn = sqlite3.connect(main.DB_FILE)
+    try:
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok", )
+        row = conn.execute(
+            "SELECT user_id, balance, sp, last_claim, streak, created_at, "
+            "typeof(user_id) FROM users").fetchone()
+        assert row == (int(user_id), balance, sp, _ms(last_claim), streak,
+                       _ms(created_at), "integer")
+        assert conn.execute(
+            "SELECT COUNT(*), SUM(typeof(timestamp) = 'integer') "
+            "FROM transactions").fetchone() == (transactions, transactions)
+
+        conn.execute("INSERT INTO conversion_runs (run_id) VALUES ('t')")
+        assert conn.execute("SELECT typeof(started_at) FROM conversion_runs"
+                            ).fetchone() == ("integer", )
+    finally:
+        conn.close()
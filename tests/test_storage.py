@@ -0,0 +1,49 @@
+"""MemoryStorage must stay in lockstep with SQLiteStorage"""
+import asyncio
+import random
+
+
+def _apply(storage, op, user_id, won):
+    if op == 0:
+        return storage.credit(user_id, 50, transaction_type="test")
+    if op == 1:
+        return storage.debit(user_id, 30, "sp")
+    if op == 2:
+        return storage.transfer(user_id, user_id + 1, 20)
+    if op == 3:
+        return storage.convert(user_id, 10)
+    if op == 4:
+        return storage.settle_coinflip(user_id, 5, won, "heads")
+    return storage.claim_daily(user_id, 100, 2, 5, "daily")
+
+
+def test_memory_storage_matches_sqlite(bot_main):
+    main = bot_main
+
+    async def run():
+        await main.init_database()
+        backends = [main.SQLiteStorage(), main.MemoryStorage()]
+        rnd = random.Random(1)
+        for step in range(2000):
+            user_id = rnd.randrange(1, 200)
+            op = rnd.randrange(6)
+            won = rnd.random() < .5
+            results = []
+            for storage in backends:
+                result = await _apply(storage, op, user_id, won)
+                user = await storage.get_user(user_id)
+                results.append((result, user["balance"], user["sp"]))
+            assert results[0] == results[1], (step, op, user_id)
+
+        await main.run_db(main.transaction_log.flush, wait=True)
+        await main.run_db(main.monthly_stats_buffer.flush, wait=True)
+        for field in ("balance", "sp"):
+            tops = [await storage.top(field) for storage in backends]
+            assert tops[0] == tops[1], field
+        assert backends[0].user_count() == backends[1].user_count()
+        for user_id in range(1, 201):
+            users = [await storage.get_user(user_id) for storage in backends]
+            balances = [(user["balance"], user["sp"]) for user in users]
+            assert balances[0] == balances[1], user_id
+
+    asyncio.run(run())